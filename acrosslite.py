@@ -0,0 +1,244 @@
+# acrosslite.py
+
+# reading and writing crosswords in the Across Lite .puz format. The
+# layout (all little-endian) is
+#
+#   header:   the checksum of everything, 'ACROSS&DOWN\0', the
+#             checksum of the CIB (the 8 bytes from the width on),
+#             the masked checksums ('ICHEATED' xor'ed with the low and
+#             high bytes of four checksums), the version ('1.3\0'),
+#             the checksum of the scrambled solution, then the width,
+#             height, number of clues, a bitmask (1) and whether the
+#             solution is scrambled (HEADER)
+#   solution: a byte for each cell, row by row, '.' for black cells
+#   state:    the same, with '-' for each white cell (nothing filled in)
+#   strings:  the title, author, copyright, each clue and the notes,
+#             each ending with a NUL, in ISO-8859-1
+#
+# Clues aren't given positions: they are in the usual numbering order
+# (across before down for the same number), and each goes in the next
+# cell starting an across or down run of 2 or more cells. So only
+# crosswords that are numbered that way can be written, and every
+# letter has to be known (they are written in upper case, and read
+# back in lower case). Length specs with more than one word go on
+# the end of the clue, e.g. "Fish (3,8)", and are taken off again when
+# reading. The later parts of separated clues are "See 1-across".
+
+import re, struct
+import interchange
+
+MAGIC = b'ACROSS&DOWN\0'
+VERSION = b'1.3\0'
+
+HEADER = struct.Struct('<H12sHQ4s2xH12xBBHHH')
+
+# the CIB is the width, height, number of clues, bitmask and scrambled
+# flag
+CIB_START = 0x2C
+CIB_END = 0x34
+
+# a length spec on the end of a clue
+RE_ENUMERATION = re.compile(r'\s*\(([0-9][0-9,.\-]*)\)$')
+
+# the later part of a separated clue
+RE_SEE = re.compile(r'^See (\d+)[- ](across|down)$',re.IGNORECASE)
+
+ENCODING = 'iso-8859-1'
+
+def checksum(data,c=0):
+    for b in data:
+        c = (c >> 1) | ((c & 1) << 15)
+        c = (c + b) & 0xffff
+    return c
+
+# the checksum of the strings (without their NULs, except for the
+# title, author, copyright and notes, which are only counted if
+# they're there, and the notes only from version 1.3 on)
+def text_checksum(title,author,copyright,clues,notes,c=0):
+    for s in (title,author,copyright):
+        if s:
+            c = checksum(s + b'\0',c)
+    for s in clues:
+        c = checksum(s,c)
+    if notes:
+        c = checksum(notes + b'\0',c)
+    return c
+
+# the (overall, CIB, masked) checksums for the parts of a file
+def checksums(cib,solution,state,title,author,copyright,clues,notes):
+    c_cib = checksum(cib)
+    c_solution = checksum(solution)
+    c_state = checksum(state)
+    c_text = text_checksum(title,author,copyright,clues,notes)
+    overall = text_checksum(title,author,copyright,clues,notes,
+                            checksum(state,checksum(solution,c_cib)))
+    masked = 0
+    for k,(c,low,high) in enumerate(zip([c_cib,c_solution,c_state,c_text],b'ICHE',b'ATED')):
+        masked |= (low ^ (c & 0xff)) << (8 * k)
+        masked |= (high ^ (c >> 8)) << (8 * k + 32)
+    return (overall,c_cib,masked)
+
+# the cells that start across and down runs (of 2 or more white
+# cells), numbered the usual way: [(number, cell, across, down)]
+def numbering(width,height,white):
+    found = []
+    n = 0
+    for y in range(height):
+        for x in range(width):
+            if (x,y) not in white:
+                continue
+            across = (x - 1,y) not in white and (x + 1,y) in white
+            down = (x,y - 1) not in white and (x,y + 1) in white
+            if across or down:
+                n += 1
+                found.append((n,(x,y),across,down))
+    return found
+
+# the cells of the run starting at cell
+def run(white,cell,across):
+    cells = []
+    x,y = cell
+    while (x,y) in white:
+        cells.append((x,y))
+        x,y = (x + 1,y) if across else (x,y + 1)
+    return cells
+
+# the error for a clue that can't be written
+def _unnumbered(cell,across):
+    return ValueError("Across Lite can't have the %s clue at %d,%d (only clues filling whole runs of "
+                      "cells, numbered the usual way)" % (across and 'across' or 'down',cell[0],cell[1]))
+
+def _encode(s):
+    return (s or '').encode(ENCODING,'replace')
+
+# write a built crossword to out (a binary file)
+def write_puz(out,grid,metadata):
+    width,height,letters = interchange.grid_cells(grid)
+    if width > 255 or height > 255:
+        raise ValueError("Across Lite crosswords can't be bigger than 255x255")
+    missing = [cell for cell,letter in letters.items() if not letter]
+    if missing:
+        raise ValueError("Across Lite crosswords need every letter (there isn't one at %d,%d)" % min(missing))
+    for cell,letter in sorted(letters.items()):
+        upper = letter.upper() # (what's written)
+        if len(upper) != 1 or ord(upper) > 255:
+            raise ValueError("Across Lite crosswords can only have letters that are one Latin-1 character in upper case (not '%s' at %d,%d)" % (
+                (letter,) + cell))
+
+    across,down = interchange.grid_entries(grid)
+    clues = {} # (cell, across) => text
+    for e in across + down:
+        text = e.text
+        if e.spec and not e.spec.isdigit():
+            text = '%s (%s)' % (text,e.spec)
+        clues[(e.cells[0],e.across)] = (e,text)
+        for part in e.parts:
+            clues[(part.cells[0],part.across)] = (part,'See %d-%s' % (e.number,e.direction().lower()))
+
+    white = set(letters)
+    texts = []
+    for n,cell,a,d in numbering(width,height,white):
+        for is_across,starts in ((True,a),(False,d)):
+            if not starts:
+                continue
+            e,text = clues.pop((cell,is_across),(None,None))
+            if e is None or e.cells != run(white,cell,is_across):
+                raise _unnumbered(cell,is_across)
+            texts.append(_encode(text))
+    if clues:
+        raise _unnumbered(*min(clues))
+
+    solution = bytes(ord(letters[(x,y)].upper()) if (x,y) in white else ord('.')
+                     for y in range(height) for x in range(width))
+    state = bytes(ord('-') if (x,y) in white else ord('.')
+                  for y in range(height) for x in range(width))
+    title = _encode(metadata.get('title'))
+    author = _encode(metadata.get('author'))
+    copyright = _encode(metadata.get('copyright'))
+    notes = _encode(metadata.get('notes'))
+
+    cib = struct.pack('<BBHHH',width,height,len(texts),1,0)
+    overall,c_cib,masked = checksums(cib,solution,state,title,author,copyright,texts,notes)
+    out.write(HEADER.pack(overall,MAGIC,c_cib,masked,VERSION,0,width,height,len(texts),1,0))
+    out.write(solution)
+    out.write(state)
+    for s in [title,author,copyright] + texts + [notes]:
+        out.write(s + b'\0')
+
+# the lines of a clue file for the .puz data (bytes). The checksums
+# have to be right
+def read_puz(data):
+    start = data.find(MAGIC) - 2 # (some files have junk at the start)
+    if start < 0 or len(data) < start + HEADER.size:
+        raise ValueError("Not an Across Lite file")
+    data = data[start:]
+    overall,magic,c_cib,masked,version,c_scrambled,width,height,nclues,bitmask,scrambled = HEADER.unpack_from(data)
+    pos = HEADER.size
+    size = width * height
+    solution = data[pos:pos + size]
+    state = data[pos + size:pos + 2 * size]
+    pos += 2 * size
+    strings = data[pos:].split(b'\0')
+    if len(solution) != size or len(state) != size or len(strings) < nclues + 4:
+        raise ValueError("The Across Lite file is cut short")
+    title,author,copyright = strings[:3]
+    texts = strings[3:3 + nclues]
+    notes = strings[3 + nclues]
+
+    if (overall,c_cib,masked) != checksums(data[CIB_START:CIB_END],solution,state,title,author,copyright,
+                                           texts,notes if version >= VERSION else b''):
+        raise ValueError("The checksums of the Across Lite file are wrong")
+
+    white = set()
+    letters = {}
+    for y in range(height):
+        for x in range(width):
+            ch = chr(solution[y * width + x])
+            if ch != '.':
+                white.add((x,y))
+                letters[(x,y)] = None if scrambled or not ch.isalpha() else ch.lower()
+
+    entries = {} # (number, across) => Entry
+    order = []
+    texts = iter(texts)
+    for n,cell,a,d in numbering(width,height,white):
+        for is_across,starts in ((True,a),(False,d)):
+            if not starts:
+                continue
+            text = next(texts,None)
+            if text is None:
+                raise ValueError("The Across Lite file doesn't have enough clues")
+            text = text.decode(ENCODING)
+            cells = run(white,cell,is_across)
+            spec = None
+            m = RE_ENUMERATION.search(text)
+            if m:
+                text = text[:m.start()]
+                spec = m.group(1)
+            e = interchange.Entry(n,is_across,cells,text,spec)
+            entries[(n,is_across)] = e
+            order.append(e)
+
+    # the later parts of separated clues
+    children = set()
+    for e in order:
+        m = RE_SEE.match(e.text)
+        if m and (int(m.group(1)),m.group(2).lower() == 'across') in entries:
+            parent = entries[(int(m.group(1)),m.group(2).lower() == 'across')]
+            if parent is not e:
+                parent.parts.append(e)
+                children.add(id(e))
+
+    metadata = {}
+    for key,value in [('title',title),('author',author),('copyright',copyright),('notes',notes)]:
+        if value:
+            metadata[key] = value.decode(ENCODING)
+    lines = list(interchange.metadata_lines(metadata))
+    for e in order:
+        if id(e) not in children:
+            lines.append(interchange.entry_line(e,letters))
+    return lines
+
+def read_puz_file(filename):
+    with open(filename,'rb') as f:
+        return read_puz(f.read())
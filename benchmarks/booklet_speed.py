@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# booklet_speed.py
+
+# compares an edition of n random crosswords (see generate.py) made as
+# one booklet (see crossworder.write_booklet) to n separate documents:
+# the time to write the LaTeX, its size and, if pdflatex is installed,
+# the time pdflatex takes on all of it (which is where the booklet
+# saves time, since LaTeX and its packages are only loaded once).
+#
+#     python3 benchmarks/booklet_speed.py [-n puzzles] [-s seed] [--solutions] [SIZE]
+
+import os, sys, io, getopt, time, shutil, subprocess, tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import crossworder
+import generate
+
+# the time to run pdflatex on each of some LaTeX documents
+def pdflatex_time(documents):
+    with tempfile.TemporaryDirectory() as tmp:
+        for n,latex in enumerate(documents):
+            with open(os.path.join(tmp,'puzzle%d.tex' % n),'w') as f:
+                f.write(latex)
+        start = time.perf_counter()
+        for n in range(len(documents)):
+            subprocess.run(['pdflatex','-interaction=batchmode','puzzle%d.tex' % n],cwd=tmp,
+                           stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'n:s:',['solutions'])
+    count = 40
+    seed = 0
+    solutions = False
+    for op,arg in ops:
+        if op == '-n':
+            count = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+        elif op == '--solutions':
+            solutions = True
+
+    width,height = generate.parse_size(args[0] if args else '15x15')
+    puzzles = []
+    for i in range(count):
+        metadata,clues = crossworder.load_clues(list(generate.generate(width,height,seed + i)))
+        puzzles.append((metadata,crossworder.make_grid(clues)))
+
+    start = time.perf_counter()
+    separate = [crossworder.render_as_latex(grid,metadata) for metadata,grid in puzzles]
+    if solutions:
+        separate += [crossworder.render_as_latex(grid,metadata,True) for metadata,grid in puzzles]
+    separate_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    out = io.StringIO()
+    crossworder.write_booklet(out,puzzles,solutions=solutions)
+    booklet = out.getvalue()
+    booklet_time = time.perf_counter() - start
+
+    print('%d puzzles %dx%d%s' % (count,width,height,solutions and ' with solutions' or ''))
+    print('separate %3d documents  latex %.3fs %9d bytes' % (len(separate),separate_time,sum(map(len,separate))))
+    print('booklet  %3d document   latex %.3fs %9d bytes' % (1,booklet_time,len(booklet)))
+    if shutil.which('pdflatex'):
+        print('pdflatex separate %.2fs  booklet %.2fs' % (pdflatex_time(separate),pdflatex_time([booklet])))
+    else:
+        print('pdflatex not found, not timing it',file=sys.stderr)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# clue_memory.py
+
+# compares the memory used by the (slotted) clue.Clue with the same
+# class using an ordinary instance __dict__, by parsing a lot of
+# synthetic clues into each and measuring the allocations with
+# tracemalloc, along with the size of each instance (with its
+# __dict__, if it has one). Each class is measured in its own fresh
+# process, after a warm-up parse of some other lines, so that neither
+# pays for one-off allocations (like interning the words, or
+# tracemalloc's own bookkeeping) that the other then gets for free.
+#
+#     python3 benchmarks/clue_memory.py [-n number_of_clues] [-s seed]
+
+import os, sys, getopt, json, subprocess, tracemalloc
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import clue
+from common import make_lines
+
+# clue.Clue without __slots__ (i.e. how it used to be)
+DictClue = type('DictClue',(object,),
+                dict((k,v) for k,v in vars(clue.Clue).items()
+                     if k not in clue.Clue.__slots__ and k != '__slots__'))
+
+CLASSES = [('__dict__',DictClue),('__slots__',clue.Clue)]
+
+# the lines parsed before measuring
+WARM_UP = 1000
+
+# the size of one clue, with its __dict__
+def instance_size(c):
+    return sys.getsizeof(c) + (sys.getsizeof(c.__dict__) if hasattr(c,'__dict__') else 0)
+
+# parse all the lines, building the clues with the class cls, and
+# return (bytes allocated, the clues)
+def measure(lines,cls):
+    original = clue.Clue
+    clue.Clue = cls
+    try:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        clues = [c for l in lines for c in clue.parse_clues(l)]
+        for i,c in enumerate(clues):
+            c.number(i + 1)
+        size = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+    finally:
+        clue.Clue = original
+    return size,clues
+
+# measure the class called name, in this process: {bytes allocated,
+# number of clues, bytes per instance}
+def measure_one(name,n,seed):
+    cls = dict(CLASSES)[name]
+    measure(make_lines(WARM_UP,seed + 1),cls)
+    size,clues = measure(make_lines(n,seed),cls)
+    return {'bytes':size,'clues':len(clues), # (separated clues are more than one)
+            'instance':sum(instance_size(c) for c in clues) / len(clues)}
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'n:s:c:')
+    n = 100000
+    seed = 0
+    only = None
+    for op,arg in ops:
+        if op == '-n':
+            n = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+        elif op == '-c': # (just measure this class, and print the JSON)
+            only = arg
+
+    if only:
+        print(json.dumps(measure_one(only,n,seed)))
+        sys.exit(0)
+
+    results = []
+    for name,cls in CLASSES:
+        out = subprocess.run([sys.executable,os.path.abspath(__file__),'-n',str(n),'-s',str(seed),'-c',name],
+                             stdout=subprocess.PIPE,check=True).stdout
+        r = json.loads(out)
+        results.append(r)
+        print('%-10s %12d bytes %8.1f bytes/clue %6.1f bytes/instance' % (
+            name,r['bytes'],r['bytes'] / r['clues'],r['instance']))
+    print('saving: %.1f%% (%.1f%% per instance)' % (100 * (1 - results[1]['bytes'] / results[0]['bytes']),
+                                                   100 * (1 - results[1]['instance'] / results[0]['instance'])))
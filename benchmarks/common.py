@@ -0,0 +1,53 @@
+# common.py
+
+# helpers shared by the benchmarks: timing things, and synthetic clue
+# lines (for the clue parser on its own; see generate.py for whole
+# crosswords)
+
+import random, time
+
+WORDS = ['employ','crack','garbageman','misspelling','edict','edits',
+         'curdling','israeli','flashy','nicest','abetting','sesquicentenary']
+
+# (the time f takes, what it returns). If times is given, the time is
+# added to it too, even if f raises an exception
+def timed(f,times=None):
+    start = time.perf_counter()
+    try:
+        result = f()
+    finally:
+        t = time.perf_counter() - start
+        if times is not None:
+            times.append(t)
+    return (t,result)
+
+# (the best time over repeats to call f, what it returned the last
+# time)
+def best_time(f,repeats):
+    best = float('inf')
+    result = None
+    for _ in range(repeats):
+        t,result = timed(f)
+        best = min(best,t)
+    return (best,result)
+
+# n synthetic clue lines, with a mix of plain answers, multi-word
+# answers, length specs, named clues and separated clues
+def make_lines(n,seed):
+    rand = random.Random(seed)
+    lines = []
+    for i in range(n):
+        x,y = i % 1000, i // 1000
+        kind = rand.random()
+        if kind < 0.5: # plain answer
+            answer = rand.choice(WORDS)
+        elif kind < 0.7: # more than one word
+            answer = '%s %s-%s' % tuple(rand.choice(WORDS) for _ in range(3))
+        elif kind < 0.9: # length spec
+            answer = '(%d,%d)' % (rand.randint(1,9),rand.randint(1,9))
+        else: # separated
+            lines.append('d&a|%d&%d|%d&%d|%s &%s|See <c%d>' % (
+                x,x + 1,y,y + 1,rand.choice(WORDS),rand.choice(WORDS),i - 1))
+            continue
+        lines.append('<c%d>%s|%d|%d|%s|Clue number %d' % (i,rand.choice('ad'),x,y,answer,i))
+    return lines
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# convert_speed.py
+
+# times converting an archive of crosswords between formats with
+# convert (see crossworder.convert_batch), in puzzles/sec. n random
+# crosswords of the given size (see generate.py, with every answer
+# there, since Across Lite needs all of the letters) are written in
+# each input format and packed into a .tar.gz, which is converted into
+# each output format with a pool of j workers, and also one at a time
+# in this process (convert_file) for comparison.
+#
+# Every conversion is checked: each file written is read back in and
+# has to give the same LaTeX (with the answers) as the crossword it
+# came from.
+#
+#     python3 benchmarks/convert_speed.py [-n puzzles] [-j workers] [-s seed] [SIZE ...]
+
+import os, sys, io, getopt, time, tarfile, tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import crossworder
+import generate
+
+DEFAULT_SIZES = ['15x15','50x50']
+
+FORMATS = ['crossword','ipuz','puz']
+
+# the LaTeX (with the answers) for a crossword file
+def latex(filename):
+    metadata,grid = crossworder.load_grid(filename)
+    return crossworder.render_as_latex(grid,metadata,True)
+
+# write puzzles (a list of (name, metadata, grid)) in format into an
+# archive, returns its name
+def make_archive(tmp,puzzles,format):
+    name = os.path.join(tmp,'%s.tar.gz' % format)
+    binary = format in crossworder.BINARY_FORMATS
+    with tarfile.open(name,'w:gz') as archive:
+        for base,metadata,grid in puzzles:
+            out = io.BytesIO() if binary else io.StringIO()
+            crossworder.write_output(out,grid,metadata,True,False,format)
+            data = out.getvalue() if binary else out.getvalue().encode('utf-8')
+            info = tarfile.TarInfo(base + crossworder.FORMATS[format])
+            info.size = len(data)
+            archive.addfile(info,io.BytesIO(data))
+    return name
+
+# check that everything converted into outdir is the same as the
+# originals (name => LaTeX)
+def check(outdir,expected,format):
+    for base,original in expected.items():
+        if latex(os.path.join(outdir,base + crossworder.FORMATS[format])) != original:
+            raise AssertionError('%s is different after converting to %s' % (base,format))
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'n:j:s:')
+    count = 100
+    workers = None
+    seed = 0
+    for op,arg in ops:
+        if op == '-n':
+            count = int(arg)
+        elif op == '-j':
+            workers = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+
+    print('%d puzzles, %d workers' % (count,workers or os.cpu_count()))
+    for size in args or DEFAULT_SIZES:
+        width,height = generate.parse_size(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            puzzles = []
+            expected = {}
+            for i in range(count):
+                base = 'puzzle%04d' % i
+                metadata = {}
+                grid = crossworder.make_grid(crossworder.stream_clues(
+                    generate.generate(width,height,seed + i,specs=False),metadata))
+                puzzles.append((base,metadata,grid))
+                expected[base] = crossworder.render_as_latex(grid,metadata,True)
+            archives = dict((f,make_archive(tmp,puzzles,f)) for f in FORMATS)
+            del puzzles
+
+            for source in FORMATS:
+                results = []
+                for target in FORMATS:
+                    outdir = os.path.join(tmp,'%s-%s' % (source,target))
+                    start = time.perf_counter()
+                    converted,failed = crossworder.convert_batch([archives[source]],outdir,target,workers=workers)
+                    pool = time.perf_counter() - start
+                    if failed or converted != count:
+                        raise AssertionError('%d of %d failed converting %s to %s' % (len(failed),count,source,target))
+                    check(outdir,expected,target)
+
+                    start = time.perf_counter()
+                    for s in crossworder.iter_sources([archives[source]]):
+                        crossworder.convert_file(s,outdir,target)
+                    serial = time.perf_counter() - start
+                    results.append('%s %7.1f/s (%6.1f/s serial)' % (target,count / pool,count / serial))
+                print('%-8s %-9s -> %s' % (size,source,'  '.join(results)))
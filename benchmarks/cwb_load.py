@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+# cwb_load.py
+
+# compares the time to get a built grid from a text crossword
+# (from_file + make_grid) and from the compiled binary format
+# (cwb.load), on random crosswords of various sizes (see generate.py).
+#
+#     python3 benchmarks/cwb_load.py [-r repeats] [-s seed] [SIZE ...]
+
+import os, sys, getopt, tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import crossworder, cwb
+import generate
+from common import best_time
+
+DEFAULT_SIZES = ['15x15','100x100','300x300','1000x1000']
+
+def text_load(filename):
+    metadata,clues = crossworder.from_file(filename)
+    crossworder.make_grid(clues)
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'r:s:')
+    repeats = 3
+    seed = 0
+    for op,arg in ops:
+        if op == '-r':
+            repeats = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args or DEFAULT_SIZES:
+            width,height = generate.parse_size(size)
+            text = os.path.join(tmp,size + crossworder.EXTENSION)
+            binary = os.path.join(tmp,size + cwb.EXTENSION)
+            with open(text,'w') as f:
+                for line in generate.generate(width,height,seed):
+                    print(line,file=f)
+            crossworder.compile_file(text,binary)
+
+            t,_ = best_time(lambda: text_load(text),repeats)
+            b,_ = best_time(lambda: cwb.load(binary),repeats)
+            print('%-10s text %.3fs (%8d bytes)  cwb %.3fs (%8d bytes)  %.1fx' % (
+                size,t,os.path.getsize(text),b,os.path.getsize(binary),t / b))
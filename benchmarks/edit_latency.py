@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# edit_latency.py
+
+# times editing a Puzzle (see puzzle.py) on random crosswords of
+# various sizes (see generate.py), compared to building the grid again
+# from scratch. Each edit is one of
+#
+#   answer   swap a clue between its answer and a length spec
+#   remove   remove a clue, and add it back (each timed)
+#   move     move a clue out past the edge of the grid, and back
+#   clash    change a letter of an answer that has crossings, which is
+#            rejected
+#
+# and after every c edits (and at the end), the puzzle is checked
+# against building it from scratch from lines(): the LaTeX (with and
+# without the answers) has to be the same.
+#
+#     python3 benchmarks/edit_latency.py [-n edits] [-c check_every] [-s seed] [SIZE ...]
+
+import os, sys, getopt, time, random
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import crossworder, puzzle
+import generate
+from common import timed
+
+DEFAULT_SIZES = ['15x15','100x100','300x300']
+
+# the LaTeX for a puzzle, and for building it from scratch
+def check(p):
+    metadata = {}
+    grid = crossworder.make_grid(crossworder.stream_clues(p.lines(),metadata))
+    for answers in [False,True]:
+        if (crossworder.render_as_latex(p.grid,p.metadata,answers) !=
+            crossworder.render_as_latex(grid,metadata,answers)):
+            raise AssertionError('the puzzle is different from building it from scratch')
+
+def percentiles(times):
+    times = sorted(times)
+    return 'p50 %.3fms p99 %.3fms' % (1000 * times[len(times) // 2],
+                                      1000 * times[min(len(times) - 1,int(0.99 * len(times)))])
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'n:c:s:')
+    edits = 1000
+    every = 100
+    seed = 0
+    for op,arg in ops:
+        if op == '-n':
+            edits = int(arg)
+        elif op == '-c':
+            every = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+
+    for size in args or DEFAULT_SIZES:
+        width,height = generate.parse_size(size)
+        lines = list(generate.generate(width,height,seed))
+
+        start = time.perf_counter()
+        metadata = {}
+        crossworder.make_grid(crossworder.stream_clues(lines,metadata))
+        rebuild = time.perf_counter() - start
+
+        start = time.perf_counter()
+        p = puzzle.Puzzle.load(lines)
+        load = time.perf_counter() - start
+        check(p)
+
+        rand = random.Random(seed)
+        times = dict((kind,[]) for kind in ['answer','remove','add','move','clash'])
+        answers = {} # id => the answer it had, for those swapped to a length spec
+        for n in range(1,edits + 1):
+            ids = p.ids()
+            id = rand.choice(ids)
+            c = p.clue(id)
+            kind = rand.choice(['answer','remove','move','clash'])
+            if kind == 'answer' and not c.children():
+                if id in answers:
+                    answer = answers.pop(id)
+                    timed(lambda: p.set_answer(id,answer),times['answer'])
+                elif c.answer():
+                    answers[id] = c.answer()
+                    timed(lambda: p.set_answer(id,'(%s)' % c.length_spec()),times['answer'])
+            elif kind == 'remove' and id not in answers:
+                line = p.line(id)
+                try:
+                    timed(lambda: p.remove_clue(id),times['remove'])
+                except ValueError: # something refers to it
+                    continue
+                timed(lambda: p.add_clue(line),times['add'])
+            elif kind == 'move':
+                x,y = c.startpoint()
+                timed(lambda: p.move_clue(id,x + 2 * width,y),times['move'])
+                timed(lambda: p.move_clue(id,x,y),times['move'])
+            elif kind == 'clash' and c.answer() and not c.children():
+                answer = c.answer()
+                letter = 'Z' if answer[0] != 'Z' else 'Q'
+                try:
+                    timed(lambda: p.set_answer(id,letter + answer[1:]),times['clash'])
+                except ValueError:
+                    pass
+                else: # nothing crosses it there, so put it back
+                    p.set_answer(id,answer)
+            if n % every == 0 or n == edits:
+                check(p)
+
+        print('%-8s %6d clues  rebuild %.3fs  load %.3fs' % (size,len(p),rebuild,load))
+        for kind,t in times.items():
+            if t:
+                print('         %-7s %5d edits  %s' % (kind,len(t),percentiles(t)))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+# fill_speed.py
+
+# times filling in grids with --fill (see fill.py) on progressively
+# larger random grids. Each grid is laid out like generate.py does it,
+# and a fraction of the clues are given as length specs (some with
+# two words) rather than answers. The word list has the words that
+# were there, and for each of them d distractors: a couple with one
+# letter changed (which fit some of the crossings, so the search has
+# to back out of them) and a random one, all shuffled together. The
+# filled in clues are checked by building the grid. A fill that tries
+# more than limit entries is given up on.
+#
+#     python3 benchmarks/fill_speed.py [-s seed] [-f blank_fraction] [-d distractors] [-l limit] [SIZE ...]
+
+import os, sys, getopt, time, random
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import crossworder, fill, wordlist
+import generate
+
+DEFAULT_SIZES = ['5x5','10x10','15x15','25x25','50x50','100x100']
+
+# the lines of a random crossword with a fraction blank of its clues
+# as length specs, and the entries of a word list it can be filled
+# from
+def puzzle(width,height,seed=0,blank=0.5,distractors=3,black=0.15):
+    rand = random.Random(seed)
+    white = [[rand.random() >= black for _ in range(width)] for _ in range(height)]
+    letters = [[rand.choice(generate.LETTERS) for _ in range(width)] for _ in range(height)]
+
+    slots = []
+    for y,row in enumerate(white):
+        for x,length in generate.runs(row):
+            slots.append(('a',x,y,''.join(letters[y][x:x + length])))
+    for x in range(width):
+        column = [white[y][x] for y in range(height)]
+        for y,length in generate.runs(column):
+            slots.append(('d',x,y,''.join(letters[i][x] for i in range(y,y + length))))
+
+    # a word can only be used once in a fill, so words that come up
+    # more than once (short ones, usually) are left as answers
+    counts = {}
+    for d,x,y,word in slots:
+        counts[word] = counts.get(word,0) + 1
+
+    lines = ['@title: Fill %dx%d' % (width,height)]
+    entries = []
+    for i,(d,x,y,word) in enumerate(slots):
+        if rand.random() >= blank or counts[word] > 1:
+            lines.append('%s|%d|%d|%s|Clue %d' % (d,x,y,word,i))
+            continue
+        if len(word) > 5 and rand.random() < 0.2: # two words
+            split = rand.randint(2,len(word) - 2)
+            spec = '%d,%d' % (split,len(word) - split)
+            entries.append('%s %s' % (word[:split],word[split:]))
+        else:
+            spec = '%d' % len(word)
+            entries.append(word)
+        lines.append('%s|%d|%d|(%s)|Clue %d' % (d,x,y,spec,i))
+        for k in range(distractors):
+            if k == distractors - 1:
+                entries.append(''.join(rand.choice(generate.LETTERS) for _ in word))
+            else:
+                p = rand.randrange(len(word))
+                entries.append(word[:p] + rand.choice(generate.LETTERS) + word[p + 1:])
+    rand.shuffle(entries)
+    return (lines,entries)
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'s:f:d:l:')
+    seed = 0
+    blank = 0.5
+    distractors = 3
+    limit = 10**6
+    for op,arg in ops:
+        if op == '-s':
+            seed = int(arg)
+        elif op == '-f':
+            blank = float(arg)
+        elif op == '-d':
+            distractors = int(arg)
+        elif op == '-l':
+            limit = int(arg)
+
+    for size in args or DEFAULT_SIZES:
+        width,height = generate.parse_size(size)
+        lines,entries = puzzle(width,height,seed,blank,distractors)
+        metadata,clues = crossworder.load_clues(lines)
+
+        start = time.perf_counter()
+        index = wordlist.WordIndex(entries)
+        indexed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        filler = fill.Filler(clues,index)
+        try:
+            filled = filler.fill(limit)
+        except ValueError as e:
+            print('%-8s %s (%.3fs, %d backtracks)' % (size,e,time.perf_counter() - start,filler.backtracks))
+            continue
+        t = time.perf_counter() - start
+
+        grid = crossworder.make_grid(clues) # fails if the letters don't match
+        assert all(cell[0] for i,j,cell in grid.cells()),'a cell was left empty'
+        print('%-8s %5d slots filled  %6d words  index %.3fs  fill %.3fs  %8d tries %7d backtracks' % (
+            size,filled,len(index),indexed,t,filler.nodes,filler.backtracks))
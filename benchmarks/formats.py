@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# formats.py
+
+# compares how fast a built grid can be rendered in each output format
+# (LaTeX, SVG and PNG), in puzzles per second, on random crosswords of
+# various sizes (see generate.py). The LaTeX still has to go through
+# pdflatex to be seen, so with -l that is timed too (if it's
+# installed).
+#
+#     python3 benchmarks/formats.py [-r repeats] [-s seed] [-A] [-l] [SIZE ...]
+
+import os, sys, io, getopt, time, shutil, subprocess, tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import crossworder
+import generate
+from common import best_time
+
+DEFAULT_SIZES = ['15x15','50x50','100x100']
+
+def render(grid,metadata,answers,format):
+    out = io.BytesIO() if format == 'png' else io.StringIO()
+    crossworder.write_output(out,grid,metadata,answers,False,format)
+    return out.getvalue()
+
+# the time to run pdflatex on some LaTeX
+def pdflatex_time(latex):
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp,'puzzle.tex'),'w') as f:
+            f.write(latex)
+        start = time.perf_counter()
+        subprocess.run(['pdflatex','-interaction=batchmode','puzzle.tex'],cwd=tmp,
+                       stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'r:s:Al')
+    repeats = 3
+    seed = 0
+    answers = False
+    latex = False
+    for op,arg in ops:
+        if op == '-r':
+            repeats = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+        elif op == '-A':
+            answers = True
+        elif op == '-l':
+            latex = True
+    if latex and not shutil.which('pdflatex'):
+        print('pdflatex not found, not timing it',file=sys.stderr)
+        latex = False
+
+    for size in args or DEFAULT_SIZES:
+        width,height = generate.parse_size(size)
+        metadata,clues = crossworder.load_clues(list(generate.generate(width,height,seed)))
+        grid = crossworder.make_grid(clues)
+
+        results = []
+        for format in ['latex','svg','png']:
+            t,_ = best_time(lambda: render(grid,metadata,answers,format),repeats)
+            size_out = len(render(grid,metadata,answers,format))
+            results.append('%s %.4fs %7.1f/s %8d bytes' % (format,t,1 / t,size_out))
+        if latex:
+            t = pdflatex_time(crossworder.render_as_latex(grid,metadata,answers))
+            results.append('pdflatex %.2fs' % t)
+        print('%-10s %s' % (size,'  '.join(results)))
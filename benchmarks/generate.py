@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+# generate.py
+
+# generates random (but valid) crosswords for benchmarking. A random
+# letter is put in every cell of a width x height grid, with some
+# cells made black, and every run of 2 or more white cells becomes a
+# clue, so the crossing letters always match. The clues have a mix of
+# answers (some with several words) and length specs, some are joined
+# into separated (&) clues, and some are named and referred to by
+# other clues with <name>.
+#
+#     python3 benchmarks/generate.py [-s seed] [-b black_fraction] WIDTHxHEIGHT > file.crossword
+
+import sys, getopt, random
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+# parse a size like "15x15" into (width, height)
+def parse_size(s):
+    w,h = s.lower().split('x')
+    return (int(w),int(h))
+
+# the runs of 2 or more white cells in a line of cells (a list of
+# booleans, True for white), as (start, length)
+def runs(line):
+    found = []
+    start = None
+    for i,white in enumerate(line + [False]):
+        if white and start is None:
+            start = i
+        elif not white and start is not None:
+            if i - start > 1:
+                found.append((start,i - start))
+            start = None
+    return found
+
+# the answer for letters, as a plain word, several words or a length
+# spec (returns (answer field, letters)). Without specs, it's never a
+# length spec
+def make_answer(rand,letters,specs=True):
+    kind = rand.random()
+    if kind < 0.2 and specs: # length spec
+        return ('(%d)' % len(letters),letters)
+    elif 0.2 <= kind < 0.35 and len(letters) > 3: # two words
+        split = rand.randint(1,len(letters) - 1)
+        return ('%s %s' % (letters[:split],letters[split:]),letters)
+    return (letters,letters)
+
+# generate the lines of a random crossword of the given size (with
+# specs=False, every clue has its answer, for formats that need all
+# of the letters; it's otherwise the same crossword)
+def generate(width,height,seed=0,black=0.15,specs=True):
+    rand = random.Random(seed)
+    white = [[rand.random() >= black for _ in range(width)] for _ in range(height)]
+    letters = [[rand.choice(LETTERS) for _ in range(width)] for _ in range(height)]
+
+    yield '# random %dx%d crossword (seed %d)' % (width,height,seed)
+    yield '@title: Random %dx%d' % (width,height)
+    yield '@author: generate.py'
+
+    # (direction, x, y, letters) for every slot
+    slots = []
+    for y,row in enumerate(white):
+        for x,length in runs(row):
+            slots.append(('a',x,y,''.join(letters[y][x:x + length])))
+    for x in range(width):
+        column = [white[y][x] for y in range(height)]
+        for y,length in runs(column):
+            slots.append(('d',x,y,''.join(letters[i][x] for i in range(y,y + length))))
+    rand.shuffle(slots)
+
+    named = [] # names that have been used, so can be referred to
+    i = 0
+    while i < len(slots):
+        d,x,y,word = slots[i]
+        kind = rand.random()
+        if kind < 0.05 and i + 1 < len(slots): # separated clue
+            d2,x2,y2,word2 = slots[i + 1]
+            if rand.random() < 0.5 or not specs:
+                answer = '%s&%s' % (word,word2)
+            else:
+                answer = '(%d&%d)' % (len(word),len(word2))
+            yield '%s&%s|%d&%d|%d&%d|%s|Separated clue %d' % (d,d2,x,x2,y,y2,answer,i)
+            i += 2
+            continue
+
+        text = 'Clue %d' % i
+        if named and rand.random() < 0.1: # refer to another clue
+            text += ', see <%s>' % rand.choice(named)
+        prefix = ''
+        if kind < 0.15: # give it a name
+            prefix = '<c%d>' % i
+            named.append('c%d' % i)
+        answer,_ = make_answer(rand,word,specs)
+        yield '%s%s|%d|%d|%s|%s' % (prefix,d,x,y,answer,text)
+        i += 1
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'s:b:')
+    seed = 0
+    black = 0.15
+    for op,arg in ops:
+        if op == '-s':
+            seed = int(arg)
+        elif op == '-b':
+            black = float(arg)
+    if len(args) != 1:
+        print('Usage: generate.py [-s seed] [-b black_fraction] WIDTHxHEIGHT',file=sys.stderr)
+        sys.exit(2)
+
+    width,height = parse_size(args[0])
+    for line in generate(width,height,seed,black):
+        print(line)
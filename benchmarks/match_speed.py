@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# match_speed.py
+
+# times looking up patterns like "c?o??w" in a big word list, with the
+# index file (see wordlist.py) mapped into memory, compared to loading
+# the text of the word list and to scanning it with a regex. The word
+# list is n random words (letters picked with roughly English
+# frequencies, 3 to 15 long, some of them phrases), and each query is
+# an entry with some of its letters blanked out. The lookups are timed
+# on their own (just counting the matches) and with the matching
+# entries read out, which is most of the time for patterns matching
+# thousands of entries. The matches from the index file are checked
+# against the in-memory index.
+#
+#     python3 benchmarks/match_speed.py [-n words] [-q queries] [-b blank_fraction] [-s seed]
+
+import os, sys, getopt, time, random, re, tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import wordlist
+from common import timed
+
+FREQUENT = 'eeeeeeeeeeeetttttttttaaaaaaaaooooooooiiiiiiinnnnnnnsssssshhhhhhrrrrrrddddllllcccuuummwwffggyyppbbvkjxqz'
+
+# n random entries
+def words(n,seed=0):
+    rand = random.Random(seed)
+    for _ in range(n):
+        word = ''.join(rand.choice(FREQUENT) for _ in range(rand.randint(3,15)))
+        if len(word) > 6 and rand.random() < 0.1:
+            split = rand.randint(2,len(word) - 3)
+            word = '%s %s' % (word[:split],word[split:])
+        yield word
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'n:q:b:s:')
+    n = 200000
+    queries = 1000
+    blank = 0.5
+    seed = 0
+    for op,arg in ops:
+        if op == '-n':
+            n = int(arg)
+        elif op == '-q':
+            queries = int(arg)
+        elif op == '-b':
+            blank = float(arg)
+        elif op == '-s':
+            seed = int(arg)
+
+    entries = list(words(n,seed))
+    rand = random.Random(seed + 1)
+    patterns = []
+    for e in rand.sample(entries,queries):
+        patterns.append(''.join(ch if ch == ' ' or rand.random() >= blank else '?' for ch in e))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        text = os.path.join(tmp,'words.txt')
+        with open(text,'w') as f:
+            f.write('\n'.join(entries) + '\n')
+        t_load,memory = timed(lambda: wordlist.WordIndex.load(text))
+        indexfile = os.path.join(tmp,'words' + wordlist.EXTENSION)
+        t_save,_ = timed(lambda: memory.save(indexfile))
+        t_open,mapped = timed(lambda: wordlist.MappedIndex(indexfile))
+        print('%d entries: load text %.3fs, save index %.3fs (%d bytes), open index %.4fs' % (
+            len(memory),t_load,t_save,os.path.getsize(indexfile),t_open))
+
+        def report(name,latencies):
+            latencies.sort()
+            print('%s p50 %.3fms p99 %.3fms max %.3fms' % (
+                name,1000 * latencies[len(latencies) // 2],1000 * latencies[int(0.99 * len(latencies))],
+                1000 * latencies[-1]))
+        lookups = []
+        matches = []
+        total = 0
+        for p in patterns:
+            parsed = wordlist.parse_pattern(p)
+            t,count = timed(lambda: wordlist.popcount(mapped.candidates(*parsed)))
+            lookups.append(t)
+            t,found = timed(lambda: mapped.match(*parsed))
+            matches.append(t)
+            total += count
+            assert found == memory.match(*parsed),p
+        report('lookup:    ',lookups)
+        report('match:     ',matches)
+        print('            %.1f matches per query on average, up to %d' % (
+            total / len(patterns),max(len(mapped.match(*wordlist.parse_pattern(p))) for p in patterns)))
+
+        # the same, by scanning every entry
+        sample = patterns[:min(len(patterns),50)]
+        start = time.perf_counter()
+        for p in sample:
+            regex = re.compile('^' + re.escape(p).replace(r'\?','.') + '$')
+            [e for e in entries if regex.match(e)]
+        print('regex scan: %.3fms per query' % (1000 * (time.perf_counter() - start) / len(sample)))
+        mapped.close()
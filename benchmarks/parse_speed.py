@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+# parse_speed.py
+
+# measures the throughput of clue.tokenise_line (in lines/sec) over a
+# large synthetic corpus with a mix of plain answers, multi-word
+# answers, length specs, named clues and separated clues.
+#
+#     python3 benchmarks/parse_speed.py [-n number_of_lines] [-r repeats] [-s seed]
+
+import os, sys, getopt
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import clue
+from common import best_time, make_lines
+
+# parse all the lines
+def parse(lines):
+    for l in lines:
+        clue.tokenise_line(l)
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'n:r:s:')
+    n = 200000
+    repeats = 3
+    seed = 0
+    for op,arg in ops:
+        if op == '-n':
+            n = int(arg)
+        elif op == '-r':
+            repeats = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+
+    lines = make_lines(n,seed)
+    t,_ = best_time(lambda: parse(lines),repeats)
+    print('%d lines in %.3fs: %.0f lines/sec' % (n,t,n / t))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# run.py
+
+# times the phases of crossworder (load_clues, make_grid -- which
+# includes numbering and resolving names -- and render_as_latex) on
+# random crosswords of various sizes (see generate.py), and records
+# the peak memory of each phase.
+#
+#     python3 benchmarks/run.py [-r repeats] [-s seed] [-e engine] [-o results.json] [SIZE ...]
+#
+# (-e numpy uses the NumPy version of make_grid)
+#
+# the results can be saved as a baseline and later results compared
+# against it, which flags anything that got slower (or bigger) by
+# more than the threshold (default 10%), with a non-zero exit status
+# if there are any regressions:
+#
+#     python3 benchmarks/run.py -o baseline.json
+#     ... change things ...
+#     python3 benchmarks/run.py -o new.json
+#     python3 benchmarks/run.py compare [-t 0.1] baseline.json new.json
+
+import os, sys, getopt, json, time, platform, tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import crossworder
+import generate
+
+DEFAULT_SIZES = ['15x15','100x100','300x300','1000x1000']
+
+# the phases, in order
+PHASES = ['load_clues','make_grid','render_as_latex']
+
+# run every phase on lines once, calling measure(phase) around each
+# one (a context manager), returns the number of clues
+def run_phases(lines,measure,engine='python'):
+    with measure('load_clues'):
+        metadata,clues = crossworder.load_clues(lines)
+    with measure('make_grid'):
+        grid = crossworder.make_grid(clues,engine)
+    with measure('render_as_latex'):
+        crossworder.render_as_latex(grid,metadata)
+    return len(clues)
+
+# a context manager that records the time taken in results[name]
+# (keeping the best time)
+class Timer(object):
+    def __init__(self,results):
+        self.results = results
+    def __call__(self,name):
+        self.name = name
+        return self
+    def __enter__(self):
+        self.start = time.perf_counter()
+    def __exit__(self,*exc):
+        t = time.perf_counter() - self.start
+        self.results[self.name] = min(t,self.results.get(self.name,t))
+
+# a context manager that records the peak memory during a phase in
+# results[name] (tracemalloc must be started)
+class PeakMemory(object):
+    def __init__(self,results):
+        self.results = results
+    def __call__(self,name):
+        self.name = name
+        return self
+    def __enter__(self):
+        tracemalloc.reset_peak()
+    def __exit__(self,*exc):
+        self.results[self.name] = tracemalloc.get_traced_memory()[1]
+
+# benchmark a crossword of the given size
+def bench(size,repeats,seed,engine='python'):
+    width,height = generate.parse_size(size)
+    lines = list(generate.generate(width,height,seed))
+
+    times = {}
+    for _ in range(repeats):
+        clues = run_phases(lines,Timer(times),engine)
+
+    # the memory is measured separately, since tracemalloc slows
+    # everything down
+    memory = {}
+    tracemalloc.start()
+    run_phases(lines,PeakMemory(memory),engine)
+    tracemalloc.stop()
+
+    return {'clues': clues, 'times': times, 'peak_memory': memory}
+
+def run(sizes,repeats,seed,engine='python'):
+    results = {}
+    for size in sizes:
+        results[size] = r = bench(size,repeats,seed,engine)
+        print('%-10s %8d clues  ' % (size,r['clues']) +
+              '  '.join('%s %.3fs %.1fMB' % (p,r['times'][p],r['peak_memory'][p] / 2**20)
+                        for p in PHASES))
+    return {'python': platform.python_version(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeats': repeats,
+            'seed': seed,
+            'engine': engine,
+            'results': results}
+
+# compare two sets of results, printing the changes, returns the
+# list of regressions (size, measurement, phase, ratio)
+def compare(baseline,new,threshold):
+    regressions = []
+    for size,old in sorted(baseline['results'].items()):
+        if size not in new['results']:
+            continue
+        cur = new['results'][size]
+        for kind in ['times','peak_memory']:
+            for phase in PHASES:
+                if phase not in old[kind] or phase not in cur[kind] or not old[kind][phase]:
+                    continue
+                ratio = cur[kind][phase] / old[kind][phase]
+                flag = ''
+                if ratio > 1 + threshold:
+                    flag = '  REGRESSION'
+                    regressions.append((size,kind,phase,ratio))
+                print('%-10s %-12s %-16s %+7.1f%%%s' % (size,kind,phase,100 * (ratio - 1),flag))
+    return regressions
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['compare']:
+        ops,args = getopt.getopt(sys.argv[2:],'t:')
+        threshold = 0.1
+        for op,arg in ops:
+            if op == '-t':
+                threshold = float(arg)
+        if len(args) != 2:
+            print('Usage: run.py compare [-t threshold] baseline.json new.json',file=sys.stderr)
+            sys.exit(2)
+        with open(args[0]) as f:
+            baseline = json.load(f)
+        with open(args[1]) as f:
+            new = json.load(f)
+        regressions = compare(baseline,new,threshold)
+        if regressions:
+            print('%d regressions' % len(regressions))
+            sys.exit(1)
+        sys.exit(0)
+
+    ops,args = getopt.getopt(sys.argv[1:],'r:s:e:o:')
+    repeats = 3
+    seed = 0
+    output = None
+    engine = 'python'
+    for op,arg in ops:
+        if op == '-r':
+            repeats = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+        elif op == '-e':
+            engine = arg
+        elif op == '-o':
+            output = arg
+
+    results = run(args or DEFAULT_SIZES,repeats,seed,engine)
+    if output:
+        with open(output,'w') as f:
+            json.dump(results,f,indent=2,sort_keys=True)
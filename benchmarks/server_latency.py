@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# server_latency.py
+
+# compares getting previews from the render server (see server.py)
+# with running crossworder.py once for each preview, all on localhost.
+# A server is started on a free port, and each of n random crosswords
+# (see generate.py) is rendered twice (without and then with the
+# answers, like an editor would), c requests at a time. The server's
+# /stats are printed at the end.
+#
+#     python3 benchmarks/server_latency.py [-n puzzles] [-c concurrency] [-j workers] [-s seed] [SIZE]
+
+import os, sys, getopt, time, json, asyncio, subprocess, tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import server
+import generate
+
+# send a request, returns (status, body)
+async def request(port,method,path,body=b''):
+    reader,writer = await asyncio.open_connection('127.0.0.1',port)
+    writer.write(('%s %s HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\nConnection: close\r\n\r\n' % (
+        method,path,len(body))).encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head,_,body = response.partition(b'\r\n\r\n')
+    return (int(head.split()[1]),body)
+
+async def bench(texts,concurrency,workers):
+    s = server.Server(workers)
+    listening = await s.start('127.0.0.1',0)
+    port = listening.sockets[0].getsockname()[1]
+
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+    async def preview(text,answers):
+        async with limit:
+            start = time.perf_counter()
+            status,body = await request(port,'POST','/render?answers=%d' % answers,text.encode('utf-8'))
+            latencies.append(time.perf_counter() - start)
+            assert status == 200,body
+
+    # warm the workers up
+    await asyncio.gather(*[preview(texts[0],0) for _ in range(len(s._workers))])
+    latencies = []
+
+    start = time.perf_counter()
+    for answers in [0,1]:
+        await asyncio.gather(*[preview(t,answers) for t in texts])
+    total = time.perf_counter() - start
+
+    status,stats = await request(port,'GET','/stats')
+    listening.close()
+    await listening.wait_closed()
+    s.close()
+    return (total,sorted(latencies),json.loads(stats))
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'n:c:j:s:')
+    n = 50
+    concurrency = 8
+    workers = None
+    seed = 0
+    for op,arg in ops:
+        if op == '-n':
+            n = int(arg)
+        elif op == '-c':
+            concurrency = int(arg)
+        elif op == '-j':
+            workers = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+    width,height = generate.parse_size(args[0] if args else '15x15')
+    texts = ['\n'.join(generate.generate(width,height,seed + k)) + '\n' for k in range(n)]
+
+    total,latencies,stats = asyncio.run(bench(texts,concurrency,workers))
+    print('server:     %d previews in %.2fs (%.1f/s), latency p50 %.1fms p99 %.1fms' % (
+        len(latencies),total,len(latencies) / total,
+        1000 * latencies[len(latencies) // 2],1000 * latencies[min(len(latencies) - 1,int(0.99 * len(latencies)))]))
+
+    # the same previews (a few of them), one process each
+    sample = texts[:min(n,10)]
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        for k,text in enumerate(sample):
+            filename = os.path.join(tmp,'%d.crossword' % k)
+            with open(filename,'w') as f:
+                f.write(text)
+            for answers in [[],['-A']]:
+                subprocess.run([sys.executable,os.path.join(HERE,'..','crossworder.py'),'--no-cache'] + answers + [filename],
+                               stdout=subprocess.DEVNULL,check=True)
+        each = (time.perf_counter() - start) / (2 * len(sample))
+    print('subprocess: %.1fms per preview (%.1f/s)' % (1000 * each,1 / each))
+    print(json.dumps(stats,indent=2))
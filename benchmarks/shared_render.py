@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# shared_render.py
+
+# times sharing a built crossword (a grid.BuiltPuzzle from
+# make_grid), on random crosswords of various sizes (see generate.py):
+#
+#  - t threads render it (LaTeX with and without the answers, and SVG)
+#    at the same time, r times each, and get the same as rendering it
+#    in one thread
+#  - it's pickled and rendered in a pool of worker processes, which
+#    get the same again
+#
+# (tests/test_shared_render.py checks that it can't be changed, and
+# that building it doesn't change the parsed clues)
+#
+#     python3 benchmarks/shared_render.py [-t threads] [-r renders] [-j workers] [-s seed] [SIZE ...]
+
+import os, sys, io, getopt, time, pickle, threading
+from concurrent.futures import ProcessPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import crossworder
+import generate
+
+DEFAULT_SIZES = ['15x15','100x100']
+
+# the outputs compared
+RENDERS = [(False,'latex'),(True,'latex'),(True,'svg')]
+
+def render_all(grid,metadata):
+    outputs = []
+    for answers,format in RENDERS:
+        out = io.StringIO()
+        crossworder.write_output(out,grid,metadata,answers,False,format)
+        outputs.append(out.getvalue())
+    return outputs
+
+# (in a worker process)
+def render_pickled(data):
+    metadata,grid = pickle.loads(data)
+    return render_all(grid,metadata)
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'t:r:j:s:')
+    threads = 8
+    renders = 5
+    workers = None
+    seed = 0
+    for op,arg in ops:
+        if op == '-t':
+            threads = int(arg)
+        elif op == '-r':
+            renders = int(arg)
+        elif op == '-j':
+            workers = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+
+    for size in args or DEFAULT_SIZES:
+        width,height = generate.parse_size(size)
+        metadata,clues = crossworder.load_clues(list(generate.generate(width,height,seed)))
+        grid = crossworder.make_grid(clues)
+        expected = render_all(grid,metadata)
+
+        # one thread, then lots at once
+        start = time.perf_counter()
+        for _ in range(renders):
+            render_all(grid,metadata)
+        serial = time.perf_counter() - start
+
+        results = []
+        def run():
+            for _ in range(renders):
+                results.append(render_all(grid,metadata))
+        pool = [threading.Thread(target=run) for _ in range(threads)]
+        start = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        threaded = time.perf_counter() - start
+        if len(results) != threads * renders or any(r != expected for r in results):
+            raise AssertionError('rendering from threads gave something different')
+
+        # and in other processes
+        start = time.perf_counter()
+        data = pickle.dumps((metadata,grid))
+        pickled = time.perf_counter() - start
+        count = workers or os.cpu_count() or 1
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=count) as processes:
+            for r in processes.map(render_pickled,[data] * count):
+                if r != expected:
+                    raise AssertionError('rendering in another process gave something different')
+        processed = time.perf_counter() - start
+
+        print('%-8s %6d clues  serial %6.1f renders/s  %d threads %6.1f renders/s  '
+              'pickle %.3fs %8d bytes  %d processes %.3fs' % (
+                  size,len(clues),renders * len(RENDERS) / serial,threads,
+                  threads * renders * len(RENDERS) / threaded,pickled,len(data),count,processed))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# variants_speed.py
+
+# compares writing the blank puzzle, the answer key and the clue sheet
+# of random crosswords of various sizes (see generate.py) from one
+# build of the grid (see crossworder.write_variants, which shares a
+# Layout between them) to running crossworder once for each (parsing,
+# building and rendering every time). The output of each variant is
+# checked against rendering it on its own.
+#
+#     python3 benchmarks/variants_speed.py [-r repeats] [-s seed] [-C] [SIZE ...]
+
+import os, sys, io, getopt
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import crossworder
+import generate
+from common import best_time
+
+DEFAULT_SIZES = ['15x15','100x100','300x300']
+
+def build(lines):
+    metadata = {}
+    grid = crossworder.make_grid(crossworder.stream_clues(lines,metadata))
+    return (metadata,grid)
+
+def render(grid,metadata,variant,compact):
+    out = io.StringIO()
+    crossworder.write_variant(out,grid,metadata,variant,compact)
+    return out.getvalue()
+
+# each variant from scratch
+def separately(lines,compact):
+    outputs = []
+    for variant in crossworder.VARIANTS:
+        metadata,grid = build(lines)
+        outputs.append(render(grid,metadata,variant,compact))
+    return outputs
+
+# all of them from one build
+def together(lines,compact):
+    metadata,grid = build(lines)
+    layout = crossworder.Layout(grid)
+    return [render(layout,metadata,variant,compact) for variant in crossworder.VARIANTS]
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'r:s:C')
+    repeats = 3
+    seed = 0
+    compact = False
+    for op,arg in ops:
+        if op == '-r':
+            repeats = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+        elif op == '-C':
+            compact = True
+
+    for size in args or DEFAULT_SIZES:
+        width,height = generate.parse_size(size)
+        lines = list(generate.generate(width,height,seed))
+        t_separate,expected = best_time(lambda: separately(lines,compact),repeats)
+        t_together,outputs = best_time(lambda: together(lines,compact),repeats)
+        if outputs != expected:
+            raise AssertionError('the variants are different from rendering them separately')
+        print('%-10s %s: separately %.3fs  one build %.3fs  (%.1fx)' % (
+            size,','.join(crossworder.VARIANTS),t_separate,t_together,t_separate / t_together))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# verify_speed.py
+
+# times checking solvers' submissions against random crosswords of
+# various sizes (see generate.py, with every answer there) with a
+# verify.Solution, in submissions/sec: n whole grids (a fraction of
+# them right, the rest with a few wrong or empty cells) checked one at
+# a time and as a batch with NumPy, and the same as dictionaries of
+# answers to every clue. Every result is checked against going through
+# the cells of each clue of the grid one at a time.
+#
+#     python3 benchmarks/verify_speed.py [-n submissions] [-w wrong] [-s seed] [SIZE ...]
+
+import os, sys, getopt, random
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..'))
+import crossworder, verify
+import generate
+from common import timed
+
+DEFAULT_SIZES = ['15x15','50x50','100x100']
+
+# the fraction of submissions that are right
+RIGHT = 0.5
+
+# random submissions (flat strings, with '.' in the black cells), with
+# up to wrong mistakes (or empty cells, '?') in the ones that aren't
+# right
+def submissions(solution,count,wrong,rand):
+    white = [k for k,c in enumerate(solution.letters) if c != verify.BLACK]
+    right = solution.letters.lower().replace(verify.BLACK,'.')
+    subs = []
+    for _ in range(count):
+        cells = list(right)
+        if rand.random() >= RIGHT:
+            for k in rand.sample(white,rand.randint(1,wrong)):
+                cells[k] = rand.choice('abcdefghijklmnopqrstuvwxyz?')
+        subs.append(''.join(cells))
+    return subs
+
+# the answers to every clue in a submitted grid
+def answers(solution,submitted):
+    return dict(('%d-%s' % key,''.join(submitted[s] for s in spans))
+                for key,spans in zip(solution.keys,solution.spans))
+
+# the slow way, from the grid and its clues
+def naive(grid,submitted):
+    minx,miny = grid.origin()
+    width = grid.width()
+    def letter(x,y):
+        return submitted[(y - miny) * width + (x - minx)].upper()
+    wrong = sorted((j,i) for i,j,cell in grid.cells()
+                   if letter(j + minx,i + miny) != cell[0].upper())
+    clues = []
+    across,down = crossworder.clue_lists(grid)
+    for c in across + down:
+        if c.parent():
+            continue
+        points = [p for part in [c] + list(c.children()) for p in part.points() if grid.get(*p)]
+        if any(letter(x,y) != grid.get(x,y)[0].upper() for x,y in points):
+            clues.append((c.number(),c.direction_name(True)))
+    return (sorted(wrong,key=lambda c: (c[1],c[0])),clues)
+
+if __name__ == '__main__':
+    ops,args = getopt.getopt(sys.argv[1:],'n:w:s:')
+    count = 1000
+    wrong = 5
+    seed = 0
+    for op,arg in ops:
+        if op == '-n':
+            count = int(arg)
+        elif op == '-w':
+            wrong = int(arg)
+        elif op == '-s':
+            seed = int(arg)
+
+    for size in args or DEFAULT_SIZES:
+        width,height = generate.parse_size(size)
+        grid = crossworder.make_grid(crossworder.stream_clues(generate.generate(width,height,seed,specs=False),{}))
+        t_setup,solution = timed(lambda: verify.Solution(grid))
+        subs = submissions(solution,count,wrong,random.Random(seed))
+        batches = [answers(solution,s) for s in subs]
+
+        t_naive,expected = timed(lambda: [naive(grid,s) for s in subs])
+        t_python,checks = timed(lambda: solution.check_grids(subs))
+        results = [('naive',t_naive),('grids',t_python)]
+        if [(c.wrong_cells,c.wrong_clues) for c in checks] != expected:
+            raise AssertionError('checking grids gave something different')
+        if verify.np is not None:
+            t_numpy,checks = timed(lambda: solution.check_grids(subs,engine='numpy'))
+            results.append(('numpy batch',t_numpy))
+            if [(c.wrong_cells,c.wrong_clues) for c in checks] != expected:
+                raise AssertionError('checking grids with NumPy gave something different')
+        t_answers,checks = timed(lambda: solution.check_answer_batches(batches))
+        results.append(('answers',t_answers))
+        if [(c.wrong_cells,c.wrong_clues) for c in checks] != expected:
+            raise AssertionError('checking answers gave something different')
+
+        print('%-8s %5d clues  setup %.3fs  %s' % (
+            size,len(solution.keys),t_setup,
+            '  '.join('%s %8.0f/s' % (name,count / t) for name,t in results)))
@@ -0,0 +1,187 @@
+# cache.py
+
+# an on-disk cache of rendered crosswords. Each entry is keyed by a
+# hash of the input text, the options that change the output and the
+# version of crossworder, so editing the file (or upgrading) is a
+# miss. The cache is bounded in size: when it gets too big, the least
+# recently used entries (by modification time, which is updated on
+# every hit) are removed.
+
+import os, hashlib, tempfile, contextlib
+
+# 100MB
+DEFAULT_LIMIT = 100 * 2**20
+
+# where the cache goes if no directory is given
+def default_directory():
+    if 'CROSSWORDER_CACHE' in os.environ:
+        return os.environ['CROSSWORDER_CACHE']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'),'.cache')
+    return os.path.join(base,'crossworder')
+
+# parse a size like "1000", "500K", "100M" or "1G" into bytes
+def parse_size(s):
+    s = s.strip().upper()
+    multiplier = 1
+    if s and s[-1] in 'KMG':
+        multiplier = 2**(10 * ('KMG'.index(s[-1]) + 1))
+        s = s[:-1]
+    return int(float(s) * multiplier)
+
+class RenderCache(object):
+    def __init__(self,version,directory=None,limit=DEFAULT_LIMIT):
+        self._version = version
+        self._directory = directory or default_directory()
+        self._limit = limit
+
+    # a hasher that has been given everything that isn't the input
+    # text. options is a string representing the options used (like
+    # '-A')
+    def _hasher(self,options):
+        h = hashlib.sha256()
+        h.update(('%s\0%s\0' % (self._version,options)).encode('utf-8'))
+        return h
+
+    # the key for the input text (a string)
+    def key(self,text,options=''):
+        h = self._hasher(options)
+        h.update(text.encode('utf-8'))
+        return h.hexdigest()
+
+    # the key for the contents of a file, without reading it all into
+    # memory at once
+    def file_key(self,filename,options=''):
+        h = self._hasher(options)
+        with open(filename,'rb') as f:
+            for chunk in iter(lambda: f.read(2**16),b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _path(self,key):
+        return os.path.join(self._directory,key + '.tex')
+
+    # the stored output for key as an open file, or None if it isn't
+    # there (or the cache can't be read)
+    def lookup(self,key):
+        path = self._path(key)
+        try:
+            f = open(path,encoding='utf-8')
+            os.utime(path) # it's been used
+        except OSError:
+            return None
+        return f
+
+    # the output stored for key, or None if it isn't there
+    def get(self,key):
+        f = self.lookup(key)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    # a context manager giving an _Entry to write the output for key
+    # to, which is only stored if the block finishes without an error,
+    # and then makes sure the cache isn't too big
+    @contextlib.contextmanager
+    def writer(self,key):
+        entry = _Entry(self._directory)
+        try:
+            yield entry
+        except BaseException:
+            entry.close()
+            entry.discard()
+            raise
+        entry.close()
+        if entry.store(self._path(key)):
+            try:
+                self.evict()
+            except OSError:
+                pass
+
+    # store output for key
+    def put(self,key,output):
+        with self.writer(key) as entry:
+            entry.write(output)
+
+    # remove the least recently used entries until the cache is under
+    # its size limit
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self._directory):
+            if not name.endswith('.tex'):
+                continue
+            path = os.path.join(self._directory,name)
+            try:
+                st = os.stat(path)
+            except OSError: # someone else removed it
+                continue
+            entries.append((st.st_mtime,st.st_size,path))
+            total += st.st_size
+
+        entries.sort()
+        for mtime,size,path in entries:
+            if total <= self._limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+# a cache entry being written, to a temporary file which is moved into
+# place at the end, so that other processes never see half an entry.
+# Failing to write to the cache isn't an error, the entry is just
+# dropped
+class _Entry(object):
+    def __init__(self,directory):
+        self._file = None
+        self._tmp = None
+        try:
+            os.makedirs(directory,exist_ok=True)
+            fd,self._tmp = tempfile.mkstemp(dir=directory,suffix='.tmp')
+            self._file = os.fdopen(fd,'w',encoding='utf-8')
+        except OSError:
+            self.discard()
+
+    def write(self,s):
+        if self._file:
+            try:
+                self._file.write(s)
+            except OSError:
+                self.discard()
+
+    def close(self):
+        if self._file:
+            f,self._file = self._file,None
+            try:
+                f.close()
+            except OSError:
+                self.discard()
+
+    # forget about the entry
+    def discard(self):
+        if self._file:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+        if self._tmp:
+            try:
+                os.remove(self._tmp)
+            except OSError:
+                pass
+            self._tmp = None
+
+    # move the entry to path, returns whether it worked
+    def store(self,path):
+        if not self._tmp:
+            return False
+        try:
+            os.replace(self._tmp,path)
+        except OSError:
+            self.discard()
+            return False
+        self._tmp = None
+        return True
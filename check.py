@@ -0,0 +1,131 @@
+# check.py
+
+# checks a set of clues for every problem at once, rather than
+# stopping at the first one like make_grid. Each cell that a clue goes
+# through is recorded in an occupancy index, (x, y) => [letter,
+# across_clue, down_clue, the clue the letter came from], which is
+# built in a single pass over the clues and then used to find
+#
+#  - mismatch: two clues putting different letters in the same cell
+#  - overlap: two clues in the same direction sharing a cell
+#  - run-on: a clue that continues straight into a white cell (there's
+#    no black square or edge after, or before, it)
+#  - unchecked: cells that are only in one clue (a warning, since
+#    plenty of crosswords have these on purpose), reported once for
+#    each clue
+#
+# along with the problems with references (see
+# clue.reference_problems):
+#
+#  - dangling: a reference to a name that no clue has
+#  - cycle: a separated clue referring to its own later part
+#
+# and empty, if there aren't any clues at all (at (0,0))
+
+from collections import namedtuple
+import clue
+
+# a problem found in the clues, kind is one of the above and (x,y) is
+# the cell (in the coordinates of the clue file)
+Problem = namedtuple('Problem',['kind','x','y','message'])
+
+# the kinds of problem that mean the crossword is wrong
+ERRORS = set(['mismatch','overlap','run-on','dangling','cycle','empty'])
+
+# describe a clue, without needing numbers
+def describe(c):
+    x,y = c.startpoint()
+    return '%s clue at (%d,%d)' % (c.direction_name(True),x,y)
+
+# check a dictionary of clues, or a stream of (id, Clue) pairs (like
+# make_grid), returning a list of the Problems found, top-to-bottom,
+# left-to-right
+def check(clues):
+    if isinstance(clues,dict):
+        clues = clues.items()
+
+    problems = []
+    cells = {} # the occupancy index
+    allclues = []
+    named = {} # (like make_grid)
+    overlapping = set() # pairs of clues, so each overlap is only reported once
+
+    for name,c in clues:
+        allclues.append(c)
+        if c.name():
+            named[c.name()] = c
+        owner = 1 if c.is_across() else 2
+
+        # the cells that make_grid fills in (the answer can be shorter
+        # than the length)
+        answer = c.text_answer() or [None] * c.length()
+        for i,(x,y) in zip(range(len(answer)),c.points()):
+            letter = answer[i]
+
+            cell = cells.get((x,y))
+            if cell is None:
+                cell = cells[(x,y)] = [letter,None,None,letter and c]
+            elif letter and cell[0] and cell[0] != letter:
+                problems.append(Problem('mismatch',x,y,
+                    "Mismatched letters ('%s' vs. '%s') between %s and %s" % (
+                        cell[0],letter,describe(cell[3]),describe(c))))
+            elif letter and not cell[0]:
+                cell[0] = letter
+                cell[3] = c
+
+            other = cell[owner]
+            if other is None:
+                cell[owner] = c
+            elif (id(other),id(c)) not in overlapping:
+                overlapping.add((id(other),id(c)))
+                problems.append(Problem('overlap',x,y,
+                    'The %s and the %s overlap' % (describe(other),describe(c))))
+
+    if not allclues: # (like make_grid)
+        return [Problem('empty',0,0,'No clues found')]
+
+    # the cells just before and just after each clue should be empty
+    runons = set()
+    for c in allclues:
+        dx,dy = (1,0) if c.is_across() else (0,1)
+        x,y = c.startpoint()
+        length = min(c.length(),len(c.text_answer() or [None] * c.length()))
+        endx,endy = x + dx * (length - 1),y + dy * (length - 1)
+        for (bx,by),(ax,ay) in [((x - dx,y - dy),(x,y)),((endx,endy),(endx + dx,endy + dy))]:
+            key = (bx,by,ax,ay)
+            if (bx,by) in cells and (ax,ay) in cells and key not in runons:
+                runons.add(key)
+                problems.append(Problem('run-on',bx,by,
+                    'The %s runs on from (%d,%d) into (%d,%d)' % (describe(c),bx,by,ax,ay)))
+
+    # unchecked cells are collected for each clue, since there are
+    # often a lot of them
+    unchecked = {} # id of clue => [clue, first cell, count]
+    for (x,y),cell in cells.items():
+        if not (cell[1] and cell[2]):
+            c = cell[1] or cell[2]
+            if id(c) in unchecked:
+                u = unchecked[id(c)]
+                u[1] = min(u[1],(y,x))
+                u[2] += 1
+            else:
+                unchecked[id(c)] = [c,(y,x),1]
+    for c,(y,x),count in unchecked.values():
+        problems.append(Problem('unchecked',x,y,
+            '%d of %d cells unchecked in the %s' % (count,c.length(),describe(c))))
+
+    for kind,c,text in clue.reference_problems(allclues,named):
+        x,y = c.startpoint()
+        problems.append(Problem(kind,x,y,'%s, in the %s' % (text,describe(c))))
+
+    problems.sort(key=lambda p: (p.y,p.x))
+    return problems
+
+# whether any of the problems are errors (not just warnings)
+def has_errors(problems):
+    return any(p.kind in ERRORS for p in problems)
+
+# a problem as a line of text
+def format_problem(p):
+    level = 'Error' if p.kind in ERRORS else 'Warning'
+    return '%s: (%d,%d) %s: %s' % (level,p.x,p.y,p.kind,p.message)
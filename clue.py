@@ -18,85 +18,94 @@ RE_AMPERSANDS = re.compile(r'&')
 def parse_clues(line):
     return tokenise_line(line)
 
+# the characters that split the words of an answer (RE_WORD_SPLIT)
+WORD_SPLITS = ' ,.-'
+
+# the length spec (e.g. "5,3-2") and the total length of an answer,
+# in a single walk over it: this gives the same as splitting with
+# RE_WORD_SPLIT (with spaces becoming commas) and adding up the words.
+def answer_length_spec(answer):
+    spec = []
+    length = 0
+    word = 0 # the length of the current word
+    for ch in answer:
+        if ch in WORD_SPLITS:
+            spec.append(str(word))
+            spec.append(',' if ch == ' ' else ch)
+            length += word
+            word = 0
+        else:
+            word += 1
+    if not spec: # a single word (the usual case)
+        return (str(word),word)
+    spec.append(str(word))
+    return (''.join(spec),length + word)
+
 def tokenise_line(_s):
     # recieve line in the form "[<name>]direction|x|y|answer|clue"
     # if an answer spans multiple clues, then <name> can be placed just before
     # the clue break.
     # e.g. "exit strategy" over two clues is "exit <otherclue>strategy", or "(4,<otherclue>8)"
     # in clues, <name> will expand to "3 across" or whatever the clue <name> is
+    #
+    # this is a hot loop for big files, so each field is only looked
+    # at once where possible, and the regexes are only used for the
+    # less common forms (length specs, names inside answers, separated
+    # clues).
     name = None
     s = _s.strip()
-    try:
-        # see if it has a name at the start of the line
-        m = RE_SPLIT_NAME_BEGIN.match(s)
-        if m: # yep, so remember the name, and deal with the rest of the clue
-            name = m.group(1)
-            s = s.split('>',1)[1]
-            
-        # split the clue on pipe
-        t = tuple(s.split('|',4))
-        
-        # try unwrapping, this could fail
-        (_directions,_xs,_ys,_answers,clue) = t
-    except ValueError as e:
+
+    # see if it has a name at the start of the line (RE_SPLIT_NAME_BEGIN)
+    if s[:1] == '<':
+        end = s.find('>')
+        if end != -1: # yep, so remember the name, and deal with the rest of the clue
+            name = s[1:end]
+            s = s[end + 1:]
+
+    # split the clue on pipe
+    fields = s.split('|',4)
+    if len(fields) != 5:
         raise ValueError("Line could not be parsed: %s" % s)
+    (_directions,_xs,_ys,_answers,clue) = fields
 
     # get rid of &'s from the answer
-    clean_answers = RE_AMPERSANDS.sub('',_answers)
-    is_length_spec = False 
-    if RE_LENGTH_SPEC.match(clean_answers): # yep it is a length spec
-        is_length_spec = True
+    separated = '&' in _answers
+    clean_answers = _answers.replace('&','') if separated else _answers
+    is_length_spec = clean_answers[:1] == '(' and RE_LENGTH_SPEC.match(clean_answers)
+    if is_length_spec: # yep it is a length spec
         answer = None # so no answer
         length_spec = clean_answers.strip('()') # we have a ready made length spec
         usable_answers = _answers.strip('()') # this one is for separated clues
+        # convert the length spec to the total length of the clue
+        length = sum([int(x) for x in RE_PUNCT.split(length_spec)])
     else: # nope, an actual answer
-        answer = RE_SPLIT_NAME.sub('',clean_answers.strip()) # remove names
+        answer = clean_answers.strip()
+        if '<' in answer:
+            answer = RE_SPLIT_NAME.sub('',answer) # remove names
         usable_answers = _answers # separated clues
-        lengthbuilder = []
-        for (i,w) in enumerate(RE_WORD_SPLIT.split(answer)): # split the words up
-            if i % 2: # punctuation
-                if w == ' ': # commas instead of spaces
-                    lengthbuilder.append(',')
-                else:
-                    lengthbuilder.append(w)
-            else: # word
-                lengthbuilder.append(str(len(w)))
-        length_spec = ''.join(lengthbuilder) 
-    # convert the length spec to the total length of the clue
-    length = sum([int(x) for x in RE_PUNCT.split(length_spec)])
+        length_spec,length = answer_length_spec(answer)
     
     # check that all of the fields have the same number of splits
     count = _directions.count('&')
-    for k in [_xs,_ys,_answers]:
-        if k.count('&') != count:
-            raise ValueError('Mismatched number of splits: %s' % s)
+    if count or separated or '&' in _xs or '&' in _ys:
+        for k in [_xs,_ys,_answers]:
+            if k.count('&') != count:
+                raise ValueError('Mismatched number of splits: %s' % s)
+
+    if not count: # not separated, so easy
+        return [Clue(parse_direction(_directions),name,
+                     *parse_position(_xs,_ys),
+                     None if is_length_spec else usable_answers,
+                     length_spec,length,clue,[],[])]
 
-    # get the fields for each subclue of our current one (this works
-    # for unsplit clues too)
-    raw_clues = list(zip(*[ss.split('&') for ss in [_directions,_xs,_ys,usable_answers]]))
-    num_parts = len(raw_clues)
+    # get the fields for each subclue of our current one
+    raw_clues = zip(*[ss.split('&') for ss in [_directions,_xs,_ys,usable_answers]])
 
     # go through all the raw clues, and make them real clues!
     clues = []
     for (i,(_direction,_x,_y,_answer)) in enumerate(raw_clues):
-        
-        # get the direction
-        first_direction = _direction.strip()[:1].lower() # only bother with the first letter
-        if first_direction == 'a':
-            direction = Direction.ACROSS 
-        elif first_direction == 'd':
-            direction = Direction.DOWN
-        else:
-            raise ValueError("Invalid direction: %s" % _direction)
-        
-        # get the position
-        try: 
-            x = int(_x)
-            y = int(_y)
-        except:
-            raise ValueError("Invalid position: (%s,%s)" % (_x,_y))
-        
-        #answer = RE_SPLIT_NAME.sub('',clean_answers.strip())
+        direction = parse_direction(_direction)
+        x,y = parse_position(_x,_y)
         
         # compute the length of this subclue
         if is_length_spec:
@@ -107,20 +116,33 @@ def tokenise_line(_s):
             myanswer = _answer
         mylength = sum(lengths)
             
-        if num_parts > 1: # separated clue
-            if i: # not the first one (so it's a child)
-                # it's a child, so it doesn't have a length spec or a clue
-                child = Clue(direction,name,x,y,myanswer,None,mylength,None, [], parent)
-                clues.append(child)
-                parent.add_child(child)
-            else: # the first clue (so it's the parent)
-                parent = Clue(direction,name,x,y,myanswer,length_spec,mylength,clue,[])
-                clues.append(parent)
-        else: # not separated, so easy
-            c = Clue(direction,name,x,y,myanswer,length_spec,length,clue,[],[])
-            clues.append(c)
+        if i: # not the first one (so it's a child)
+            # it's a child, so it doesn't have a length spec or a clue
+            child = Clue(direction,name,x,y,myanswer,None,mylength,None, [], parent)
+            clues.append(child)
+            parent.add_child(child)
+        else: # the first clue (so it's the parent)
+            parent = Clue(direction,name,x,y,myanswer,length_spec,mylength,clue,[])
+            clues.append(parent)
     return clues
 
+# get the direction from a field of a clue line
+def parse_direction(_direction):
+    first_direction = _direction.strip()[:1].lower() # only bother with the first letter
+    if first_direction == 'a':
+        return Direction.ACROSS 
+    elif first_direction == 'd':
+        return Direction.DOWN
+    else:
+        raise ValueError("Invalid direction: %s" % _direction)
+
+# get the position (x,y) from the fields of a clue line
+def parse_position(_x,_y):
+    try: 
+        return (int(_x),int(_y))
+    except:
+        raise ValueError("Invalid position: (%s,%s)" % (_x,_y))
+
 # convert a direction to a string
 def dir2str(dirr,long=False,capital=False):
     names = ['a','d']
@@ -135,23 +157,110 @@ def dir2str(dirr,long=False,capital=False):
     else:
         return names[1]
 
+# the text of a clue compiled into a template, once when it's parsed:
+# a tuple of alternately literal text and the names it refers to (from
+# splitting it with RE_SPLIT_NAME), or None if it doesn't refer to
+# anything (the usual case)
+def compile_text(text):
+    if text and '<' in text:
+        template = tuple(RE_SPLIT_NAME.split(text))
+        if len(template) > 1:
+            return template
+    return None
+
+# the clues (first parts) that refer to each name, name => [clues], in
+# the order of clues
+def reference_graph(clues):
+    graph = {}
+    for c in clues:
+        if c._template:
+            for name in c._template[1::2]:
+                referring = graph.setdefault(name,[])
+                if not referring or referring[-1] is not c:
+                    referring.append(c)
+    return graph
+
+# everything wrong with the references of clues, if they were resolved
+# with named (name => Clue, anything with get()): the names that
+# aren't there, and the separated clues that refer to one of their
+# own later parts (whose "See ..." would only refer back to them). A
+# list of (kind
+# ('dangling' or 'cycle'), the clue, a message)
+def reference_problems(clues,named):
+    problems = []
+    for name,referring in reference_graph(clues).items():
+        target = named.get(name)
+        if target is None:
+            problems.append(('dangling',referring[0],"Named clue '%s' not found%s" % (
+                name,' (referred to by %d clues)' % len(referring) if len(referring) > 1 else '')))
+            continue
+        for c in referring:
+            if target is not c and target.parent() is c:
+                problems.append(('cycle',c,"The separated clue named '%s' refers to its own later part" % name))
+    return problems
+
+# resolve the references of all of clues (see Clue.resolve_names),
+# reporting every problem at once (in one ValueError). Returns the
+# number of names resolved
+def resolve_all(clues,named):
+    problems = reference_problems(clues,named)
+    if problems:
+        raise ValueError('; '.join(message for kind,c,message in problems))
+    return sum([c.resolve_names(named) for c in clues])
+
 class Direction:
     ACROSS = 1
     DOWN = 2
 
-# the representation of a clue
+# intern a string (so that repeated answers, names etc. are only
+# stored once), leaving None alone
+def _intern(s):
+    if s is None:
+        return None
+    return sys.intern(s)
+
+# the representation of a clue, there can be a lot of these so they
+# use __slots__ rather than a __dict__ each
 class Clue(object):
-    def __init__(self,direction,name,x,y,answer,lenstring,length,clue,children=[],parent=None):
-        self._name = name
+    __slots__ = ('_name','_direction','_x','_y','_answer','_length_spec',
+                 '_length','_clue','_text','_template','_refs','_children','_parent','_number')
+
+    def __init__(self,direction,name,x,y,answer,lenstring,length,clue,children=None,parent=None):
+        self._name = _intern(name)
         self._direction = direction
         self._x = x
         self._y = y
-        self._answer = answer
-        self._length_spec = lenstring
+        self._answer = _intern(answer)
+        self._length_spec = _intern(lenstring)
         self._length = length
-        self._clue = clue
-        self._children = children
+        self._clue = _intern(clue)
+        self._text = self._clue # the clue before resolving names
+        self._template = compile_text(self._text)
+        self._refs = None # the clues the names refer to, once they're resolved
+        self._children = children if children is not None else []
         self._parent = parent
+
+    # a copy of the clue without its number, with copies of its later
+    # parts if it's separated (given the copy of its parent, if it's a
+    # later part), for building a crossword without changing the clues
+    # it's built from
+    def copy(self,parent=None):
+        c = Clue(self._direction,self._name,self._x,self._y,self._answer,self._length_spec,
+                 self._length,self.clue(),None,parent)
+        c._text = self._text
+        c._template = self._template
+        for child in self._children:
+            c._children.append(child.copy(c))
+        return c
+
+    # (pickling doesn't go through the setters, so BuiltClues can be
+    # pickled too)
+    def __getstate__(self):
+        return dict((k,getattr(self,k)) for k in Clue.__slots__ if hasattr(self,k))
+
+    def __setstate__(self,state):
+        for k,v in state.items():
+            object.__setattr__(self,k,v)
     
     # set/get the name of the clue
     def name(self,name=None): 
@@ -167,13 +276,40 @@ class Clue(object):
         else:
             return self._number
     
-    # set/get the text of the clue
+    # set/get the text of the clue (with its references resolved, if
+    # resolve_names has been called: this is when the text is worked
+    # out, from the numbers then, and it's kept until it's resolved
+    # again)
     def clue(self,clue=None):
         if clue:
-            self._clue = clue
+            self._clue = self._text = clue
+            self._template = compile_text(clue)
+            self._refs = None
+        elif self._clue is None and self._refs is not None:
+            return self._resolved()
         else:
             return self._clue
     
+    # the text of the clue as it was written, before references were
+    # resolved (None for the later parts of a separated clue)
+    def text(self):
+        return self._text
+
+    # set the resolved text of the clue directly, keeping the original
+    # (for clues that were saved after resolving)
+    def resolved_clue(self,clue):
+        self._clue = clue
+        self._refs = None
+
+    # the names the text refers to, in order
+    def references(self):
+        return self._template[1::2] if self._template else ()
+
+    # the first part of a separated clue that this is a later part
+    # of, or None
+    def parent(self):
+        return self._parent or None
+    
     # add a child to the clue
     def add_child(self, c):
         self._children.append(c)
@@ -193,9 +329,15 @@ class Clue(object):
         else:
             return None
 
+    # set/get the answer (setting it on a clue that was defined by a
+    # length spec, e.g. when filling the grid, leaves the spec alone)
+    def answer(self,answer=None):
+        if answer:
+            self._answer = _intern(answer)
+        else:
+            return self._answer
+
     # get various properties
-    def answer(self):
-        return self._answer
     def length_spec(self):
         return self._length_spec
     def length(self):
@@ -222,30 +364,47 @@ class Clue(object):
     def direction_name(self,long=False,capital=False):
         return dir2str(self._direction,long,capital)
          
-    # convert any references like "The <blahblah> more clue" into "The
-    # 23-down more clue", and write the clue for child clues (to say
-    # "See 23-down", or whatever is appropriate)
+    # link any references like "The <blahblah> more clue" to the
+    # clues they name, so that it becomes "The 23-down more clue" (and
+    # the later parts of separated clues say "See 23-down", or whatever
+    # is appropriate), from the numbers they have when the text is next
+    # asked for (see clue()). Nothing is written out here.
     #
-    # clues is a dictionary mapping names to Clue objects
+    # clues is a dictionary mapping names to Clue objects. This can be
+    # called again when the names change, or unresolve() when the clues
+    # are renumbered. Returns the number of names resolved.
     def resolve_names(self,clues):
-        if self._clue is None and self._parent: # yep, child clue
-            self._clue = "See %d-%s" % (self._parent.number(),self._parent.direction_name(True))
-        else: # nope not child clue
-            newclue = []
-            # split the current clue on the names
-            # so "The <blahblah> more clue" becomes ["The ","blahblah"," more clue"]
-            for i,s in enumerate(RE_SPLIT_NAME.split(self._clue)):
-                if i % 2: # it's a name
-                    if s in clues: # yep, the name exists
-                        c = clues[s]  
-                        # put the appropriate thing into the newclue
-                        newclue.append('%d-%s' % (c.number(),c.direction_name(True)))
-                    else:
-                        raise ValueError("Named clue '%s' not found" % s)
-                else: # just normal text
-                    newclue.append(s)
-            # set the clue
-            self._clue = ''.join(newclue)
+        refs = ()
+        if self._template:
+            try:
+                refs = tuple([clues[name] for name in self._template[1::2]])
+            except KeyError as e:
+                raise ValueError("Named clue '%s' not found" % e.args[0])
+        self._refs = refs
+        self._clue = None
+        return len(refs)
+
+    # forget the resolved text, so it's worked out again from the
+    # current numbers when it's next asked for
+    def unresolve(self):
+        if self._refs is not None:
+            self._clue = None
+
+    # work out the resolved text, and keep it
+    def _resolved(self):
+        if self._text is None and self._parent: # yep, child clue
+            text = "See %d-%s" % (self._parent.number(),self._parent.direction_name(True))
+        elif self._refs:
+            # put the numbers in place of the names, so ["The ",
+            # "blahblah"," more clue"] becomes "The 23-down more clue"
+            parts = list(self._template)
+            for k,c in enumerate(self._refs):
+                parts[2 * k + 1] = '%d-%s' % (c.number(),c.direction_name(True))
+            text = ''.join(parts)
+        else:
+            text = self._text
+        self._clue = text
+        return text
          
     # convert to a string nicely
     def __str__(self):
@@ -253,12 +412,12 @@ class Clue(object):
             return '%i. %s at (%i,%i) "%s" => "%s" (%s)' % (
                         self._number,
                         dir2str(self._direction,True),
-                        self._x, self._y, self._clue,
+                        self._x, self._y, self.clue(),
                         self._answer, self._length_spec)
         else:
             return '  %s at (%i,%i) "%s" => "%s" (%s)' % (
                         dir2str(self._direction,True),
-                        self._x, self._y, self._clue,
+                        self._x, self._y, self.clue(),
                         self._answer, self._length_spec)
     
     # should be approximately the inverse of parse_clues above (almost...)
@@ -268,7 +427,50 @@ class Clue(object):
             namestr = '<%s>' % self._name
         if self._answer == None:
             return '%s%s|%i|%i|(%s)|%s' % (namestr,dir2str(self._direction),self._x,self._y,
-                                        self._length_spec,self._clue)
+                                        self._length_spec,self.clue())
         else:
             return '%s%s|%i|%i|%s|%s' % (namestr,dir2str(self._direction),self._x,self._y,
-                                        self._answer,self._clue)            
+                                        self._answer,self.clue())            
+
+# a clue of a built crossword (see crossworder.make_grid), with its
+# number and resolved text, which can't be changed at all, so a built
+# crossword can be cached and used by several threads at once. It's a
+# Clue in every other way
+class BuiltClue(Clue):
+    __slots__ = ()
+
+    def __setattr__(self,name,value):
+        raise AttributeError("A built clue can't be changed")
+
+    def __delattr__(self,name):
+        raise AttributeError("A built clue can't be changed")
+
+    def add_child(self,c):
+        raise AttributeError("A built clue can't be changed")
+
+    # the later parts (a new list each time)
+    def children(self,children=None):
+        if children is not None:
+            raise AttributeError("A built clue can't be changed")
+        return list(self._children)
+
+# turn clues (that have been numbered and resolved), and their later
+# parts, into BuiltClues. Their text is written out now, so reading a
+# BuiltClue never changes it (and it can be shared by threads)
+def freeze(clues):
+    for c in clues:
+        if type(c) is BuiltClue:
+            continue
+        for p in c._children:
+            if type(p) is not BuiltClue:
+                _settle(p)
+                p._children = ()
+                p.__class__ = BuiltClue
+        _settle(c)
+        c._children = tuple(c._children)
+        c.__class__ = BuiltClue
+
+# write out the resolved text of a clue for good
+def _settle(c):
+    c._clue = c.clue()
+    c._refs = None
@@ -2,184 +2,447 @@
 
 # crossworder.py
 
-import re, clue,sys
+import re, io, clue, cache, cwb, instrument, sys,os,shutil,contextlib
+from grid import Grid, BuiltPuzzle
+
+# the NumPy version of make_grid is optional
+try:
+    import numpygrid
+except ImportError:
+    numpygrid = None
+
+# used to invalidate cached output when crossworder changes
+__version__ = '1.2'
 
 def message(*m):
     print(*m,file=sys.stderr)
 
-# loads the clues "line" by "line" from iterable (could be a file,
-# list of strings etc), 
-# returns (dictionary of metadata (key => data), dictionary of clues (name => Clue))
-def load_clues(iterable):
-    clues = {}
-    metadata = {}
+# parses the clues "line" by "line" from iterable (could be a file,
+# list of strings etc), yielding each thing as soon as it is read:
+#   ('metadata', key, data) for metadata (key ends with + for multiple options)
+#   ('clue', id, Clue) for each clue (id is the name, or a counter if
+#   it doesn't have one or is a later part of a separated clue, so
+#   that every id is different)
+# warnings for lines that can't be parsed are printed (with the line
+# number) straight away. parse is the function that turns a
+# (stripped) line into a list of clues.
+def iter_clues(iterable,parse=clue.parse_clues):
+    parse = instrument.timed('parse',parse) # (if profiling)
     count = 0
-    for cl in iterable:
-        stripped = cl.strip()
-        if not stripped:
-            continue
-        start = stripped[0] # get first character
-        if start == '@': # metadata
-            try:
-                rawkey,rawdata = stripped[1:].split(':',1) # separate on :
-                key = rawkey.lower().strip()
-                data = rawdata.strip()
-
-                if not key: # no real key
+    lineno = 0
+    try:
+        for lineno,cl in enumerate(iterable,1):
+            stripped = cl.strip()
+            if not stripped:
+                continue
+            start = stripped[0] # get first character
+            if start == '@': # metadata
+                try:
+                    rawkey,rawdata = stripped[1:].split(':',1) # separate on :
+                    key = rawkey.lower().strip()
+                    data = rawdata.strip()
+                except Exception as e:
+                    message("Warning: line %d: Tried but couldn't parse as metadata:" % lineno, stripped)
+                    message(str(e))
+                    instrument.count('warnings')
                     continue
-                if len(key) > 1 and key[-1] == '+': # its a multiple option, so make a list
-                    key = key[:-1]
-                    if key in metadata:
-                        mk = metadata[key]
-                        if isinstance(mk,list):
-                            mk.append(data)
-                        else:
-                            metadata[key] = [mk, data]
-                    else:
-                        metadata[key] = [data]
-                else:
-                    metadata[key] = data.strip()
-            except Exception as e:
-                message("Warning: Tried but couldn't parse as metadata:", cl)
-                message(str(e))
+
+                if key: # no key means nothing to do
+                    yield ('metadata',key,data)
                 
-        elif start != '#': 
-            # not a comment
+            elif start != '#': 
+                # not a comment
 
-            # parse the clues, possibly multiple due to separated
-            # clues
-            try:
-                for c in clue.parse_clues(stripped): 
+                # parse the clues, possibly multiple due to separated
+                # clues
+                try:
+                    parsed = parse(stripped)
+                except:
+                    # probably couldn't parse the clue...
+                    message("Warning: line %d: Couldn't parse as a clue:" % lineno, stripped)
+                    instrument.count('warnings')
+                    continue
+
+                for c in parsed:
                     id =  c.name()
-                    if not id:
+                    if not id or c.parent():
                         id = count 
                         count += 1
-                    
-                    clues[id] = c
-            except:
-                # probably couldn't parse the clue...
-                message("Warning: Couldn't parse as a clue:", cl)
-                
+                    yield ('clue',id,c)
+    finally:
+        instrument.count('lines',lineno)
+
+# store a piece of metadata (as yielded by iter_clues) into the
+# dictionary metadata
+def add_metadata(metadata,key,data):
+    if len(key) > 1 and key[-1] == '+': # its a multiple option, so make a list
+        key = key[:-1]
+        if key in metadata:
+            mk = metadata[key]
+            if isinstance(mk,list):
+                mk.append(data)
+            else:
+                metadata[key] = [mk, data]
+        else:
+            metadata[key] = [data]
+    else:
+        metadata[key] = data
+
+# a stream of the (id, Clue) pairs in iterable, with the metadata
+# stored into the dictionary metadata as it is found (so it is only
+# complete once the stream is finished), this can be given straight
+# to make_grid
+def stream_clues(iterable,metadata,parse=clue.parse_clues):
+    for kind,key,value in iter_clues(iterable,parse):
+        if kind == 'metadata':
+            add_metadata(metadata,key,value)
+        else:
+            yield (key,value)
+
+# loads the clues "line" by "line" from iterable (could be a file,
+# list of strings etc), 
+# returns (dictionary of metadata (key => data), dictionary of clues (name => Clue))
+def load_clues(iterable):
+    metadata = {}
+    clues = dict(stream_clues(iterable,metadata))
     return (metadata,clues)
     
+# the extensions of the other formats that crosswords can be read
+# from (see interchange.py)
+IMPORTS = ('.ipuz','.puz')
+
+def is_imported(filename):
+    return filename.lower().endswith(IMPORTS)
+
+# the lines of a clue file for data (the bytes of a file), which is in
+# the format that the extension of filename says: ipuz, Across Lite or
+# a normal crossword file
+def import_lines(filename,data):
+    if filename.lower().endswith('.ipuz'):
+        import ipuz
+        return ipuz.read_ipuz(data)
+    elif filename.lower().endswith('.puz'):
+        import acrosslite
+        return acrosslite.read_puz(data)
+    return data.decode('utf-8').splitlines()
+
 # load clues from a file
 def from_file(filename):
-    return load_clues(open(filename,'rU'))
-    
-# turn a dictionary of clues into a representation of the grid
-def make_grid(clues):
-    # work out the size of the grid, by going through all the clues
-    minx,maxx = (float('inf'),float('-inf'))
-    miny,maxy = minx,maxx
+    metadata = {}
+    clues = dict(stream_file(filename,metadata))
+    return (metadata,clues)
+
+# stream the clues of a file (see stream_clues), which can be in one of
+# the IMPORTS formats
+def stream_file(filename,metadata):
+    if is_imported(filename):
+        with open(filename,'rb') as f:
+            lines = import_lines(filename,f.read())
+        yield from stream_clues(lines,metadata)
+        return
+    with open(filename) as f:
+        yield from stream_clues(f,metadata)
     
-    for name,c in clues.items():
-        for x,y in (c.endpoint(),c.startpoint()):
-            maxx = max(maxx,x)
-            minx = min(minx,x)
-            maxy = max(maxy,y)
-            miny = min(miny,y)
-
-    # we've got the size of the grid
-    xlen = maxx - minx + 1
-    ylen = maxy - miny + 1
-
-    # the grid is represent by a matrix of 
-    # (letter, across_clue_that_starts_here, down_clue_that_starts_here)
-    # with None for blank cells, and None in any of the elements of the 
-    # tuple to represent missing value
-    grid = [[None] * xlen for _ in range(ylen)]
+# turn a dictionary of clues, or a stream of (id, Clue) pairs (like
+# stream_clues), into a representation of the grid (a
+# grid.BuiltPuzzle). The clues themselves aren't changed: the grid
+# has copies of them (clue.BuiltClues) with their numbers and
+# resolved references, and none of it can be changed, so it can be
+# cached and shared. engine can be 'numpy' to use the vectorised
+# version in numpygrid for big grids, if NumPy is installed
+# (otherwise this is used anyway)
+def make_grid(clues,engine='python'):
+    if isinstance(clues,dict):
+        clues = clues.items()
+
+    # the grid is built from copies of the clues, made as they're
+    # needed (all the parts of a separated clue are copied together,
+    # when the first of them comes)
+    copies = []
+    missing = {} # id of a first part => a later part that came before it
+    def copied(clues):
+        later = {} # id of a part => its copy
+        for name,c in clues:
+            if id(c) not in later:
+                first = c.parent() or c
+                new = first.copy()
+                for part,copy in zip([first] + list(first.children()),[new] + list(new.children())):
+                    later[id(part)] = copy
+                if first is not c:
+                    missing[id(first)] = c
+            missing.pop(id(c),None)
+            new = later.pop(id(c))
+            copies.append(new)
+            yield (name,new)
+
+    if engine == 'numpy' and numpygrid:
+        grid = numpygrid.make_grid(copied(clues),build_grid)
+    else:
+        grid = build_grid(copied(clues))
+    if missing:
+        c = min(missing.values(),key=lambda c: c.startpoint())
+        raise ValueError("The %s clue at (%d, %d) is a later part of a separated clue, but its first part isn't there" % (
+            (c.direction_name(True),) + c.startpoint()))
+    clue.freeze(copies)
+    if not isinstance(grid,BuiltPuzzle): # (numpygrid's grids already are)
+        grid = BuiltPuzzle(grid,copies)
+    return grid
+
+# build the grid from a dictionary of clues or a stream of (id, Clue)
+# pairs like make_grid, but numbering the clues and resolving their
+# references themselves, and giving a grid.Grid that can be changed
+# (for puzzle.Puzzle, which keeps them up to date as it's edited)
+def build_grid(clues):
+    if isinstance(clues,dict):
+        clues = clues.items()
+
+    # only named clues can be referred to by other clues
+    named = {}
+
+    # the grid is sparse, so it just grows as the clues are added
+    # (see grid.py)
+    grid = Grid()
     
-    # go through the clues again, filling in the grid with the letters
+    # go through the clues, filling in the grid with the letters
     # die if there is a overlap, with mismatched letters
-    for name,c in clues.items():
-        x,y = c.startpoint()
-        endx,endy = c.endpoint()
-
-        # normalise the clue to fit in the 0-based indexed grid
-        x -= minx
-        y -= miny
-        endx -= minx
-        endy -= miny
+    with instrument.phase('fill'):
+        allclues = []
+        for name,c in clues:
+            allclues.append(c)
+            if c.name():
+                named[c.name()] = c
+
+            x,y = c.startpoint()
         
-        # get the answer, if the clue doesn't have one (i.e. it was
-        # defined by a length spec), then use None
-        answer = c.text_answer()
-        if not answer:
-            answer = [None] * c.length()
+            # get the answer, if the clue doesn't have one (i.e. it was
+            # defined by a length spec), then use None
+            answer = c.text_answer()
+            if not answer:
+                answer = [None] * c.length()
         
-        # get the stuff at our current letter
-        cur = grid[y][x]
-        if not cur: # it is answer blank square
-            cur = (answer[0],None,None)
-        elif not cur[0]: # it doesn't have a letter
-            cur = (answer[0],cur[1],cur[2])
+            # get the stuff at our current letter
+            cur = grid.get(x,y)
+            if not cur: # it is answer blank square
+                cur = (answer[0],None,None)
+            elif not cur[0]: # it doesn't have a letter
+                cur = (answer[0],cur[1],cur[2])
         
-        # check the first letter match
-        if answer[0] and cur[0] and answer[0] != cur[0][0]:
-            raise ValueError("Mismatched letters ('%s' vs '%s') at (%d, %d)" % (cur[0],answer[0],x+minx,y+miny))
+            # check the first letter match
+            if answer[0] and cur[0] and answer[0] != cur[0][0]:
+                raise ValueError("Mismatched letters ('%s' vs '%s') at (%d, %d)" % (cur[0],answer[0],x,y))
         
-        # across clue
-        if c.is_across():
-            if cur[1]:
-                raise ValueError("Two clues starting at (%d,%d)" % (x+minx,y+miny))
-            
-            grid[y][x] = (cur[0],c,cur[2])  # update the starting cell
+            if c.is_across(): # across clue
+                if cur[1]:
+                    raise ValueError("Two clues starting at (%d,%d)" % (x,y))
+                grid.set(x,y,(cur[0],c,cur[2]))  # update the starting cell
+                dx,dy = 1,0
+            else: # down clue
+                if cur[2]:
+                    raise ValueError("Two clues starting at (%d,%d)" % (x,y))
+                grid.set(x,y,(cur[0],cur[1],c)) # update the starting cell
+                dx,dy = 0,1
 
             # go through the rest of the answer, filling in as appropriate
-            for char,i in zip(answer[1:],range(x+1,endx + 1)):
-                curgrid = grid[y][i]
-                if not curgrid: # blank cell, 
-                    grid[y][i] = (char,None,None)
-                elif not curgrid[0]: # the letter was blank
-                    grid[y][i] = (char,curgrid[1],curgrid[2])   
-                elif char and curgrid[0] != char: # mismatch!!
-                    raise ValueError("Mismatched letters ('%s' vs. '%s') at (%d, %d)" % (curgrid[0],char,i+minx,y+miny))
-        else: # down clue
-            if cur[2]:
-                raise ValueError("Two clues starting at (%d,%d)" % (x+minx,y+miny))
-
-            grid[y][x] = (cur[0],cur[1],c) # update the starting cell
-            
-            # go through the rest of the answer, filling in as appropriate
-            for char,i in zip(answer[1:],range(y+1,endy + 1)):
-                curgrid = grid[i][x]
+            for i,char in zip(range(1,c.length()),answer[1:]):
+                cx,cy = x + i*dx, y + i*dy
+                curgrid = grid.get(cx,cy)
                 if not curgrid: # blank cell
-                    grid[i][x] = (char,None,None)
+                    grid.set(cx,cy,(char,None,None))
                 elif not curgrid[0]: # the letter was blank
-                    grid[i][x] = (char,curgrid[1],curgrid[2])   
+                    grid.set(cx,cy,(char,curgrid[1],curgrid[2]))
                 elif char and curgrid[0] != char: # mismatch!!
-                    raise ValueError("Mismatched letters ('%s' vs. '%s') at (%d, %d)" % (curgrid[0],char,i+minx,y+miny))
-    
+                    raise ValueError("Mismatched letters ('%s' vs. '%s') at (%d, %d)" % (curgrid[0],char,cx,cy))
+
+    if not allclues:
+        raise ValueError("No clues found")
+    if instrument.active: # (the size isn't free)
+        instrument.count('clues',len(allclues))
+        instrument.count('cells',grid.size())
+
     # now go through the grid from left-to-right, top-to-bottom,
     # numbering clues
-    count = 0
-    for row in grid:
-        for clue in row:
-            # check that the cell isn't blank and that a clue starts here
-            if clue and (clue[1] or clue[2]): 
-                    count += 1
-                    if clue[1]:
-                        clue[1].number(count)
-                    if clue[2]:
-                        clue[2].number(count)
-    
-    # the numbers are known, so now go and resolve references
-    # (like "See 12-across")
-    for name,c in clues.items():
-        c.resolve_names(clues)
-        
+    with instrument.phase('number'):
+        count = 0
+        for i,j,cell in grid.cells():
+            # check that a clue starts here (blank cells aren't stored)
+            if cell[1] or cell[2]: 
+                count += 1
+                if cell[1]:
+                    cell[1].number(count)
+                if cell[2]:
+                    cell[2].number(count)
+
+    # the numbers are known, so now go and resolve references (like
+    # "See 12-across"), which only links them up: the text is written
+    # when it's needed
+    with instrument.phase('resolve'):
+        instrument.count('references',clue.resolve_all(allclues,named))
+
     return grid
 
-# massively hacky, but, take a grid and metadata and render the crossword
-def render_as_latex(grid,metadata={},answers=False):
-    # matches stuff in the form "[foo]bar"
-    RE_OPTIONS = re.compile(r'^\[([^\]]*)\](.*)$')
+# merge the runs of black cells of each row, given as (i, [(start,
+# end), ...]) for each row in order (end is exclusive), into
+# rectangles (left, top, right, bottom) by joining runs covering
+# exactly the same columns in consecutive rows
+def merge_black_runs(rows):
+    growing = {} # (start, end) => the top row of the rectangle
+    bottom = 0
+    for i,runs in rows:
+        # the rectangles that don't continue into this row are done
+        current = set(runs)
+        for run in [r for r in growing if r not in current]:
+            yield (run[0],growing.pop(run),run[1],i)
+        for run in runs:
+            if run not in growing:
+                growing[run] = i
+        bottom = i + 1
+    for run,top in growing.items():
+        yield (run[0],top,run[1],bottom)
+
+# split a list into pieces of at most size elements
+def chunks(l,size=500):
+    return [l[i:i + size] for i in range(0,len(l),size)]
+
+# the clues starting in each cell of the grid, left-to-right,
+# top-to-bottom, as lists (across, down)
+def clue_lists(grid):
+    if isinstance(grid,Layout): # already found
+        return (grid.across,grid.down)
+    across = []
+    down = []
+    for i,row in grid.rows():
+        for j,c in row:
+            if c[1]:
+                across.append(c[1])
+            if c[2]:
+                down.append(c[2])
+    return (across,down)
+
+# a built grid with what rendering it needs worked out once: the rows
+# of cells (left-to-right, top-to-bottom, see Grid.rows), the clue
+# lists (see clue_lists) and the LaTeX of the clues (latex_clues, set
+# by write_puzzle the first time). It can be used instead of the grid
+# for rendering it more than once, e.g. each of the VARIANTS
+class Layout(object):
+    def __init__(self,grid):
+        self.grid = grid
+        self._rows = list(grid.rows())
+        self._width = grid.width()
+        self._height = grid.height()
+        self.across = []
+        self.down = []
+        for i,row in self._rows:
+            for j,c in row:
+                if c[1]:
+                    self.across.append(c[1])
+                if c[2]:
+                    self.down.append(c[2])
+        self.latex_clues = None
+
+    def rows(self):
+        return iter(self._rows)
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    # everything else is the grid's
+    def __getattr__(self,name):
+        return getattr(self.grid,name)
+
+# draw the grid as a tikzpicture, calling emit with each piece. If
+# across and down are given, the clues starting in each cell are
+# added to them as we go (compact makes much shorter TikZ for the
+# same picture: black squares are merged into rectangles and
+# numbers/letters are drawn with \foreach)
+def write_tikz(emit,grid,scale,answers=False,compact=False,across=None,down=None):
+    ylen = grid.height()
+    xlen = grid.width()
+
+    emit(r'\vspace*{\fill}') # make it vertically centered (approximately)
+    emit(r'''\begin{center}
+        \scalebox{%s}{
+        \begin{tikzpicture}[number/.style={below right},
+                  answer/.style={color=gray,font=\scshape}]''' % (scale))
+
+    emit(r'\draw[black] (0,%d) grid (%d,0);' % (-ylen,xlen)) # draw the grid
+
+    # in compact mode, the black squares are merged into rectangles and
+    # the numbers and letters are drawn with \foreach, so they are
+    # collected as we go and drawn at the end
+    black_runs = [] # (i, [(start, end), ...]) for each row
+    numbers = [] # x/y/number
+    letters = [] # x/y/{letter}
+
+    # the cells from column start up to (but not including) end in row
+    # i are empty, so make them black
+    def blacken(i,start,end):
+        if compact:
+            if start < end:
+                black_runs[-1][1].append((start,end))
+        else:
+            for j in range(start,end):
+                emit(r'\fill[black] (%d,%d) rectangle (%d,%d);' % (j,-i,j+1,-i-1))
+
+    # go through the grid (left-to-right, top-to-bottom) drawing
+    # numbers or black squares as appropriate
+    for i,row in grid.rows():
+        if compact:
+            black_runs.append((i,[]))
+        last = 0 # the first column that hasn't been drawn
+        for j,c in row: # only the cells with letters are stored
+            blacken(i,last,j)
+            last = j + 1
+
+            if answers and c[0]: # we need to print the letter (and it exists)
+                if compact:
+                    letters.append('%.1f/%.1f/{%s}' % (j+0.5,-i-0.5,c[0]))
+                else:
+                    emit(r'\node[answer] at (%.1f,%.1f) {%s};' % (j+0.5,-i-0.5,c[0]))
+            if c[1] or c[2]: # a clue starts here
+                if c[1]: # a wild across clue appears
+                    num = c[1].number()
+                    if across is not None:
+                        across.append(c[1])
+                if c[2]: # down too!
+                    num = c[2].number()
+                    if down is not None:
+                        down.append(c[2])
 
-    ylen = len(grid)
-    xlen = len(grid[0])
+                # draw the number
+                if compact:
+                    numbers.append('%d/%d/%d' % (j,-i,num))
+                else:
+                    emit(r'\node[number] at (%d,%d) {%d};' % (j,-i,num))
+        blacken(i,last,xlen)
 
-    break_page = 'break' in metadata and metadata['break'].lower() == "true"
+    if compact:
+        # a few big commands rather than one huge one, to keep TeX happy
+        rectangles = ['(%d,%d) rectangle (%d,%d)' % (left,-top,right,-bottom)
+                      for left,top,right,bottom in merge_black_runs(black_runs)]
+        for chunk in chunks(rectangles):
+            emit(r'\fill[black] ' + '\n    '.join(chunk) + ';')
+        for chunk in chunks(letters):
+            emit(r'\foreach \x/\y/\letter in {%s} \node[answer] at (\x,\y) {\letter};' % ','.join(chunk))
+        for chunk in chunks(numbers):
+            emit(r'\foreach \x/\y/\n in {%s} \node[number] at (\x,\y) {\n};' % ','.join(chunk))
 
+    # finish up
+    emit(r'''
+        \end{tikzpicture}}
+    \end{center}''')
+
+    # vertically centered
+    emit(r'\vspace*{\fill}\vspace*{\fill}\vspace*{\fill}\vspace*{\fill}')
+
+# matches stuff in the form "[foo]bar"
+RE_OPTIONS = re.compile(r'^\[([^\]]*)\](.*)$')
+
+# the page set up from the metadata: (options of the \documentclass,
+# the class, the options of geometry)
+def page_setup(metadata):
     landscape = metadata.get('orientation','portrait').lower() == 'landscape'
 
     # parse the margin
@@ -211,20 +474,12 @@ def render_as_latex(grid,metadata={},answers=False):
             docclass = metadata['documentclass']
             docclassoptions = ''
 
-    # the document is represented as a large list, which is "".join'd at the end
+    return (docclassoptions,docclass,'%s,%s' % (landscape and 'landscape' or 'portrait', margin))
 
-    # setup, default/required packages
-    latex = [r'''\documentclass[%s]{%s}
-\usepackage[utf8]{inputenc}
-\usepackage[T1]{fontenc}
-\usepackage{lmodern}
-\usepackage[%s,%s]{geometry}
-\usepackage{tikz}
-\usetikzlibrary{positioning}
-\usepackage{multicol}
-\usepackage{amsmath}''' % (docclassoptions,docclass,landscape and 'landscape' or 'portrait', margin)]
-    
-    # load more packages
+# the extra packages (@package+) in the metadata, as a list of
+# (options, name)
+def extra_packages(metadata):
+    packages = []
     packagesl = metadata.get('package',[])
     if not isinstance(packagesl, list): # make sure its a list
         packagesl = [packagesl]
@@ -236,83 +491,75 @@ def render_as_latex(grid,metadata={},answers=False):
         else: # no options
             options = ''
             name = p
-        latex.append(r'\usepackage[%s]{%s}' % (options,name))
+        packages.append((options,name))
+    return packages
+
+# everything up to \begin{document}, for the page set up (see
+# page_setup) and packages (see extra_packages)
+def write_preamble(emit,setup,packages):
+    # setup, default/required packages
+    emit(r'''\documentclass[%s]{%s}
+\usepackage[utf8]{inputenc}
+\usepackage[T1]{fontenc}
+\usepackage{lmodern}
+\usepackage[%s]{geometry}
+\usepackage{tikz}
+\usetikzlibrary{positioning}
+\usepackage{multicol}
+\usepackage{amsmath}''' % setup)
+    
+    # load more packages
+    for options,name in packages:
+        emit(r'\usepackage[%s]{%s}' % (options,name))
     
     # no indent, and use sans serif, and no page numbers
-    latex.append(r'''\renewcommand{\familydefault}{\sfdefault}
+    emit(r'''\renewcommand{\familydefault}{\sfdefault}
 \setlength\parindent{0pt}
 \pagestyle{empty}
-\begin{document}
-\thispagestyle{empty}''')
+\begin{document}''')
+
+# the title, grid and clues of a crossword, with the title written
+# with heading (and without the grid if not draw)
+def write_puzzle(emit,grid,metadata,answers=False,compact=False,heading=r'\centerline{\Large %s}\medskip',draw=True):
+    break_page = 'break' in metadata and metadata['break'].lower() == "true" and draw
+
+    landscape = metadata.get('orientation','portrait').lower() == 'landscape' and draw
 
     # we have a title!
     if 'title' in metadata:
-        latex.append(r'\centerline{\Large %s}\medskip'%metadata['title'])
+        emit(heading % metadata['title'])
 
     # we have an author!
     if 'author' in metadata:
-        latex.append(r'\centerline{%s}\medskip'%metadata['author'])
+        emit(r'\centerline{%s}\medskip'%metadata['author'])
         
     # in landscape the clues and crossword go next to each other
     if landscape:
-        latex.append(r'\begin{multicols}{2}')
+        emit(r'\begin{multicols}{2}')
     
     # the scale of the tikzpicture (default is .8)
     scale = metadata.get('scale','0.8')
 
-    tikz = [r'\vspace*{\fill}'] # make it vertically centered (approximately)
-    tikz.append(r'''\begin{center}
-        \scalebox{%s}{
-        \begin{tikzpicture}[number/.style={below right},
-                  answer/.style={color=gray,font=\scshape}]''' % (scale))
-
-    tikz.append(r'\draw[black] (0,%d) grid (%d,0);' % (-ylen,xlen)) # draw the grid
-    
-    # might as well save the clues for later, for efficiencies sake
-    across = []
-    down = []
-    
-    # go through the grid (left-to-right, top-to-bottom) drawing
-    # numbers or black squares as appropriate
-    for i,row in enumerate(grid):
-        for j,c in enumerate(row):
-            if c: # yep there is a letter
-                if answers and c[0]: # we need to print the letter (and it exists)
-                    tikz.append(r'\node[answer] at (%.1f,%.1f) {%s};' % (j+0.5,-i-0.5,c[0]))
-                if c[1] or c[2]: # a clue starts here
-                    if c[1]: # a wild across clue appears
-                        num = c[1].number()
-                        across.append(c[1])
-                    if c[2]: # down too!
-                        num = c[2].number()
-                        down.append(c[2])
-
-                    # draw the number
-                    tikz.append(r'\node[number] at (%d,%d) {%d};' % (j,-i,num)) 
-            else:
-                # it's empty, so make it black
-                tikz.append(r'\fill[black] (%d,%d) rectangle (%d,%d);' % (j,-i,j+1,-i-1))
-    
-    # finish up                
-    tikz.append(r'''
-        \end{tikzpicture}}
-    \end{center}''')
-    
-
-    # vertically centered
-    tikz.append(r'\vspace*{\fill}\vspace*{\fill}\vspace*{\fill}\vspace*{\fill}')
-
-    # crossword goes on the right in landscape, so it needs to be added later
-    if not landscape: 
-        latex += tikz
+    if landscape or not draw or isinstance(grid,Layout):
+        # the crossword goes on the right, after the clues, so find
+        # the clues first (without drawing anything), or they've
+        # already been found
+        across,down = clue_lists(grid)
+        if draw and not landscape:
+            write_tikz(emit,grid,scale,answers,compact)
+    else:
+        # might as well save the clues while drawing, for efficiencies sake
+        across = []
+        down = []
+        write_tikz(emit,grid,scale,answers,compact,across,down)
         
     # do we put the clues separately?
     if break_page:
-        latex.append(r'\pagebreak\vspace*{\fill}') # (vertically center the clues)
+        emit(r'\pagebreak\vspace*{\fill}') # (vertically center the clues)
     
     # clues in 2 columns
-    latex.append(r'\begin{multicols}{2}')
-    latex.append(r'\subsection*{Across}')
+    emit(r'\begin{multicols}{2}')
+    emit(r'\subsection*{Across}')
     
     # How to render the clues. Takes a number, the text of the clue, a
     # length spec and a list of the "child" clues of this clue
@@ -332,55 +579,749 @@ def render_as_latex(grid,metadata={},answers=False):
         else:
             return r'\textbf{%d%s} %s (%s)' % (num, extra, clu,lstring)
     
+    # the rendered clues are the same every time a Layout is drawn
+    rendered = getattr(grid,'latex_clues',None)
+    if rendered is None:
+        rendered = ([rrr(c.number(), c.clue(),c.length_spec(),c.children()) for c in across],
+                    [rrr(c.number(), c.clue(),c.length_spec(),c.children()) for c in down])
+        if isinstance(grid,Layout):
+            grid.latex_clues = rendered
+
     # add all the rendered across clues
-    for c in across:
-        latex.append(rrr(c.number(), c.clue(),c.length_spec(),c.children()) + '\n')
+    for r in rendered[0]:
+        emit(r + '\n')
     
     # down!
-    latex.append(r'\subsection*{Down}')
-    for c in down:
-        latex.append(rrr(c.number(), c.clue(),c.length_spec(),c.children()) + '\n')
+    emit(r'\subsection*{Down}')
+    for r in rendered[1]:
+        emit(r + '\n')
     
-    latex.append(r'\end{multicols}') # end the multicols for the clues
+    emit(r'\end{multicols}') # end the multicols for the clues
 
     if break_page: # vertically center clues if they are on a different page
-        latex.append(r'\vspace*{\fill}\vspace*{\fill}\vspace*{\fill}')
+        emit(r'\vspace*{\fill}\vspace*{\fill}\vspace*{\fill}')
     
     # crossword on the right (and end the multicol that aligns everything)
     if landscape:
-        latex += tikz
-        latex.append(r'\end{multicols}')
+        write_tikz(emit,grid,scale,answers,compact)
+        emit(r'\end{multicols}')
+
+# massively hacky, but, take a grid and metadata and write the
+# crossword as LaTeX to out (a file-like object, like sys.stdout), a
+# piece at a time as it is produced, so the document is never all in
+# memory at once. Without draw, the grid isn't drawn, just the clues
+# (a clue sheet)
+def write_latex(out,grid,metadata={},answers=False,compact=False,draw=True):
+    # each piece of the document is written on its own line
+    def emit(s):
+        out.write(s)
+        out.write('\n')
+
+    write_preamble(emit,page_setup(metadata),extra_packages(metadata))
+    emit(r'\thispagestyle{empty}')
+    write_puzzle(emit,grid,metadata,answers,compact,draw=draw)
 
     # done! phew!
-    latex.append(r'\end{document}')
-    return '\n'.join(latex)
-    
-    
+    emit(r'\end{document}')
+
+# the packages of lots of crosswords (see extra_packages) merged
+# together, in the order they're first used: a package loaded by more
+# than one crossword is only loaded once, with all of their options
+def merge_packages(packagesl):
+    merged = {} # name => list of options
+    for packages in packagesl:
+        for options,name in packages:
+            opts = merged.setdefault(name,[])
+            for o in options.split(','):
+                o = o.strip()
+                if o and o not in opts:
+                    opts.append(o)
+    return [(','.join(opts),name) for name,opts in merged.items()]
+
+# write lots of crosswords, a list of (metadata, grid), into one LaTeX
+# document (a booklet), so LaTeX only has to be run (and load its
+# packages) once. It has the page set up of the first crossword and
+# all of their packages, and each crossword is a section starting on
+# a new page (or "Puzzle n" if it doesn't have a title). With
+# solutions, there's a section at the end with all of the grids with
+# the answers filled in.
+def write_booklet(out,puzzles,answers=False,compact=False,solutions=False):
+    if not puzzles:
+        raise ValueError("A booklet needs at least one crossword")
+    def emit(s):
+        out.write(s)
+        out.write('\n')
+
+    # each grid is drawn twice with solutions (see Layout)
+    if solutions:
+        puzzles = [(metadata,Layout(grid)) for metadata,grid in puzzles]
+
+    # each crossword's title, as its section heading
+    titles = [metadata.get('title','Puzzle %d' % n) for n,(metadata,grid) in enumerate(puzzles,1)]
+
+    write_preamble(emit,page_setup(puzzles[0][0]),
+                   merge_packages(extra_packages(metadata) for metadata,grid in puzzles))
+    for n,(metadata,grid) in enumerate(puzzles):
+        if n:
+            emit(r'\clearpage')
+        emit(r'\thispagestyle{empty}')
+        write_puzzle(emit,grid,dict(metadata,title=titles[n]),answers,compact,r'\section*{%s}')
+
+    if solutions:
+        emit(r'\clearpage')
+        emit(r'\section*{Solutions}')
+        for n,(metadata,grid) in enumerate(puzzles):
+            emit(r'\subsection*{%s}' % titles[n])
+            write_tikz(emit,grid,metadata.get('scale','0.8'),True,compact)
+            emit(r'\bigskip')
+
+    emit(r'\end{document}')
+
+# the same as write_latex, but returns the LaTeX as a string (without
+# a newline at the end)
+def render_as_latex(grid,metadata={},answers=False,compact=False):
+    out = io.StringIO()
+    write_output(out,grid,metadata,answers,compact)
+    return out.getvalue()[:-1]
+
+# the extension of crossword files, used when searching directories
+EXTENSION = '.crossword'
+
+# whether filename is a compiled crossword (see cwb.py)
+def is_compiled(filename):
+    return filename.endswith(cwb.EXTENSION)
+
+# load the metadata and build the grid of a file, which can be a
+# normal crossword or a compiled one, returns (metadata, grid)
+def load_grid(filename,engine='python'):
+    if is_compiled(filename):
+        with instrument.phase('load'):
+            metadata,clues,grid = cwb.load(filename)
+        return (metadata,grid)
+    metadata = {}
+    grid = make_grid(stream_file(filename,metadata),engine)
+    return (metadata,grid)
+
+# compile a crossword file into the binary format (see cwb.py)
+def compile_file(filename,outname,engine='python'):
+    metadata,grid = load_grid(filename,engine)
+    cwb.save(outname,metadata,grid)
+
+# expand a list of files and directories into a list of crossword
+# files (directories contribute every *.crossword and *.cwb file
+# inside them, and those in the IMPORTS formats)
+def find_puzzles(paths):
+    found = []
+    for p in paths:
+        if os.path.isdir(p):
+            for f in sorted(os.listdir(p)):
+                if f.endswith((EXTENSION,cwb.EXTENSION)) or is_imported(f):
+                    found.append(os.path.join(p,f))
+        else:
+            found.append(p)
+    return found
+
+# the output formats, and the extension of the files they're
+# written to. ipuz, puz (Across Lite) and crossword (a clue file) are
+# for converting crosswords, and always have the answers
+FORMATS = {'latex': '.tex', 'svg': '.svg', 'png': '.png',
+           'ipuz': '.ipuz', 'puz': '.puz', 'crossword': EXTENSION}
+
+# the formats that are written to binary files
+BINARY_FORMATS = ('png','puz')
+
+# the name of the file that a crossword file gets rendered to in the
+# directory outdir
+def output_name(filename,outdir,format='latex'):
+    base = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(outdir, base + FORMATS[format])
+
+# the string representing the options that change the output (for
+# the cache key)
+def render_options(answers,compact=False,format='latex'):
+    options = (answers and '-A' or '') + (compact and '-C' or '')
+    if format != 'latex':
+        options += ' --format=' + format
+    return options
+
+# write the grid to out in one of the FORMATS (out has to be binary
+# for the BINARY_FORMATS). SVG and PNG skip LaTeX altogether (see
+# svg.py and png.py)
+def write_output(out,grid,metadata,answers=False,compact=False,format='latex'):
+    if instrument.active:
+        out = instrument.CountingWriter(out)
+    with instrument.phase('render'):
+        if format == 'svg':
+            import svg
+            svg.write_svg(out,grid,metadata,answers)
+        elif format == 'png':
+            import png
+            png.write_png(out,grid,metadata,answers)
+        elif format == 'ipuz':
+            import ipuz
+            ipuz.write_ipuz(out,grid,metadata)
+        elif format == 'puz':
+            import acrosslite
+            acrosslite.write_puz(out,grid,metadata)
+        elif format == 'crossword':
+            import interchange
+            interchange.write_crossword(out,grid,metadata)
+        else:
+            write_latex(out,grid,metadata,answers,compact)
+
+# the variants of a crossword that can be written from one build: the
+# blank puzzle, the answer key, and a clue sheet (just the clues, only
+# in LaTeX)
+VARIANTS = ['puzzle','answers','clues']
+
+# write one of the VARIANTS of the grid (best as a Layout, if there's
+# more than one) to out in format
+def write_variant(out,grid,metadata,variant,compact=False,format='latex'):
+    if variant != 'clues':
+        write_output(out,grid,metadata,variant == 'answers',compact,format)
+        return
+    if format != 'latex':
+        raise ValueError("The clues variant can only be LaTeX")
+    if instrument.active:
+        out = instrument.CountingWriter(out)
+    with instrument.phase('render'):
+        write_latex(out,grid,metadata,False,compact,False)
+
+# the name of the file that a variant is written to, for the output
+# prefix
+def variant_name(prefix,variant,format='latex'):
+    return '%s-%s%s' % (prefix,variant,FORMATS[format])
+
+# write each of variants of a built grid (see VARIANTS) to its own
+# file, named after prefix (see variant_name). The rows, numbers and
+# clues are only gone through once (see Layout).
+# returns the names of the files written
+def write_variants(prefix,grid,metadata,variants,compact=False,format='latex'):
+    layout = Layout(grid)
+    written = []
+    for variant in variants:
+        outname = variant_name(prefix,variant,format)
+        with open(outname,'wb' if format in BINARY_FORMATS else 'w') as out:
+            write_variant(out,layout,metadata,variant,compact,format)
+        written.append(outname)
+    return written
+
+# writes everything written to it to all of the files given
+class Tee(object):
+    def __init__(self,*files):
+        self._files = files
+    def write(self,s):
+        for f in self._files:
+            f.write(s)
+
+# write the output for grid to out, also storing it under key in
+# render_cache (a cache.RenderCache) if there is one (binary formats
+# aren't cached, since the cache only holds text)
+def write_cached(out,grid,metadata,answers=False,compact=False,render_cache=None,key=None,format='latex'):
+    if render_cache is None or format in BINARY_FORMATS:
+        write_output(out,grid,metadata,answers,compact,format)
+        return
+    with render_cache.writer(key) as entry:
+        write_output(Tee(out,entry),grid,metadata,answers,compact,format)
+
+# copy the output stored under key in render_cache to out, returns
+# whether it was there
+def copy_cached(out,render_cache,key):
+    cached = render_cache and render_cache.lookup(key)
+    if not cached:
+        return False
+    with cached:
+        shutil.copyfileobj(cached,out)
+    return True
+
+# a context manager giving a file to write outname to, which is a
+# temporary file in the same directory until the block finishes
+# without an error, so a failed render doesn't leave an empty or
+# partial file there (it's deleted instead)
+@contextlib.contextmanager
+def replacing(outname,binary=False):
+    tmp = '%s.%d.tmp' % (outname,os.getpid())
+    try:
+        with open(tmp,'wb' if binary else 'w') as out:
+            yield out
+        os.replace(tmp,outname)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+# load, build and render a single file, writing the output (in
+# format) to outname, (using the output in render_cache, a
+# cache.RenderCache, if it's there)
+def render_file(filename,outname,answers=False,render_cache=None,compact=False,engine='python',format='latex'):
+    if format in BINARY_FORMATS:
+        render_cache = None
+    key = None
+    if render_cache:
+        key = render_cache.file_key(filename,render_options(answers,compact,format))
+        cached = render_cache.lookup(key)
+        if cached:
+            with cached, replacing(outname) as out:
+                shutil.copyfileobj(cached,out)
+            return outname
+
+    metadata,grid = load_grid(filename,engine)
+    with replacing(outname,format in BINARY_FORMATS) as out:
+        write_cached(out,grid,metadata,answers,compact,render_cache,key,format)
+    return outname
+
+# render lots of files into outdir using a pool of worker processes
+# (workers=None means one per CPU), an error in one file is reported
+# but doesn't stop the others.
+# returns a list of (filename, error) for the files that failed
+def render_batch(filenames,outdir,answers=False,workers=None,render_cache=None,compact=False,engine='python',format='latex'):
+    from concurrent.futures import ProcessPoolExecutor
+
+    os.makedirs(outdir,exist_ok=True)
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [(f, pool.submit(render_file,f,output_name(f,outdir,format),answers,render_cache,compact,engine,format))
+                for f in filenames]
+        for f,job in jobs:
+            try:
+                job.result()
+            except Exception as e:
+                message("Error: %s:" % f, e)
+                failed.append((f,e))
+    return failed
+
+# the extensions of the archives that convert reads crosswords from
+ARCHIVES = ('.tar','.tar.gz','.tgz','.tar.bz2','.tbz2','.tar.xz','.txz')
+
+def is_archive(filename):
+    return filename == '-' or filename.lower().endswith(ARCHIVES)
+
+def is_puzzle(filename):
+    return filename.endswith((EXTENSION,cwb.EXTENSION)) or is_imported(filename)
+
+# the crosswords in paths (files, directories and tar archives, with -
+# for an archive on stdin), one at a time: a filename, or (name, data)
+# for a file in an archive. Archives are read as a stream, one file at
+# a time, so they are never all in memory
+def iter_sources(paths):
+    import tarfile
+    for p in find_puzzles(paths):
+        if not is_archive(p):
+            yield p
+            continue
+        if p == '-':
+            archive = tarfile.open(fileobj=sys.stdin.buffer,mode='r|*')
+        else:
+            archive = tarfile.open(p,mode='r|*')
+        with archive:
+            for member in archive:
+                if member.isfile() and is_puzzle(member.name):
+                    yield (member.name,archive.extractfile(member).read())
+
+# load the metadata and build the grid of the data (bytes) of a file
+# called name, like load_grid
+def load_data(name,data,engine='python'):
+    if is_compiled(name):
+        metadata,clues,grid = cwb.loads(data)
+        return (metadata,grid)
+    metadata = {}
+    grid = make_grid(stream_clues(import_lines(name,data),metadata),engine)
+    return (metadata,grid)
+
+# convert a crossword (from iter_sources) into format, in the directory
+# outdir (nothing is written if it can't be converted). Returns the
+# name of the file written
+def convert_file(source,outdir,format,answers=False,compact=False,engine='python'):
+    if isinstance(source,tuple):
+        name,data = source
+    else:
+        name = source
+        with open(name,'rb') as f:
+            data = f.read()
+    metadata,grid = load_data(name,data,engine)
+    out = io.BytesIO() if format in BINARY_FORMATS else io.StringIO()
+    write_output(out,grid,metadata,answers,compact,format)
+
+    outname = output_name(name,outdir,format)
+    with open(outname,'wb' if format in BINARY_FORMATS else 'w') as f:
+        f.write(out.getvalue())
+    return outname
+
+# convert every crossword in paths (see iter_sources) into outdir,
+# using a pool of worker processes (workers=None means one per CPU).
+# Only as many crosswords are read as there are workers to convert
+# them, so memory doesn't grow with the number of crosswords. An
+# error in one is reported but doesn't stop the others.
+# returns (the number converted, a list of (name, error) for those
+# that failed)
+def convert_batch(paths,outdir,format,answers=False,workers=None,compact=False,engine='python'):
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+    os.makedirs(outdir,exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    failed = []
+    count = 0
+    running = {} # job => name
+    def finish(jobs):
+        for job in jobs:
+            name = running.pop(job)
+            try:
+                job.result()
+            except Exception as e:
+                message("Error: %s:" % name, e)
+                failed.append((name,e))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for source in iter_sources(paths):
+            if len(running) >= workers:
+                finish(wait(running,return_when=FIRST_COMPLETED)[0])
+            name = source[0] if isinstance(source,tuple) else source
+            running[pool.submit(convert_file,source,outdir,format,answers,compact,engine)] = name
+            count += 1
+        finish(list(running))
+    return (count,failed)
+
 if __name__ == '__main__':
-    import sys, getopt
+    import sys, getopt, itertools, tarfile
     
     # options
-    ops,args = getopt.getopt(sys.argv[1:],'A')
+    ops,args = getopt.gnu_getopt(sys.argv[1:],'ACo:j:',
+                             ['no-cache','cache-dir=','cache-size=','watch','check','engine=','format=',
+                              'host=','port=','socket=','fill=','solutions','variants=',
+                              'profile','profile-json=','profile-phase='])
 
-    # only one option though
     answers = False
+    compact = False
+    output = None # output directory for batch mode, or file for --watch
+    workers = None # number of processes, for batch mode
+    use_cache = True
+    cachedir = None # the default
+    cachesize = cache.DEFAULT_LIMIT
+    watching = False
+    checking = False
+    engine = 'python'
+    format = None # latex, or crossword for convert
+    host = '127.0.0.1' # for serve
+    port = 8080
+    socket = None
+    profile = False # print the time taken by each phase at the end
+    profile_json = None # or save it to this file
+    profile_phase = None # and run cProfile on this phase
+    fillwords = None # fill in the length spec clues from this word list
+    solutions = False # for booklet
+    variants = None # write each of these (see VARIANTS) from one build
     for op,arg in ops:
         if op == '-A':
             answers = True
+        elif op == '-C':
+            compact = True
+        elif op == '-o':
+            output = arg
+        elif op == '-j':
+            workers = int(arg)
+        elif op == '--no-cache':
+            use_cache = False
+        elif op == '--cache-dir':
+            cachedir = arg
+        elif op == '--cache-size':
+            cachesize = cache.parse_size(arg)
+        elif op == '--watch':
+            watching = True
+        elif op == '--check':
+            checking = True
+        elif op == '--engine':
+            engine = arg
+        elif op == '--format':
+            format = arg.lower()
+            if format not in FORMATS:
+                message("Error: Unknown format %s (should be one of %s)" % (arg,', '.join(sorted(FORMATS))))
+                sys.exit(2)
+        elif op == '--host':
+            host = arg
+        elif op == '--port':
+            port = int(arg)
+        elif op == '--socket':
+            socket = arg
+        elif op == '--profile':
+            profile = True
+        elif op == '--profile-json':
+            profile_json = arg
+        elif op == '--profile-phase':
+            profile_phase = arg
+        elif op == '--fill':
+            fillwords = arg
+        elif op == '--solutions':
+            solutions = True
+        elif op == '--variants':
+            variants = [v.strip().lower() for v in arg.split(',') if v.strip()]
+            unknown = [v for v in variants if v not in VARIANTS]
+            if unknown or not variants:
+                message("Error: Unknown variant %s (should be some of %s)" % (','.join(unknown),', '.join(VARIANTS)))
+                sys.exit(2)
+    if format is None:
+        format = args[:1] == ['convert'] and 'crossword' or 'latex'
+    if format in BINARY_FORMATS: # the cache only holds text
+        use_cache = False
+    if fillwords: # the output depends on the word list too
+        use_cache = False
+    if variants: # (they're all written straight to their files)
+        use_cache = False
+
+    # everything from here on is recorded, and reported when we exit
+    # (however that happens)
+    if profile or profile_json or profile_phase:
+        import atexit
+        recording = instrument.start(profile_phase)
+        def report():
+            if profile_json:
+                recording.dump(profile_json)
+            if profile or profile_phase:
+                recording.report(sys.stderr)
+        atexit.register(report)
+
+    render_cache = None
+    if use_cache:
+        render_cache = cache.RenderCache(__version__,cachedir,cachesize)
+
+    # compile a crossword into the binary format, which can be used
+    # instead of it from then on
+    if args[:1] == ['compile']:
+        if len(args) != 2:
+            message("Error: compile needs one file")
+            sys.exit(2)
+        if output is None:
+            output = os.path.splitext(args[1])[0] + cwb.EXTENSION
+        try:
+            compile_file(args[1],output,engine)
+        except ValueError as e:
+            message("Error:", e)
+            sys.exit(1)
+        sys.exit(0)
+
+    # compile a word list into an index (see wordlist.py), for --fill
+    # and match
+    if args[:1] == ['index']:
+        import wordlist
+        if len(args) != 2:
+            message("Error: index needs one word list")
+            sys.exit(2)
+        if output is None:
+            output = os.path.splitext(args[1])[0] + wordlist.EXTENSION
+        wordlist.WordIndex.load(args[1]).save(output)
+        sys.exit(0)
+
+    # look up the entries of a word list (or its index) matching
+    # patterns like c?o??w, or the slots of crosswords that are partly
+    # filled in
+    if args[:1] == ['match']:
+        import fill, wordlist
+        if len(args) < 3:
+            message("Error: match needs a word list, and patterns or crossword files")
+            sys.exit(2)
+        try:
+            index = wordlist.load(args[1])
+            for query in args[2:]:
+                if os.path.isfile(query):
+                    if is_compiled(query):
+                        clues = cwb.load(query)[1]
+                    else:
+                        clues = make_grid(from_file(query)[1],engine).clues() # (numbered)
+                    for s,pattern,entries in fill.match_slots(clues,index):
+                        print('%s: %d-%s %s (%d)' % (query,s.clue.number(),s.clue.direction_name(True),
+                                                     wordlist.format_pattern(pattern),len(entries)))
+                        for e in entries:
+                            print('    ' + e)
+                else:
+                    entries = index.match(*wordlist.parse_pattern(query))
+                    if len(args) > 3:
+                        print('%s (%d)' % (query,len(entries)))
+                    for e in entries:
+                        print(len(args) > 3 and '    ' + e or e)
+        except ValueError as e:
+            message("Error:", e)
+            sys.exit(1)
+        sys.exit(0)
 
+    # keep running, rendering crosswords sent over HTTP (see server.py)
+    if args[:1] == ['serve']:
+        import server
+        server.serve(host,port,socket,workers,engine=engine)
+        sys.exit(0)
+
+    # convert crosswords (including whole directories and archives of
+    # them) into another format, e.g. from ipuz to Across Lite
+    if args[:1] == ['convert']:
+        if len(args) < 2 or output is None:
+            message("Error: convert needs crossword files, directories or archives, and an output directory (-o)")
+            sys.exit(2)
+        try:
+            count,failed = convert_batch(args[1:],output,format,answers,workers,compact,engine)
+        except (OSError,tarfile.TarError) as e:
+            message("Error:", e)
+            sys.exit(1)
+        if failed:
+            message("Error: %d of %d files failed" % (len(failed),count))
+            sys.exit(1)
+        if not count:
+            message("Error: No crossword files found")
+            sys.exit(2)
+        sys.exit(0)
+
+    # put lots of crosswords into one LaTeX document
+    if args[:1] == ['booklet']:
+        filenames = find_puzzles(args[1:])
+        if not filenames:
+            message("Error: booklet needs crossword files or directories")
+            sys.exit(2)
+        puzzles = []
+        for filename in filenames:
+            try:
+                puzzles.append(load_grid(filename,engine))
+            except ValueError as e:
+                message("Error: %s:" % filename, e)
+                sys.exit(1)
+        try:
+            latex = io.StringIO()
+            write_booklet(latex,puzzles,answers,compact,solutions)
+        except ValueError as e:
+            message("Error:", e)
+            sys.exit(1)
+        if output is None:
+            sys.stdout.write(latex.getvalue())
+        else:
+            with open(output,'w') as out:
+                out.write(latex.getvalue())
+        sys.exit(0)
+
+    # just look for problems in the clues (of stdin, or the files)
+    if checking:
+        import check
+        failed = False
+        for filename in find_puzzles(args) or [None]:
+            metadata = {}
+            prefix = '%s: ' % filename if filename else ''
+            try:
+                if filename is None:
+                    problems = check.check(stream_clues(sys.stdin,metadata))
+                elif is_compiled(filename):
+                    problems = check.check(cwb.load(filename)[1])
+                else:
+                    problems = check.check(stream_file(filename,metadata))
+            except ValueError as e: # (a file that can't be read at all)
+                message(prefix + "Error: %s" % e)
+                failed = True
+                continue
+            for p in problems:
+                message(prefix + check.format_problem(p))
+            failed = failed or check.has_errors(problems)
+        sys.exit(failed and 1 or 0)
+
+    # write each variant (into files starting with the output prefix)
+    # from one build of the grid
+    if variants and (watching or output is None or len(args) > 1 or
+                     any(os.path.isdir(a) for a in args)):
+        message("Error: --variants needs one crossword file (or stdin) and an output prefix (-o)")
+        sys.exit(2)
+    if variants and 'clues' in variants and format != 'latex':
+        message("Error: The clues variant can only be LaTeX")
+        sys.exit(2)
+
+    if fillwords and (watching or (output is not None and not variants) or len(args) > 1 or
+                     any(os.path.isdir(a) or is_compiled(a) for a in args)):
+        message("Error: --fill only works on one crossword file")
+        sys.exit(2)
+
+    # keep rendering a file into the output file whenever it changes
+    if watching:
+        if len(args) != 1 or output is None:
+            message("Error: --watch needs one file and an output file (-o)")
+            sys.exit(2)
+        if format != 'latex':
+            message("Error: --watch only makes LaTeX")
+            sys.exit(2)
+        import watch
+        watch.Watcher(args[0],output,answers,compact).run()
+        sys.exit(0)
+
+    # more than one file (or a directory): batch mode, rendering
+    # everything into the output directory
+    if not variants and (output is not None or len(args) > 1 or any(os.path.isdir(a) for a in args)):
+        if output is None:
+            message("Error: Batch mode needs an output directory (-o)")
+            sys.exit(2)
+        filenames = find_puzzles(args)
+        if not filenames:
+            message("Error: No crossword files found")
+            sys.exit(2)
+        failed = render_batch(filenames,output,answers,workers,render_cache,compact,engine,format)
+        if failed:
+            message("Error: %d of %d files failed" % (len(failed),len(filenames)))
+            sys.exit(1)
+        sys.exit(0)
+
+    key = None # the key in the cache
     f = sys.stdin # default to stdin
     if args: # but if there are files specified, use them
-        f = open(args[0],'rU')
+        if render_cache:
+            key = render_cache.file_key(args[0],render_options(answers,compact,format))
+        if is_imported(args[0]):
+            with open(args[0],'rb') as data:
+                try:
+                    f = import_lines(args[0],data.read())
+                except ValueError as e:
+                    message("Error:", e)
+                    sys.exit(1)
+        elif not is_compiled(args[0]):
+            f = open(args[0])
+    elif render_cache: # the whole input is needed to work out the key
+        text = f.read()
+        key = render_cache.key(text,render_options(answers,compact,format))
+        f = text.splitlines()
+
+    stdout = sys.stdout.buffer if format in BINARY_FORMATS else sys.stdout
 
-    # load the clues
-    metadata,clues=load_clues(f)
-    if clues: # yep, found clues!
+    if copy_cached(stdout,render_cache,key):
+        sys.exit(0)
+
+    if args and is_compiled(args[0]): # already built
         try:
-            grid = make_grid(clues)
-        except ValueError as e: # failed!
+            metadata,grid = load_grid(args[0])
+        except ValueError as e:
             message("Error:", e)
             sys.exit(1)
-        print(render_as_latex(grid,metadata,answers))
     else:
-        message("Error: No clues found")
-        sys.exit(2)
+        # load the clues, building the grid as they are read
+        metadata = {}
+        clues = stream_clues(f,metadata)
+        first = next(clues,None)
+        if not first:
+            message("Error: No clues found")
+            sys.exit(2)
+        clues = itertools.chain([first],clues)
+        try:
+            if fillwords: # all of the clues are needed to fill them in
+                import fill, wordlist
+                clues = dict(clues)
+                with instrument.phase('autofill'):
+                    fill.fill(clues,wordlist.load(fillwords))
+            grid = make_grid(clues,engine)
+        except ValueError as e: # failed!
+            message("Error:", e)
+            sys.exit(1)
+
+    if variants:
+        try:
+            for outname in write_variants(output,grid,metadata,variants,compact,format):
+                message("Wrote %s" % outname)
+        except ValueError as e:
+            message("Error:", e)
+            sys.exit(1)
+        sys.exit(0)
+
+    # written as it's produced, rather than all at the end
+    try:
+        write_cached(stdout,grid,metadata,answers,compact,render_cache,key,format)
+    except ValueError as e: # it can't be written in that format
+        message("Error:", e)
+        sys.exit(1)
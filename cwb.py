@@ -0,0 +1,193 @@
+# cwb.py
+
+# a compact binary format for a fully built crossword (the metadata,
+# the clues with their numbers and resolved text, and the grid), so it
+# can be loaded again without parsing anything. Loading just maps the
+# file into memory and unpacks fixed-size records.
+#
+# the layout (all little-endian) is
+#
+#   header:  magic 'CWB', format version, and the number of strings,
+#            metadata entries, clues and cells (HEADER)
+#   strings: the offset of each string in the blob (n + 1 uint32s),
+#            then the blob of UTF-8, padded to 4 bytes. Everything
+#            else refers to strings by index (-1 for None)
+#   metadata: key, value, and whether it is a list option (META)
+#   clues:   direction, x, y, length, number, name, answer, length
+#            spec, original text, resolved text, and the index of the
+#            parent for separated clues (-1 for none) (CLUE)
+#   cells:   x, y, letter (a code point, 0 for none), and the index of
+#            the across and down clues starting there (-1 for none)
+#            (CELL), left-to-right, top-to-bottom
+
+import mmap, struct
+import clue
+from grid import Grid, BuiltPuzzle
+
+MAGIC = b'CWB'
+VERSION = 1
+
+HEADER = struct.Struct('<3sBIIII')
+META = struct.Struct('<iiB3x')
+CLUE = struct.Struct('<B3xiiiiiiiiii')
+CELL = struct.Struct('<iiIii')
+
+# the extension of compiled crosswords
+EXTENSION = '.cwb'
+
+# collects strings into a table, giving each one an index
+class _StringTable(object):
+    def __init__(self):
+        self._index = {}
+        self._strings = []
+    def add(self,s):
+        if s is None:
+            return -1
+        i = self._index.get(s)
+        if i is None:
+            i = self._index[s] = len(self._strings)
+            self._strings.append(s.encode('utf-8'))
+        return i
+    def write(self,out):
+        offsets = [0]
+        for s in self._strings:
+            offsets.append(offsets[-1] + len(s))
+        out.write(struct.pack('<%dI' % len(offsets),*offsets))
+        out.write(b''.join(self._strings))
+        out.write(b'\0' * (-offsets[-1] % 4))
+
+# every clue in a grid, in grid order, followed by the later parts of
+# separated clues (which start in cells of their own) in the order
+# they are in their clue, so parents always come before their children
+def grid_clues(grid):
+    found = []
+    for i,j,cell in grid.cells():
+        for c in cell[1:]:
+            if c and not c.parent():
+                found.append(c)
+    return found + [child for c in found for child in c.children()]
+
+# write a built crossword (metadata and the grid from make_grid) to
+# filename
+def save(filename,metadata,grid):
+    strings = _StringTable()
+
+    meta = []
+    for key,value in metadata.items():
+        if isinstance(value,list):
+            for v in value:
+                meta.append(META.pack(strings.add(key),strings.add(v),1))
+        else:
+            meta.append(META.pack(strings.add(key),strings.add(value),0))
+
+    allclues = grid_clues(grid)
+    index = dict((id(c),k) for k,c in enumerate(allclues))
+    clues = []
+    for c in allclues:
+        x,y = c.startpoint()
+        parent = c.parent()
+        clues.append(CLUE.pack(c.is_across() and clue.Direction.ACROSS or clue.Direction.DOWN,
+                               x,y,c.length(),c.number(),
+                               strings.add(c.name()),strings.add(c.answer()),
+                               strings.add(c.length_spec()),strings.add(c.text()),
+                               strings.add(c.clue()),
+                               index[id(parent)] if parent else -1))
+
+    minx,miny = grid.origin()
+    cells = []
+    for i,j,(letter,across,down) in grid.cells():
+        cells.append(CELL.pack(j + minx,i + miny,ord(letter) if letter else 0,
+                               index[id(across)] if across else -1,
+                               index[id(down)] if down else -1))
+
+    with open(filename,'wb') as out:
+        out.write(HEADER.pack(MAGIC,VERSION,len(strings._strings),len(meta),len(clues),len(cells)))
+        strings.write(out)
+        out.write(b''.join(meta))
+        out.write(b''.join(clues))
+        out.write(b''.join(cells))
+
+# load a compiled crossword, returns (metadata, dictionary of clues
+# (name => BuiltClue, like load_clues), grid (a BuiltPuzzle, like
+# make_grid))
+def load(filename):
+    with open(filename,'rb') as f, mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ) as m:
+        data = memoryview(m)
+        try:
+            return _load(data)
+        finally:
+            data.release()
+
+# the same, for a compiled crossword that's already in memory (bytes)
+def loads(data):
+    return _load(memoryview(data))
+
+def _load(data):
+    try:
+        return _read(data)
+    except (struct.error,IndexError,OverflowError) as e:
+        raise ValueError("Not a compiled crossword (it's truncated or corrupt: %s)" % e)
+
+def _read(data):
+    if len(data) < HEADER.size:
+        raise ValueError("Not a compiled crossword (too short)")
+    magic,version,nstrings,nmeta,nclues,ncells = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a compiled crossword")
+    if version != VERSION:
+        raise ValueError("Unsupported compiled crossword version %d" % version)
+    pos = HEADER.size
+    def check(end): # (the sections are sliced, which doesn't notice a short file)
+        if end > len(data):
+            raise ValueError("Not a compiled crossword (it's truncated)")
+
+    offsets = struct.unpack_from('<%dI' % (nstrings + 1),data,pos)
+    pos += 4 * (nstrings + 1)
+    check(pos + offsets[-1])
+    blob = data[pos:pos + offsets[-1]]
+    strings = [str(blob[offsets[k]:offsets[k + 1]],'utf-8') for k in range(nstrings)]
+    strings.append(None) # so -1 is None
+    pos += offsets[-1] + (-offsets[-1] % 4)
+    blob.release()
+
+    metadata = {}
+    end = pos + META.size * nmeta
+    check(end)
+    for key,value,islist in META.iter_unpack(data[pos:end]):
+        if islist:
+            metadata.setdefault(strings[key],[]).append(strings[value])
+        else:
+            metadata[strings[key]] = strings[value]
+    pos = end
+
+    clues = {}
+    allclues = []
+    count = 0
+    end = pos + CLUE.size * nclues
+    check(end)
+    for (direction,x,y,length,number,name,answer,spec,text,resolved,parent) in CLUE.iter_unpack(data[pos:end]):
+        c = clue.Clue(direction,strings[name],x,y,strings[answer],strings[spec],
+                      length,strings[text],[],allclues[parent] if parent >= 0 else None)
+        c.number(number)
+        c.resolved_clue(strings[resolved])
+        if parent >= 0:
+            allclues[parent].add_child(c)
+        allclues.append(c)
+
+        id = c.name()
+        if not id or parent >= 0:
+            id = count
+            count += 1
+        clues[id] = c
+    pos = end
+
+    grid = Grid()
+    end = pos + CELL.size * ncells
+    check(end)
+    for x,y,letter,across,down in CELL.iter_unpack(data[pos:end]):
+        grid.set(x,y,(chr(letter) if letter else None,
+                      allclues[across] if across >= 0 else None,
+                      allclues[down] if down >= 0 else None))
+
+    clue.freeze(allclues)
+    return (metadata,clues,BuiltPuzzle(grid,allclues))
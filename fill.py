@@ -0,0 +1,241 @@
+# fill.py
+
+# fills in the clues that only have a length spec (e.g. "(6)" or
+# "(9,4)"), using the entries of a word list (see wordlist.py), so
+# that they agree with each other and with the answers that are
+# already there. Each clue to fill is a slot (a separated clue is one
+# slot, going through the cells of all of its parts), and the search
+# is a backtracking one:
+#
+#  - the slot with the fewest matching entries is filled next (most
+#    constrained first), trying its entries in word list order
+#  - after each choice, the slots crossing it are checked to still
+#    have at least one matching entry (forward checking), otherwise the
+#    next entry is tried
+#  - when a slot runs out of entries, the last choice is undone
+#
+# Slots whose cells are all already filled in by other answers just
+# get those letters, whether or not they're in the word list. No entry
+# is used twice, or used if it's already an answer.
+
+import clue, interchange
+from wordlist import popcount, normalise
+
+# a clue (and its parts, if it's separated) to be filled
+class Slot(object):
+    def __init__(self,c):
+        self.clue = c
+        self.parts = [c] + c.children()
+        self.cells = [p for part in self.parts for p in part.points()]
+        self.length = len(self.cells)
+        self.shape = shape(c,self.parts)
+        self.entry = None # the word list entry it's filled with, as written there
+
+    def describe(self):
+        x,y = self.clue.startpoint()
+        return '%s clue at (%d,%d)' % (self.clue.direction_name(True),x,y)
+
+# the lengths of the words of a clue from its length spec, or the
+# lengths of the parts of a separated clue if the spec doesn't add up
+# (the & between the parts is lost from the spec)
+def shape(c,parts):
+    spec = c.length_spec()
+    if spec:
+        lengths = [int(n) for n in clue.RE_PUNCT.split(spec) if n.isdigit()]
+        if sum(lengths) == sum(p.length() for p in parts):
+            return tuple(lengths)
+    return tuple(p.length() for p in parts)
+
+# the slots to fill in a dictionary of clues (or a list of them), and
+# the letters already in each cell, (x, y) => letter, from the clues
+# with answers (filled in the same way as make_grid)
+def find_slots(clues):
+    if isinstance(clues,dict):
+        clues = clues.values()
+    slots = []
+    letters = {}
+    for c in clues:
+        if c.parent():
+            continue # it's part of its parent's slot
+        if c.answer() is None and not any(p.answer() for p in c.children()):
+            slots.append(Slot(c))
+            continue
+        for part in [c] + c.children():
+            answer = part.text_answer() or ''
+            for (x,y),ch in zip(part.points(),answer):
+                letters[(x,y)] = ch
+    return (slots,letters)
+
+# the answers already in clues (their letters in lower case, with the
+# parts of separated clues joined up), which aren't used again
+def used_answers(clues):
+    if isinstance(clues,dict):
+        clues = clues.values()
+    used = set()
+    for c in clues:
+        if not c.parent():
+            answer = ''.join(p.text_answer() or '' for p in [c] + list(c.children()))
+            if answer:
+                used.add(answer.lower())
+    return used
+
+class Filler(object):
+    def __init__(self,clues,index):
+        self.index = index
+        self.slots,self.letters = find_slots(clues)
+        # answers are normally lowercase, but match the ones that are
+        # there if they're all uppercase
+        self.upper = bool(self.letters) and all(ch.isupper() for ch in self.letters.values())
+        self.used = used_answers(clues)
+
+        # the other slots each slot crosses
+        bycell = {}
+        for i,s in enumerate(self.slots):
+            for p in s.cells:
+                bycell.setdefault(p,[]).append(i)
+        self.crossing = [sorted(set(j for p in s.cells for j in bycell[p] if j != i))
+                         for i,s in enumerate(self.slots)]
+
+        self.nodes = 0 # entries tried
+        self.backtracks = 0
+
+    def pattern(self,i):
+        return [self._lower(self.letters.get(p)) for p in self.slots[i].cells]
+
+    def _lower(self,ch):
+        return ch.lower() if ch else None
+
+    # the entries that can go in slot i, as a bitset
+    def candidates(self,i):
+        s = self.slots[i]
+        return self.index.candidates(self.pattern(i),s.shape)
+
+    # fill in the slots, setting the answers of the clues, returns the
+    # number filled. Raises ValueError if it can't be done
+    def fill(self,limit=None):
+        unassigned = set()
+        bits = {}
+        for i,s in enumerate(self.slots):
+            pattern = self.pattern(i)
+            if None not in pattern: # already filled in by crossing answers
+                self._set_answer(s,''.join(pattern),None)
+                continue
+            bits[i] = self.candidates(i)
+            if not bits[i]:
+                raise ValueError("Nothing in the word list fits the %s (%s)" % (
+                    s.describe(),''.join(ch or '?' for ch in pattern)))
+            unassigned.add(i)
+
+        chosen = {} # slot => (letters, entry)
+        stack = [] # [slot, entries left to try, cells filled in, letters]
+        frame = None
+        while True:
+            if frame is None:
+                if not unassigned: # done!
+                    break
+                i = min(unassigned,key=lambda i: popcount(bits[i]))
+                unassigned.remove(i)
+                frame = [i,bits[i],[],None]
+                stack.append(frame)
+            if self._next(frame,bits,unassigned):
+                if limit is not None and self.nodes > limit:
+                    raise ValueError("Gave up filling the grid after %d tries" % self.nodes)
+                chosen[frame[0]] = frame[3]
+                frame = None
+                continue
+            # nothing fits, so go back and change the last choice
+            self.backtracks += 1
+            stack.pop()
+            unassigned.add(frame[0])
+            if not stack:
+                raise ValueError("The grid can't be filled from the word list")
+            frame = stack[-1]
+
+        for i,(letters,entry) in chosen.items():
+            self._set_answer(self.slots[i],letters,entry)
+        return len(self.slots)
+
+    # undo the entry in frame (if any), and put the next one that fits
+    # in its place, returns whether there was one
+    def _next(self,frame,bits,unassigned):
+        i,remaining,changed,current = frame
+        s = self.slots[i]
+        if current:
+            for p in changed:
+                del self.letters[p]
+            self.used.discard(current[0])
+            for j in self.crossing[i]:
+                if j in unassigned:
+                    bits[j] = self.candidates(j)
+
+        n = s.length
+        while remaining:
+            low = remaining & -remaining
+            remaining ^= low
+            k = low.bit_length() - 1
+            letters = self.index.letters(n,k)
+            if letters in self.used:
+                continue
+            self.nodes += 1
+
+            changed = [p for p in s.cells if p not in self.letters]
+            for p,ch in zip(s.cells,letters):
+                if p not in self.letters:
+                    self.letters[p] = ch
+
+            # forward checking: everything crossing it must still fit
+            narrowed = {}
+            for j in self.crossing[i]:
+                if j in unassigned:
+                    b = self.candidates(j)
+                    if not b:
+                        break
+                    narrowed[j] = b
+            else:
+                bits.update(narrowed)
+                self.used.add(letters)
+                frame[1:] = [remaining,changed,(letters,self.index.entry(n,k))]
+                return True
+
+            for p in changed:
+                del self.letters[p]
+
+        frame[1:] = [0,[],None]
+        return False
+
+    # set the answers of the clues of a slot (split between the parts
+    # of a separated clue) from the letters of the entry, with the word
+    # breaks of its length spec (the entry itself, which can have
+    # capitals and other punctuation, is only kept for showing)
+    def _set_answer(self,s,letters,entry):
+        s.entry = entry
+        if self.upper:
+            letters = letters.upper()
+        if len(s.parts) == 1:
+            s.clue.answer(interchange.spaced(letters,s.clue.length_spec()))
+            return
+        start = 0
+        for part in s.parts:
+            part.answer(letters[start:start + part.length()])
+            start += part.length()
+
+# fill in the clues with only length specs from index (a
+# wordlist.WordIndex), returns the number of slots filled
+def fill(clues,index,limit=None):
+    return Filler(clues,index).fill(limit)
+
+# the slots that are partly filled in by the answers crossing them,
+# and what could go in each: a list of (slot, pattern, matching
+# entries) in the order of the clues, where pattern has None for each
+# unknown letter. Like fill, entries that are already answers in the
+# crossword are left out
+def match_slots(clues,index):
+    slots,letters = find_slots(clues)
+    used = used_answers(clues)
+    found = []
+    for s in slots:
+        pattern = [letters[p].lower() if p in letters else None for p in s.cells]
+        if None in pattern and any(pattern):
+            entries = [e for e in index.match(pattern,s.shape) if normalise(e)[0] not in used]
+            found.append((s,pattern,entries))
+    return found
@@ -0,0 +1,123 @@
+# grid.py
+
+# a sparse representation of a crossword grid. Only the cells with
+# letters in them are stored (in a dictionary of rows, y => {x =>
+# cell}), so the memory and time used depend on the number of white
+# cells, not on the size of the bounding box (clues can be a long way
+# apart).
+#
+# each cell is a tuple of
+# (letter, across_clue_that_starts_here, down_clue_that_starts_here)
+# with None in any of the elements of the tuple to represent missing
+# value. Black cells aren't stored at all.
+#
+# get/set take the coordinates used in the clue file (which can be
+# negative), while rows/cells give 0-based (row, column) indices
+# relative to the top left of the bounding box, so (0,0) is the top
+# left cell when rendering.
+class Grid(object):
+    def __init__(self):
+        self._rows = {}
+        self._bounds = None # (minx, miny, maxx, maxy), worked out when needed
+
+    # the cell at (x,y), or None if it is blank
+    def get(self,x,y):
+        row = self._rows.get(y)
+        if row is None:
+            return None
+        return row.get(x)
+
+    # set the cell at (x,y), growing the bounding box as necessary
+    def set(self,x,y,cell):
+        row = self._rows.get(y)
+        if row is None:
+            row = self._rows[y] = {}
+        row[x] = cell
+        self._bounds = None
+
+    # make the cell at (x,y) blank again
+    def remove(self,x,y):
+        row = self._rows.get(y)
+        if row is None or x not in row:
+            return
+        del row[x]
+        if not row:
+            del self._rows[y]
+        self._bounds = None
+
+    # (minx, miny, maxx, maxy) of the white cells (this is only
+    # computed when it is asked for, so that filling in the grid is
+    # fast)
+    def bounds(self):
+        if self._bounds is None and self._rows:
+            self._bounds = (min(min(row) for row in self._rows.values()),
+                            min(self._rows),
+                            max(max(row) for row in self._rows.values()),
+                            max(self._rows))
+        return self._bounds
+
+    # the coordinates of the top left corner of the bounding box
+    def origin(self):
+        minx,miny,maxx,maxy = self.bounds()
+        return (minx,miny)
+
+    # the size of the bounding box
+    def width(self):
+        if not self._rows:
+            return 0
+        minx,miny,maxx,maxy = self.bounds()
+        return maxx - minx + 1
+    def height(self):
+        if not self._rows:
+            return 0
+        minx,miny,maxx,maxy = self.bounds()
+        return maxy - miny + 1
+
+    # the number of white cells
+    def size(self):
+        return sum(len(row) for row in self._rows.values())
+
+    # go through the rows top-to-bottom (including empty ones), giving
+    # (i, [(j, cell), ...]) with the white cells of each row from left
+    # to right
+    def rows(self):
+        if not self._rows: # nothing in the grid
+            return
+        minx,miny,maxx,maxy = self.bounds()
+        for y in range(miny,maxy + 1):
+            row = self._rows.get(y,{})
+            yield (y - miny,
+                   [(x - minx, row[x]) for x in sorted(row)])
+
+    # go through the white cells left-to-right, top-to-bottom, giving
+    # (i, j, cell)
+    def cells(self):
+        if not self._rows:
+            return
+        minx,miny,maxx,maxy = self.bounds()
+        for y in sorted(self._rows):
+            row = self._rows[y]
+            for x in sorted(row):
+                yield (y - miny, x - minx, row[x])
+
+# a grid that can't be changed, with every clue of the crossword, as
+# crossworder.make_grid returns: the clues are clue.BuiltClues, and
+# the bounding box is worked out up front, so nothing changes after
+# it's made. It can be cached, shared by threads and pickled to send
+# to other processes (and is hashed by identity, like any object)
+class BuiltPuzzle(Grid):
+    # takes over the cells of grid, which shouldn't be used again
+    def __init__(self,grid,clues):
+        self._rows = grid._rows
+        self._bounds = grid.bounds()
+        self._clues = tuple(clues)
+
+    def set(self,x,y,cell):
+        raise AttributeError("A built puzzle can't be changed")
+
+    def remove(self,x,y):
+        raise AttributeError("A built puzzle can't be changed")
+
+    # all of the clues, in the order they were given to make_grid
+    def clues(self):
+        return self._clues
@@ -0,0 +1,149 @@
+# instrument.py
+
+# timers and counters for the phases of crossworder (parse, fill,
+# number, resolve, render...), to find out where the time goes on a
+# big puzzle. Nothing is recorded unless a Profile is active, and the
+# hooks in the code are only at the level of phases (or are set up
+# once, like wrapping the parser), so they cost nothing when it isn't:
+#
+#     with instrument.profiling() as p:
+#         metadata,clues = crossworder.load_clues(lines)
+#         grid = crossworder.make_grid(clues)
+#     p.report(sys.stderr)
+#
+# The phase times are exclusive: time spent in a phase inside another
+# one (like parsing, which happens while the grid is filled in when
+# streaming) only counts for the inner one, so they add up to the
+# total.
+
+import sys, time, json, cProfile, pstats
+from contextlib import contextmanager
+
+# the Profile being recorded into, or None
+active = None
+
+class Profile(object):
+    # capture is the name of a phase to run cProfile on
+    def __init__(self,capture=None):
+        self.times = {} # phase => [calls, seconds]
+        self.counts = {}
+        self.capture = capture
+        self.profiler = cProfile.Profile() if capture else None
+        self._stack = [] # [phase, start, time in nested phases]
+
+    def enter(self,name):
+        self._stack.append([name,time.perf_counter(),0.0])
+        if name == self.capture:
+            self.profiler.enable()
+
+    def exit(self):
+        name,start,nested = self._stack.pop()
+        if name == self.capture:
+            self.profiler.disable()
+        elapsed = time.perf_counter() - start
+        t = self.times.setdefault(name,[0,0.0])
+        t[0] += 1
+        t[1] += elapsed - nested
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def count(self,name,n=1):
+        self.counts[name] = self.counts.get(name,0) + n
+
+    def total(self):
+        return sum(t for calls,t in self.times.values())
+
+    def as_dict(self):
+        return {'total': self.total(),
+                'phases': dict((name,{'calls': calls,'seconds': t})
+                               for name,(calls,t) in self.times.items()),
+                'counts': dict(self.counts)}
+
+    # print the breakdown (and the cProfile output for the captured
+    # phase, if any) to out
+    def report(self,out=sys.stderr):
+        total = self.total()
+        print('%-12s %8s %10s %7s' % ('phase','calls','seconds','%'),file=out)
+        for name,(calls,t) in sorted(self.times.items(),key=lambda item: -item[1][1]):
+            print('%-12s %8d %10.4f %6.1f%%' % (name,calls,t,100 * t / (total or 1)),file=out)
+        print('%-12s %8s %10.4f' % ('total','',total),file=out)
+        for name,n in self.counts.items():
+            print('%-12s %8d' % (name,n),file=out)
+        if self.profiler:
+            print('\ncProfile of %s:' % self.capture,file=out)
+            pstats.Stats(self.profiler,stream=out).sort_stats('cumulative').print_stats(25)
+
+    def dump(self,filename):
+        with open(filename,'w') as f:
+            json.dump(self.as_dict(),f,indent=2,sort_keys=True)
+
+# times a phase of an active Profile
+class _Phase(object):
+    def __init__(self,profile,name):
+        self.profile = profile
+        self.name = name
+    def __enter__(self):
+        self.profile.enter(self.name)
+    def __exit__(self,*exc):
+        self.profile.exit()
+
+# does nothing, when there's nothing to record into
+class _NoPhase(object):
+    def __enter__(self):
+        pass
+    def __exit__(self,*exc):
+        pass
+_NO_PHASE = _NoPhase()
+
+# a context manager timing the phase name (if a Profile is active)
+def phase(name):
+    if active is None:
+        return _NO_PHASE
+    return _Phase(active,name)
+
+# add n to the counter name (if a Profile is active)
+def count(name,n=1):
+    if active is not None:
+        active.count(name,n)
+
+# f, but timed as the phase name (f itself if no Profile is active, so
+# this is done once, outside of any loop)
+def timed(name,f):
+    profile = active
+    if profile is None:
+        return f
+    def timed_f(*args):
+        profile.enter(name)
+        try:
+            return f(*args)
+        finally:
+            profile.exit()
+    return timed_f
+
+# writes to out, counting the bytes written (as UTF-8, for text)
+class CountingWriter(object):
+    def __init__(self,out,name='bytes'):
+        self._out = out
+        self._name = name
+    def write(self,s):
+        count(self._name,len(s.encode('utf-8')) if isinstance(s,str) else len(s))
+        return self._out.write(s)
+
+# start recording into a new Profile, returns it
+def start(capture=None):
+    global active
+    active = Profile(capture)
+    return active
+
+def stop():
+    global active
+    active = None
+
+# record everything in the block into a new Profile
+@contextmanager
+def profiling(capture=None):
+    profile = start(capture)
+    try:
+        yield profile
+    finally:
+        stop()
@@ -0,0 +1,135 @@
+# interchange.py
+
+# what the readers and writers of other crossword formats (ipuz.py,
+# acrosslite.py) have in common. Those formats describe a crossword as
+# a rectangle of cells, with the clues known by their numbers, so:
+#
+#  - writing goes from a built grid (see make_grid) to the cells and
+#    letters (grid_cells) and the clues in that form (grid_entries)
+#  - reading goes from the same things back to the lines of a clue
+#    file (entry_line), which are then loaded like any other crossword
+#
+# A separated clue is an entry with the entries for its later parts in
+# parts, and those parts are clues of their own in the other formats
+# (with "See 1-across" as their text).
+
+import clue, crossworder
+
+# the characters that can separate the words of a length spec, and
+# what they are in an answer
+SEPARATORS = {',': ' ', '-': '-', '.': '.'}
+
+# a clue as the other formats see it. cells are (column, row) from
+# the top left, starting at 0
+class Entry(object):
+    def __init__(self,number,across,cells,text,spec=None,parts=None):
+        self.number = number
+        self.across = across
+        self.cells = cells
+        self.text = text
+        self.spec = spec
+        self.parts = parts or []
+
+    def direction(self):
+        return 'Across' if self.across else 'Down'
+
+# the size of a built grid, and its letters as a dictionary (column,
+# row) => letter (None if it isn't known). Cells that aren't there are
+# black
+def grid_cells(grid):
+    letters = {}
+    for i,j,cell in grid.cells():
+        letters[(j,i)] = cell[0]
+    return (grid.width(),grid.height(),letters)
+
+# the clues of a built grid as entries, in order (across, down)
+def grid_entries(grid):
+    minx,miny = grid.origin()
+    def entry(c):
+        # (the points past the end of a short answer aren't filled in)
+        cells = []
+        for x,y in c.points():
+            if not grid.get(x,y):
+                break
+            cells.append((x - minx,y - miny))
+        return Entry(c.number(),c.is_across(),cells,c.clue(),c.length_spec(),
+                     [entry(child) for child in c.children()])
+    across,down = crossworder.clue_lists(grid)
+    return ([entry(c) for c in across if not c.parent()],
+            [entry(c) for c in down if not c.parent()])
+
+# whether spec is a length spec (like "3,5") for length letters
+def valid_spec(spec,length):
+    if not spec or not clue.RE_LENGTH_SPEC.match('(%s)' % spec):
+        return False
+    return sum(int(n) for n in clue.RE_PUNCT.split(spec)) == length
+
+# letters as an answer, with the word breaks of spec (so "icecream"
+# and "3,5" give "ice cream")
+def spaced(letters,spec):
+    if not valid_spec(spec,len(letters)):
+        return letters
+    words = []
+    start = 0
+    for n,sep in zip(clue.RE_PUNCT.split(spec),clue.RE_PUNCT.findall(spec) + ['']):
+        words.append(letters[start:start + int(n)] + SEPARATORS.get(sep,''))
+        start += int(n)
+    return ''.join(words)
+
+# the line of a clue file for an entry, with letters a dictionary
+# (column, row) => letter (or None) for the cells of the crossword.
+# Without all of its letters, it gets a length spec
+def entry_line(entry,letters):
+    parts = [entry] + entry.parts
+    if not all(p.cells for p in parts):
+        raise ValueError("%s %s has no cells" % (entry.number,entry.direction().lower()))
+    found = [letters.get(cell) for p in parts for cell in p.cells]
+    lengths = [len(p.cells) for p in parts]
+
+    if all(found):
+        answer = spaced(''.join(found),entry.spec)
+        # put the &'s between the letters of each part
+        pieces = []
+        start = 0
+        for n in lengths:
+            end = start
+            count = 0
+            while count < n:
+                if answer[end] not in clue.WORD_SPLITS:
+                    count += 1
+                end += 1
+            while end < len(answer) and answer[end] in clue.WORD_SPLITS:
+                end += 1 # (a space between the parts stays with the first)
+            pieces.append(answer[start:end])
+            start = end
+        answer = '&'.join(pieces)
+    elif len(parts) == 1 and valid_spec(entry.spec,lengths[0]):
+        answer = '(%s)' % entry.spec
+    else:
+        answer = '(%s)' % '&'.join(map(str,lengths))
+
+    text = ' '.join((entry.text or '').split())
+    return '%s|%s|%s|%s|%s' % ('&'.join(p.across and 'a' or 'd' for p in parts),
+                               '&'.join(str(p.cells[0][0]) for p in parts),
+                               '&'.join(str(p.cells[0][1]) for p in parts),
+                               answer,text)
+
+# the lines of metadata for a dictionary of it
+def metadata_lines(metadata):
+    for key,value in metadata.items():
+        if isinstance(value,list):
+            for v in value:
+                yield '@%s+: %s' % (key,v)
+        else:
+            yield '@%s: %s' % (key,value)
+
+# write a built crossword to out as a clue file (with the top left
+# cell at 0,0, and the references already filled in). Every line is
+# worked out before any are written, so an entry that can't be written
+# doesn't leave half a file (e.g. on stdout)
+def write_crossword(out,grid,metadata):
+    width,height,letters = grid_cells(grid)
+    across,down = grid_entries(grid)
+    lines = list(metadata_lines(metadata))
+    lines.extend(entry_line(e,letters) for e in across + down)
+    out.write(''.join(line + '\n' for line in lines))
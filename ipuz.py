@@ -0,0 +1,171 @@
+# ipuz.py
+
+# reading and writing crosswords in the ipuz format (JSON, see
+# http://ipuz.org). Writing includes the solution, the length specs
+# (as enumerations) and, for each clue, the cells it goes through, so
+# crosswords that don't number their cells the usual way still come
+# back the same. The metadata other than the title and author (which
+# ipuz has its own fields for) is kept in an extension field.
+#
+# Reading takes the clues from their numbered cells (or their cells,
+# if they're given), and their answers from the solution, if there is
+# one; a clue with letters missing gets a length spec instead.
+
+import json
+import interchange
+
+VERSION = 'http://ipuz.org/v2'
+KIND = 'http://ipuz.org/crossword#1'
+
+# where the rest of the metadata goes
+METADATA = 'org.crossworder:metadata'
+
+# the metadata that has fields of its own
+FIELDS = ['title','author','copyright','publisher','date','notes']
+
+# write a built crossword to out (a text file)
+def write_ipuz(out,grid,metadata):
+    width,height,letters = interchange.grid_cells(grid)
+    across,down = interchange.grid_entries(grid)
+
+    numbers = {}
+    for e in across + down:
+        numbers[e.cells[0]] = e.number
+        for part in e.parts:
+            numbers[part.cells[0]] = part.number
+
+    def clue_object(e,parent=None):
+        o = {'number': e.number,
+             'clue': e.text if parent is None else 'See %d-%s' % (parent.number,parent.direction().lower()),
+             'cells': [[x + 1,y + 1] for x,y in e.cells]}
+        if e.spec and parent is None:
+            o['enumeration'] = e.spec
+        if e.parts:
+            o['continued'] = [{'direction': p.direction(),'number': p.number} for p in e.parts]
+        return o
+
+    clues = {'Across': [],'Down': []}
+    for e in across + down:
+        clues[e.direction()].append(clue_object(e))
+        for part in e.parts:
+            clues[part.direction()].append(clue_object(part,e))
+    for l in clues.values():
+        l.sort(key=lambda o: o['number'])
+
+    data = {'version': VERSION,
+            'kind': [KIND],
+            'dimensions': {'width': width,'height': height},
+            'block': '#',
+            'empty': 0,
+            'puzzle': [[numbers.get((x,y),0) if (x,y) in letters else '#' for x in range(width)]
+                       for y in range(height)],
+            'solution': [[letters[(x,y)] if (x,y) in letters else '#' for x in range(width)]
+                         for y in range(height)],
+            'clues': clues}
+    extra = {}
+    for key,value in metadata.items():
+        if key in FIELDS:
+            data[key] = value
+        else:
+            extra[key] = value
+    if extra:
+        data[METADATA] = extra
+    json.dump(data,out,indent=1,ensure_ascii=False)
+    out.write('\n')
+
+# the value of a cell, which can be a dictionary with the value in it
+def _value(cell,key):
+    if isinstance(cell,dict):
+        return cell.get(key)
+    return cell
+
+# the lines of a clue file for the ipuz data (text or bytes)
+def read_ipuz(data):
+    try:
+        puzzle = json.loads(data)
+    except ValueError as e:
+        raise ValueError("Not an ipuz file (%s)" % e)
+    if not isinstance(puzzle,dict) or not any('crossword' in k for k in puzzle.get('kind',[])):
+        raise ValueError("Not an ipuz crossword")
+    try:
+        width = int(puzzle['dimensions']['width'])
+        height = int(puzzle['dimensions']['height'])
+    except (KeyError,TypeError,ValueError):
+        raise ValueError("The ipuz file doesn't say how big it is")
+    block = puzzle.get('block','#')
+    empty = puzzle.get('empty',0)
+    rows = puzzle.get('puzzle') or []
+    solution = puzzle.get('solution') or []
+
+    white = set()
+    positions = {} # number => (column, row)
+    for y,row in enumerate(rows[:height]):
+        for x,cell in enumerate(row[:width]):
+            cell = _value(cell,'cell')
+            if cell is None or cell == block:
+                continue
+            white.add((x,y))
+            if cell != empty and str(cell) != str(empty):
+                positions[str(cell)] = (x,y)
+    letters = {}
+    for y,row in enumerate(solution[:height]):
+        for x,cell in enumerate(row[:width]):
+            cell = _value(cell,'value')
+            if isinstance(cell,str) and len(cell) == 1 and cell != block and (x,y) in white:
+                letters[(x,y)] = cell
+
+    # all of the clues, as (direction, number) => Entry
+    entries = {}
+    order = []
+    continued = {} # id of an Entry => the (across, number) of its later parts
+    for direction,clues in (puzzle.get('clues') or {}).items():
+        direction = direction.split(':')[0].lower() # (it can have a label)
+        if direction not in ('across','down'):
+            continue
+        across = direction == 'across'
+        for c in clues:
+            if isinstance(c,list):
+                c = {'number': c[0],'clue': c[1] if len(c) > 1 else ''}
+            elif not isinstance(c,dict):
+                raise ValueError("Can't read the clue %r" % (c,))
+            number = str(c.get('number'))
+            if 'cells' in c:
+                cells = [(int(x) - 1,int(y) - 1) for x,y in c['cells']]
+            elif number in positions:
+                cells = []
+                x,y = positions[number]
+                while (x,y) in white:
+                    cells.append((x,y))
+                    x,y = (x + 1,y) if across else (x,y + 1)
+            else:
+                raise ValueError("There's no %s %s in the grid" % (number,across and 'across' or 'down'))
+            e = interchange.Entry(number,across,cells,c.get('clue',''),
+                                  str(c.get('enumeration','')).strip('()') or None)
+            continued[id(e)] = [(str(p.get('direction','')).lower() == 'across',str(p.get('number')))
+                                for p in c.get('continued',[]) if isinstance(p,dict)]
+            entries[(across,number)] = e
+            order.append(e)
+
+    # join the parts of separated clues
+    for e in order:
+        for key in continued[id(e)]:
+            if key not in entries:
+                raise ValueError("There's no %s %s for %s to continue into" % (
+                    key[1],key[0] and 'across' or 'down',e.number))
+            e.parts.append(entries[key])
+    children = set(id(p) for e in order for p in e.parts)
+
+    metadata = {}
+    for key in FIELDS:
+        if puzzle.get(key):
+            metadata[key] = str(puzzle[key])
+    metadata.update(puzzle.get(METADATA) or {})
+    lines = list(interchange.metadata_lines(metadata))
+    for e in order:
+        if id(e) not in children:
+            lines.append(interchange.entry_line(e,letters))
+    return lines
+
+def read_ipuz_file(filename):
+    with open(filename,'rb') as f:
+        return read_ipuz(f.read())
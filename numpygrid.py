@@ -0,0 +1,237 @@
+# numpygrid.py
+
+# an optional NumPy version of make_grid, for big grids. The letters
+# are stored in a uint32 array of code points (0 for no letter) over
+# the bounding box, and the across/down clues starting in each cell in
+# integer arrays of indices into the list of clues (-1 for none).
+# Placing the letters and finding mismatches is done with vectorised
+# scatters and comparisons, and the numbering with a cumulative sum of
+# the cells where clues start, in row-major order, so it gives exactly
+# the same numbers as the pure python version.
+#
+# importing this fails if NumPy isn't installed, crossworder then just
+# uses the normal version.
+
+import numpy as np
+import clue, instrument
+from grid import BuiltPuzzle
+
+# if the bounding box has more than this many cells for each white
+# cell, the dense arrays would waste a lot of memory, so the sparse
+# version is used instead
+MAX_SPARSENESS = 16
+
+# a grid.BuiltPuzzle backed by the arrays (which are read-only, so it
+# can't be changed either)
+class ArrayGrid(BuiltPuzzle):
+    def __init__(self,minx,miny,width,height,letters,filled,across,down,clues):
+        self._minx = minx
+        self._miny = miny
+        self._width = width
+        self._height = height
+        self._letters = letters # uint32 code points
+        self._filled = filled # bool, whether each cell is white
+        self._across = across # index into clues, or -1
+        self._down = down
+        self._clues = tuple(clues)
+        self._freeze()
+
+    def _freeze(self):
+        for a in (self._letters,self._filled,self._across,self._down):
+            a.setflags(write=False)
+
+    # (unpickled arrays can be written to again)
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self._freeze()
+
+    # the cell at flat index k
+    def _cell(self,k):
+        code = int(self._letters[k])
+        a = int(self._across[k])
+        d = int(self._down[k])
+        return (chr(code) if code else None,
+                self._clues[a] if a >= 0 else None,
+                self._clues[d] if d >= 0 else None)
+
+    def get(self,x,y):
+        i = y - self._miny
+        j = x - self._minx
+        if not (0 <= i < self._height and 0 <= j < self._width):
+            return None
+        k = i * self._width + j
+        if not self._filled[k]:
+            return None
+        return self._cell(k)
+
+    def bounds(self):
+        return (self._minx,self._miny,
+                self._minx + self._width - 1,self._miny + self._height - 1)
+    def origin(self):
+        return (self._minx,self._miny)
+    def width(self):
+        return self._width
+    def height(self):
+        return self._height
+    def size(self):
+        return int(self._filled.sum())
+
+    def rows(self):
+        w = self._width
+        for i in range(self._height):
+            js = np.flatnonzero(self._filled[i * w:(i + 1) * w]).tolist()
+            yield (i,[(j,self._cell(i * w + j)) for j in js])
+
+    # all of the clues (see grid.BuiltPuzzle)
+    def clues(self):
+        return tuple(self._clues)
+
+    def cells(self):
+        w = self._width
+        for k in np.flatnonzero(self._filled).tolist():
+            yield (k // w, k % w, self._cell(k))
+
+# the same as crossworder.build_grid (and raising the same errors), but
+# with arrays. fallback is the normal build_grid, which is used for
+# grids that this can't handle well (very sparse ones, or clues with
+# no letters)
+def make_grid(clues,fallback):
+    if isinstance(clues,dict):
+        clues = clues.items()
+    with instrument.phase('fill'):
+        grid,startcells,named = _fill(clues,fallback)
+    if startcells is None: # it fell back
+        return grid
+    allclues = grid._clues
+    if instrument.active: # (the size isn't free)
+        instrument.count('clues',len(allclues))
+        instrument.count('cells',grid.size())
+
+    # number the cells where clues start, left-to-right, top-to-bottom
+    with instrument.phase('number'):
+        starts = (grid._across >= 0) | (grid._down >= 0)
+        numbers = np.cumsum(starts)
+        for c,number in zip(allclues,numbers[startcells].tolist()):
+            c.number(number)
+
+    # the numbers are known, so now go and resolve references
+    with instrument.phase('resolve'):
+        instrument.count('references',clue.resolve_all(allclues,named))
+
+    return grid
+
+# build the arrays for make_grid, returns (the ArrayGrid, which isn't
+# numbered yet, the flat index of the cell where each clue starts, the
+# named clues), or (whatever fallback gives, None, None)
+def _fill(clues,fallback):
+
+    # pull everything out of the clues
+    pairs = []
+    allclues = []
+    named = {}
+    xs = []
+    ys = []
+    isacross = []
+    lengths = [] # the number of cells that are actually filled
+    text = [] # the letters for all the cells, '\0' for none
+    for name,c in clues:
+        pairs.append((name,c))
+        allclues.append(c)
+        if c.name():
+            named[c.name()] = c
+        x,y = c.startpoint()
+        xs.append(x)
+        ys.append(y)
+        isacross.append(c.is_across())
+        answer = c.text_answer()
+        if answer:
+            length = min(c.length(),len(answer))
+            text.append(answer[:length])
+        else:
+            length = c.length()
+            text.append('\0' * length)
+        lengths.append(length)
+
+    if not allclues:
+        raise ValueError("No clues found")
+    if min(lengths) < 1:
+        return (fallback(pairs),None,None)
+
+    n = len(allclues)
+    xs = np.array(xs,dtype=np.int64)
+    ys = np.array(ys,dtype=np.int64)
+    dx = np.array(isacross,dtype=np.int64)
+    dy = 1 - dx
+    lengths = np.array(lengths,dtype=np.int64)
+
+    # the bounding box
+    endx = xs + dx * (lengths - 1)
+    endy = ys + dy * (lengths - 1)
+    minx,maxx = int(xs.min()),int(endx.max())
+    miny,maxy = int(ys.min()),int(endy.max())
+    width = maxx - minx + 1
+    height = maxy - miny + 1
+
+    # every cell of every clue, in order: which clue, how far along,
+    # and where in the (flattened) grid
+    total = int(lengths.sum())
+    if width * height > MAX_SPARSENESS * total:
+        return (fallback(pairs),None,None)
+    which = np.repeat(np.arange(n),lengths)
+    first = np.cumsum(lengths) - lengths # where each clue starts in the sequence
+    along = np.arange(total) - np.repeat(first,lengths)
+    cx = xs[which] + along * dx[which]
+    cy = ys[which] + along * dy[which]
+    flat = (cy - miny) * width + (cx - minx)
+    codes = np.frombuffer(''.join(text).encode('utf-32-le'),dtype=np.uint32)
+
+    # find all the errors, then raise the one that the python version
+    # would have hit first (the earliest in the sequence)
+    errors = [] # (position in sequence, message)
+
+    # mismatches: sort the cells with letters by grid position (keeping
+    # the order of the sequence), so each cell's letters are together,
+    # with the first one put there at the front
+    withletters = np.flatnonzero(codes)
+    order = withletters[np.argsort(flat[withletters],kind='stable')]
+    if len(order):
+        sortedcells = flat[order]
+        newcell = np.ones(len(order),dtype=bool)
+        newcell[1:] = sortedcells[1:] != sortedcells[:-1]
+        groupstart = np.maximum.accumulate(np.where(newcell,np.arange(len(order)),0))
+        existing = codes[order][groupstart]
+        bad = np.flatnonzero(codes[order] != existing)
+        if len(bad):
+            k = bad[np.argmin(order[bad])]
+            p = int(order[k])
+            old,new = chr(int(existing[k])),chr(int(codes[p]))
+            if along[p] == 0: # the first letter of a clue
+                errors.append((p,"Mismatched letters ('%s' vs '%s') at (%d, %d)" % (old,new,cx[p],cy[p])))
+            else:
+                errors.append((p,"Mismatched letters ('%s' vs. '%s') at (%d, %d)" % (old,new,cx[p],cy[p])))
+
+    # two clues in the same direction starting in the same cell
+    startcells = flat[first]
+    for direction in (dx == 1),(dx == 0):
+        indices = np.flatnonzero(direction)
+        _,firsts = np.unique(startcells[indices],return_index=True)
+        repeated = np.setdiff1d(indices,indices[firsts])
+        if len(repeated):
+            c = int(repeated.min())
+            # after the first letter is checked
+            errors.append((int(first[c]) + 0.5,"Two clues starting at (%d,%d)" % (xs[c],ys[c])))
+
+    if errors:
+        raise ValueError(min(errors)[1])
+
+    # everything is consistent, so fill in the grid
+    letters = np.zeros(width * height,dtype=np.uint32)
+    letters[flat[withletters]] = codes[withletters]
+    filled = np.zeros(width * height,dtype=bool)
+    filled[flat] = True
+    across = np.full(width * height,-1,dtype=np.int64)
+    down = np.full(width * height,-1,dtype=np.int64)
+    across[startcells[dx == 1]] = np.flatnonzero(dx == 1)
+    down[startcells[dx == 0]] = np.flatnonzero(dx == 0)
+
+    return (ArrayGrid(minx,miny,width,height,letters,filled,across,down,allclues),startcells,named)
@@ -0,0 +1,150 @@
+# png.py
+
+# renders the grid from make_grid as a greyscale PNG, in pure python.
+# Only the grid is drawn (black squares, grid lines, numbers and
+# optionally the answers), since the clues need real fonts: the
+# numbers and letters use a tiny built-in 3x5 pixel font, scaled up
+# for the answers. Each row of cells is drawn into a band of pixel
+# rows, which are compressed and written as they are finished, so the
+# whole image is never in memory at once.
+
+import struct, zlib
+
+# the size of a cell, and the space around the grid, in pixels
+CELL = 24
+MARGIN = 12
+
+WHITE = 255
+BLACK = 0
+GREY = 128 # the answers
+
+# how much to scale the font for the numbers and the answers
+NUMBER_SCALE = 1
+ANSWER_SCALE = 3
+
+# 3x5 pixel glyphs, a row at a time
+FONT = dict((ch,rows.split()) for ch,rows in [
+    ('0','### #.# #.# #.# ###'), ('1','.#. ##. .#. .#. ###'),
+    ('2','### ..# ### #.. ###'), ('3','### ..# ### ..# ###'),
+    ('4','#.# #.# ### ..# ..#'), ('5','### #.. ### ..# ###'),
+    ('6','### #.. ### #.# ###'), ('7','### ..# ..# ..# ..#'),
+    ('8','### #.# ### #.# ###'), ('9','### #.# ### ..# ###'),
+    ('A','.#. #.# ### #.# #.#'), ('B','##. #.# ##. #.# ##.'),
+    ('C','.## #.. #.. #.. .##'), ('D','##. #.# #.# #.# ##.'),
+    ('E','### #.. ##. #.. ###'), ('F','### #.. ##. #.. #..'),
+    ('G','.## #.. #.# #.# .##'), ('H','#.# #.# ### #.# #.#'),
+    ('I','### .#. .#. .#. ###'), ('J','..# ..# ..# #.# .#.'),
+    ('K','#.# #.# ##. #.# #.#'), ('L','#.. #.. #.. #.. ###'),
+    ('M','#.# ### ### #.# #.#'), ('N','##. #.# #.# #.# #.#'),
+    ('O','.#. #.# #.# #.# .#.'), ('P','##. #.# ##. #.. #..'),
+    ('Q','.#. #.# #.# ##. .##'), ('R','##. #.# ##. #.# #.#'),
+    ('S','.## #.. .#. ..# ##.'), ('T','### .#. .#. .#. .#.'),
+    ('U','#.# #.# #.# #.# ###'), ('V','#.# #.# #.# #.# .#.'),
+    ('W','#.# #.# ### ### #.#'), ('X','#.# #.# .#. #.# #.#'),
+    ('Y','#.# #.# .#. .#. .#.'), ('Z','### ..# .#. #.. ###'),
+])
+
+# the pixel rows of a character, scaled up, on a white background
+# (they're only drawn in white cells)
+_glyphs = {}
+def glyph(ch,scale,shade):
+    key = (ch,scale,shade)
+    if key not in _glyphs:
+        rows = []
+        for line in FONT[ch]:
+            pixels = b''.join(bytes([shade if dot == '#' else WHITE]) * scale for dot in line)
+            rows += [pixels] * scale
+        _glyphs[key] = rows
+    return _glyphs[key]
+
+# draw text into band (a list of bytearrays, one for each pixel row)
+# with its top left corner at (x, y). Characters that aren't in the
+# font are left as a gap
+def draw_text(band,x,y,text,scale=1,shade=BLACK):
+    w = 3 * scale
+    for ch in text.upper():
+        if ch in FONT and x + w <= len(band[0]): # (don't grow the rows)
+            for row,pixels in zip(band[y:],glyph(ch,scale,shade)):
+                row[x:x + w] = pixels
+        x += 4 * scale
+
+# a PNG chunk
+def chunk(out,kind,data):
+    out.write(struct.pack('>I',len(data)))
+    out.write(kind)
+    out.write(data)
+    out.write(struct.pack('>I',zlib.crc32(data,zlib.crc32(kind)) & 0xffffffff))
+
+# compresses pixel rows into IDAT chunks, writing each one once there's
+# enough data
+class _ImageData(object):
+    CHUNK = 2**16
+
+    def __init__(self,out):
+        self._out = out
+        self._compress = zlib.compressobj()
+        self._pending = []
+        self._size = 0
+
+    def _add(self,data):
+        if data:
+            self._pending.append(data)
+            self._size += len(data)
+            if self._size >= self.CHUNK:
+                self.flush()
+
+    def flush(self):
+        if self._pending:
+            chunk(self._out,b'IDAT',b''.join(self._pending))
+            self._pending = []
+            self._size = 0
+
+    def row(self,pixels):
+        self._add(self._compress.compress(b'\0' + pixels)) # filter type 0 (none)
+
+    def finish(self):
+        self._add(self._compress.flush())
+        self.flush()
+
+# write the grid as a PNG to out, a binary file-like object
+def write_png(out,grid,metadata={},answers=False):
+    ylen = grid.height()
+    xlen = grid.width()
+    width = xlen * CELL + 1 + 2 * MARGIN
+    height = ylen * CELL + 1 + 2 * MARGIN
+
+    out.write(b'\x89PNG\r\n\x1a\n')
+    chunk(out,b'IHDR',struct.pack('>IIBBBBB',width,height,8,0,0,0,0)) # 8-bit greyscale
+    data = _ImageData(out)
+
+    blank = bytes([WHITE]) * width
+    line = bytes([WHITE]) * MARGIN + bytes([BLACK]) * (xlen * CELL + 1) + bytes([WHITE]) * MARGIN
+    inside = bytes([BLACK]) + bytes([WHITE]) * (CELL - 1)
+
+    for _ in range(MARGIN):
+        data.row(blank)
+    for i,row in grid.rows():
+        # the rows of pixels inside the cells: black, apart from the
+        # white cells (leaving their left edge as the grid line)
+        pixels = bytearray(line)
+        for j,c in row:
+            start = MARGIN + j * CELL
+            pixels[start:start + CELL] = inside
+        band = [bytearray(line)] + [bytearray(pixels) for _ in range(CELL - 1)]
+
+        for j,c in row:
+            x = MARGIN + j * CELL
+            if c[1] or c[2]: # a clue starts here
+                draw_text(band,x + 2,2,'%d' % (c[1] or c[2]).number(),NUMBER_SCALE)
+            if answers and c[0]:
+                draw_text(band,x + (CELL - 3 * ANSWER_SCALE) // 2,CELL - 5 * ANSWER_SCALE - 2,
+                          c[0],ANSWER_SCALE,GREY)
+
+        for pixels in band:
+            data.row(pixels)
+    data.row(line) # the bottom of the grid
+    for _ in range(MARGIN):
+        data.row(blank)
+
+    data.finish()
+    chunk(out,b'IEND',b'')
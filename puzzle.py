@@ -0,0 +1,447 @@
+# puzzle.py
+
+# an editable crossword. Clues can be added, removed, moved and have
+# their answers changed, and the grid, the numbers and the resolved
+# references ("See 12-across") are kept up to date as that happens,
+# doing only as much work as the change needs:
+#
+#  - only the cells of the clue that changed are filled in again
+#  - the numbers only change when a clue starts in a cell where none
+#    did before (or the last clue starting in a cell goes), and then
+#    only from that cell on
+#  - only the clues referring to a clue whose number changed, and the
+#    later parts of separated clues whose first part's number changed,
+#    have their text worked out again, when it's next asked for (and
+#    only those referring to a name that changed are resolved again)
+#
+# The grid is always the same as make_grid would build from the clues
+# (lines() gives them back as a clue file). A change that would make
+# the crossword invalid (mismatched letters, two clues starting in the
+# same place, a reference to a clue that isn't there, or a separated
+# clue referring to its own later part) raises a ValueError, and leaves
+# the puzzle as it was.
+#
+# Clues are given as lines of a clue file, and are known by an id like
+# load_clues uses: their name, or a counter if they don't have one.
+
+import bisect, collections
+import clue, crossworder
+from grid import Grid
+
+# more changes than this (and at least 1/8 of the clues) in update
+# mean building everything again rather than changing it bit by bit
+REBUILD_CHANGES = 16
+
+# the first part of a clue line (the name in <>'s, if it has one) and
+# the rest split into its fields (see clue.tokenise_line)
+def split_line(line):
+    s = line.strip()
+    prefix = ''
+    if s[:1] == '<':
+        end = s.find('>')
+        if end != -1:
+            prefix,s = s[:end + 1],s[end + 1:]
+    return (prefix,s.split('|',4))
+
+# a clue and its later parts, if it's separated
+def parts(c):
+    return [c] + c.children()
+
+# the cells a clue fills in and the letters it puts in them (None if
+# it doesn't have an answer). Like make_grid, an answer shorter than
+# the clue only fills in as many cells as it has letters
+def placed(c):
+    answer = c.text_answer()
+    if not answer:
+        return [(p,None) for p in c.points()]
+    return list(zip(c.points(),answer))
+
+# the names the text of a clue refers to
+def references(c):
+    return set(c.references())
+
+class Puzzle(object):
+    def __init__(self,metadata=None):
+        self.metadata = metadata if metadata is not None else {}
+        self._reset()
+
+    def _reset(self):
+        self.grid = Grid()
+        self._clues = {} # id => clue (the first part, if it's separated)
+        self._lines = {} # id => the line it was parsed from
+        self._ids = {} # line => [ids of the clues parsed from it]
+        self._count = 0 # for the ids of clues without names
+        self._cover = {} # (x, y) => [(clue, letter)] going through the cell
+        self._starts = [] # (y, x) of the cells clues start in, in order
+        self._named = {} # name => clue (the last part, like make_grid)
+        self._refs = {} # name => set of clues referring to it
+
+    # a puzzle with the clues (and metadata) of a clue file
+    @classmethod
+    def load(cls,iterable):
+        puzzle = cls()
+        puzzle.update(iterable)
+        return puzzle
+
+    # get a clue by id
+    def clue(self,id):
+        try:
+            return self._clues[id]
+        except KeyError:
+            raise ValueError("No clue %r" % (id,))
+
+    # the line of the clue file a clue is from
+    def line(self,id):
+        self.clue(id) # (so it's there)
+        return self._lines[id]
+
+    # the ids of the clues
+    def ids(self):
+        return list(self._clues)
+
+    def __len__(self):
+        return len(self._clues)
+
+    # the puzzle as the lines of a clue file
+    def lines(self):
+        for key,value in self.metadata.items():
+            for v in value if isinstance(value,list) else [value]:
+                yield '@%s%s: %s' % (key,'+' if isinstance(value,list) else '',v)
+        yield from self._lines.values()
+
+    # parse a line, returns (id, the clue)
+    def _parse(self,line):
+        parsed = clue.parse_clues(line.strip())
+        c = parsed[0]
+        if c.name():
+            return (c.name(),c)
+        return (self._count,c)
+
+    # a new clue (the next counter is used for its id if it doesn't have
+    # a name, and for each of its later parts, like iter_clues)
+    def _new(self,id,c,line):
+        if not c.name():
+            self._count += len(parts(c))
+        self._added(id,c,line)
+
+    def _added(self,id,c,line):
+        self._clues[id] = c
+        self._lines[id] = line
+        self._ids.setdefault(line,[]).append(id)
+
+    def _removed(self,id):
+        line = self._lines.pop(id)
+        del self._clues[id]
+        ids = self._ids[line]
+        ids.remove(id)
+        if not ids:
+            del self._ids[line]
+
+    # add a clue (a line of a clue file), returns its id
+    def add_clue(self,line):
+        line = line.strip()
+        id,c = self._parse(line)
+        if id in self._clues:
+            raise ValueError("There is already a clue named '%s'" % id)
+        self._change(None,c)
+        self._new(id,c,line)
+        return id
+
+    def remove_clue(self,id):
+        self._change(self.clue(id),None)
+        self._removed(id)
+
+    # move a clue so it starts at (x,y) (the later parts of a separated
+    # clue move with it)
+    def move_clue(self,id,x,y):
+        c = self.clue(id)
+        dx = x - c.startpoint()[0]
+        dy = y - c.startpoint()[1]
+        prefix,fields = split_line(self._lines[id])
+        fields[1] = '&'.join(str(p.startpoint()[0] + dx) for p in parts(c))
+        fields[2] = '&'.join(str(p.startpoint()[1] + dy) for p in parts(c))
+        self._replace(id,prefix + '|'.join(fields))
+
+    # change the answer of a clue (as it would be written in the clue
+    # file, so it can be a length spec, or separated with &)
+    def set_answer(self,id,answer):
+        prefix,fields = split_line(self.line(id))
+        fields[3] = answer
+        self._replace(id,prefix + '|'.join(fields))
+
+    def _replace(self,id,line):
+        old = self.clue(id)
+        newid,new = self._parse(line)
+        self._change(old,new)
+        self._removed(id)
+        self._added(id,new,line) # (with the same id)
+
+    # bring the puzzle up to date with the lines of a clue file (the
+    # metadata is replaced). Only the clues whose lines have changed
+    # are replaced, removed or added, unless there are lots of them, in
+    # which case it's all built again. If the new lines aren't valid,
+    # the puzzle is left as it was. Returns the number of lines removed
+    # and added
+    def update(self,iterable):
+        metadata = {}
+        lines = []
+        # parse the new lines here, so that those that can't be parsed
+        # are warned about and skipped, like they would be otherwise
+        def parse(line):
+            if line not in self._ids:
+                clue.parse_clues(line)
+            lines.append(line)
+            return []
+        for kind,key,value in crossworder.iter_clues(iterable,parse):
+            crossworder.add_metadata(metadata,key,value)
+        if not lines:
+            raise ValueError("No clues found")
+
+        unchanged = dict((line,len(ids)) for line,ids in self._ids.items())
+        added = []
+        for line in lines:
+            if unchanged.get(line):
+                unchanged[line] -= 1
+            else:
+                added.append(line)
+        removed = [id for line,n in unchanged.items() for id in self._ids[line][:n]]
+
+        changes = len(added) + len(removed)
+        if changes > REBUILD_CHANGES and changes > len(self._clues) // 8:
+            self._build(lines,metadata)
+            return changes
+
+        # a changed line replaces the clue with the same id (its name,
+        # or the next unnamed clue that's gone), so a named clue that
+        # other clues refer to can be changed without removing it first
+        going = dict((id,True) for id in removed)
+        unnamed = [id for id in removed if not isinstance(id,str)]
+        replaced = []
+        new = []
+        for line in added:
+            id = clue.parse_clues(line)[0].name()
+            if id is None and unnamed:
+                id = unnamed.pop(0)
+            if id in going:
+                del going[id]
+                replaced.append((id,line))
+            else:
+                new.append(line)
+
+        # the changes are made one at a time, undoing them all if one
+        # fails, so the puzzle is either up to date or as it was
+        saved = (self._count,dict(self._clues),dict(self._lines),
+                 dict((line,list(ids)) for line,ids in self._ids.items()))
+        done = [] # (old, new) clues
+        try:
+            for id in going:
+                done.append((self.clue(id),None))
+                self.remove_clue(id)
+            for id,line in replaced:
+                old = self.clue(id)
+                self._replace(id,line)
+                done.append((old,self._clues[id]))
+            for line in new:
+                id = self.add_clue(line)
+                done.append((None,self._clues[id]))
+        except ValueError:
+            for old,c in reversed(done):
+                self._change(c,old)
+            self._count,self._clues,self._lines,self._ids = saved
+            # it might only be invalid half way through (e.g. two
+            # crossing answers changing together), so check it properly
+            self._build(lines,metadata)
+            return changes
+        self.metadata = metadata
+        return changes
+
+    # build everything from scratch (with build_grid). If the clues
+    # aren't valid, the puzzle is left as it was
+    def _build(self,lines,metadata=None):
+        built = Puzzle(self.metadata if metadata is None else metadata)
+        built._fill(lines)
+        self.__dict__.update(built.__dict__)
+
+    def _fill(self,lines):
+        pairs = []
+        for line in lines:
+            id,c = self._parse(line)
+            if id in self._clues:
+                raise ValueError("There is already a clue named '%s'" % id)
+            self._new(id,c,line)
+            pairs.extend((p.name(),p) for p in parts(c))
+        if not pairs:
+            return
+        self.grid = crossworder.build_grid(pairs)
+
+        starts = set()
+        for c in self._clues.values():
+            self._add_references(c)
+            for p in parts(c):
+                if p.name():
+                    self._named[p.name()] = p
+                for point,letter in placed(p):
+                    self._cover.setdefault(point,[]).append((p,letter))
+                x,y = p.startpoint()
+                starts.add((y,x))
+        self._starts = sorted(starts)
+
+    def _add_references(self,c):
+        for name in references(c):
+            self._refs.setdefault(name,set()).add(c)
+
+    def _remove_references(self,c):
+        for name in references(c):
+            refs = self._refs[name]
+            refs.discard(c)
+            if not refs:
+                del self._refs[name]
+
+    # the letter in a cell, not counting the clues in going
+    def _letter(self,point,going):
+        for p,letter in self._cover.get(point,()):
+            if letter and p not in going:
+                return letter
+        return None
+
+    # replace the clue old with new (either can be None, to add or
+    # remove a clue), checking it first
+    def _change(self,old,new):
+        oldparts = parts(old) if old else []
+        newparts = parts(new) if new else []
+        going = set(oldparts)
+
+        # the letters must match, and only one clue can start in each
+        # direction in each cell
+        letters = {}
+        starting = set()
+        for p in newparts:
+            x,y = p.startpoint()
+            k = 1 if p.is_across() else 2
+            cell = self.grid.get(x,y)
+            if (x,y,k) in starting or (cell and cell[k] is not None and cell[k] not in going):
+                raise ValueError("Two clues starting at (%d,%d)" % (x,y))
+            starting.add((x,y,k))
+            for point,letter in placed(p):
+                if letter is None:
+                    continue
+                current = letters.get(point) or self._letter(point,going)
+                if current and current != letter:
+                    raise ValueError("Mismatched letters ('%s' vs. '%s') at (%d, %d)" % (
+                        current,letter,point[0],point[1]))
+                letters[point] = letter
+
+        # and every name referred to has to be there (and not be a later
+        # part of the clue itself), which is all reported at once
+        oldnames = set(p.name() for p in oldparts if p.name())
+        newnames = set(p.name() for p in newparts if p.name())
+        problems = []
+        if new and new.references():
+            changed = dict((name,None) for name in oldnames)
+            changed.update((p.name(),p) for p in newparts if p.name())
+            named = collections.ChainMap(changed,self._named)
+            problems = [message for kind,c,message in clue.reference_problems([new],named)]
+        for name in sorted(oldnames - newnames):
+            if self._refs.get(name,set()) - {old}:
+                problems.append("Named clue '%s' is referred to by other clues" % name)
+        if problems:
+            raise ValueError('; '.join(problems))
+
+        # it's fine, so take out the old clue and put in the new one
+        touched = set()
+        for p in oldparts:
+            for point,letter in placed(p):
+                self._cover[point].remove((p,letter))
+                touched.add(point)
+            if p.name() and self._named.get(p.name()) is p:
+                del self._named[p.name()]
+        if old:
+            self._remove_references(old)
+        for p in newparts:
+            for point,letter in placed(p):
+                self._cover.setdefault(point,[]).append((p,letter))
+                touched.add(point)
+            if p.name():
+                self._named[p.name()] = p
+        if new:
+            self._add_references(new)
+        for point in touched:
+            self._update_cell(point)
+
+        # the cells where clues start or stop starting change the
+        # numbers of the clues after them (up to the last of them, if as
+        # many start as stop, e.g. when a clue moves)
+        changed = []
+        net = 0
+        for p in oldparts + newparts:
+            x,y = p.startpoint()
+            cell = self.grid.get(x,y)
+            starts = bool(cell and (cell[1] or cell[2]))
+            k = bisect.bisect_left(self._starts,(y,x))
+            started = k < len(self._starts) and self._starts[k] == (y,x)
+            if starts != started:
+                if starts:
+                    self._starts.insert(k,(y,x))
+                    net += 1
+                else:
+                    del self._starts[k]
+                    net -= 1
+                changed.append((y,x))
+        for p in newparts:
+            x,y = p.startpoint()
+            p.number(bisect.bisect_left(self._starts,(y,x)) + 1)
+        renumbered = []
+        if changed:
+            ks = [bisect.bisect_left(self._starts,start) for start in changed]
+            renumbered = self._renumber(min(ks),None if net else max(ks) + 1)
+
+        # and the texts that might have changed: those referring to a
+        # name that changed are linked up again, and those referring to
+        # a clue whose number changed only need writing again
+        dirty = set()
+        if new:
+            dirty.add(new)
+        for name in oldnames | newnames:
+            dirty.update(self._refs.get(name,()))
+        for c in dirty:
+            for p in parts(c):
+                p.resolve_names(self._named)
+        for c in renumbered:
+            for p in c.children():
+                p.unresolve()
+            if c.name() and self._named.get(c.name()) is c:
+                for r in self._refs.get(c.name(),()):
+                    r.unresolve()
+
+    # fill in the cell at point from the clues going through it
+    def _update_cell(self,point):
+        cover = self._cover.get(point)
+        x,y = point
+        if not cover:
+            self._cover.pop(point,None)
+            self.grid.remove(x,y)
+            return
+        letter = None
+        across = down = None
+        for p,l in cover:
+            letter = letter or l
+            if p.startpoint() == point:
+                if p.is_across():
+                    across = p
+                else:
+                    down = p
+        self.grid.set(x,y,(letter,across,down))
+
+    # number the clues starting in the cells from the kth start on (up
+    # to the end, or the one before end), returns the clues whose
+    # numbers changed
+    def _renumber(self,k,end=None):
+        changed = []
+        for n in range(k,min(len(self._starts),end or len(self._starts))):
+            y,x = self._starts[n]
+            letter,across,down = self.grid.get(x,y)
+            for c in (across,down):
+                if c is not None and c.number() != n + 1:
+                    c.number(n + 1)
+                    changed.append(c)
+        return changed
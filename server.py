@@ -0,0 +1,266 @@
+# server.py
+
+# a long-running local render server, so that tools making lots of
+# previews don't pay for starting python and building the grid every
+# time. It's a small asyncio HTTP/1.1 server (on a TCP port on
+# localhost, or a Unix socket):
+#
+#   POST /render   the body is the crossword text, and the rendered
+#                  output is returned. The query string can have
+#                  answers=1, compact=1 and
+#                  format=latex|svg|png|ipuz|puz|crossword
+#   GET /stats     JSON with the number of requests, how often the
+#                  grid cache was hit, the number of renders queued or
+#                  running, and the latency of recent requests
+#
+# Rendering is done in worker processes, so the event loop is never
+# blocked. Each worker keeps an LRU of the grids it has built, keyed
+# by a hash of the text, and each text always goes to the same
+# worker, so a puzzle that is previewed again (e.g. with the answers)
+# doesn't need to be parsed or built again.
+
+import asyncio, collections, hashlib, io, json, os, time, urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+import crossworder
+
+# the number of built grids each worker keeps
+DEFAULT_GRIDS = 64
+
+# the biggest request body accepted
+MAX_BODY = 16 * 2**20
+
+# the number of recent requests that the latencies are worked out from
+LATENCY_WINDOW = 1000
+
+CONTENT_TYPES = {'latex': 'application/x-tex; charset=utf-8',
+                 'svg': 'image/svg+xml; charset=utf-8',
+                 'png': 'image/png',
+                 'ipuz': 'application/json; charset=utf-8',
+                 'puz': 'application/x-crossword',
+                 'crossword': 'text/plain; charset=utf-8'}
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+# the built grids in a worker process, key => (metadata, grid), least
+# recently used first
+_grids = collections.OrderedDict()
+_limit = DEFAULT_GRIDS
+
+def _init_worker(limit):
+    global _limit
+    _limit = limit
+
+def _ready():
+    return True
+
+# render text in a worker process, building the grid if it isn't
+# already there. Returns (the output as bytes, whether the grid was
+# cached)
+def render(key,text,answers=False,compact=False,format='latex',engine='python'):
+    hit = key in _grids
+    if hit:
+        _grids.move_to_end(key)
+        metadata,grid = _grids[key]
+    else:
+        metadata = {}
+        grid = crossworder.make_grid(crossworder.stream_clues(text.splitlines(),metadata),engine)
+        _grids[key] = (metadata,grid)
+        while len(_grids) > _limit:
+            _grids.popitem(last=False)
+
+    out = io.BytesIO() if format in crossworder.BINARY_FORMATS else io.StringIO()
+    crossworder.write_output(out,grid,metadata,answers,compact,format)
+    output = out.getvalue()
+    if format not in crossworder.BINARY_FORMATS:
+        output = output.encode('utf-8')
+    return (output,hit)
+
+# an error to send back to the client
+class HTTPError(Exception):
+    def __init__(self,status,message):
+        Exception.__init__(self,message)
+        self.status = status
+
+class Server(object):
+    def __init__(self,workers=None,grids=DEFAULT_GRIDS,engine='python'):
+        # one process for each worker, so that each text can always go
+        # to the same one (where its grid is)
+        self._workers = [ProcessPoolExecutor(1,initializer=_init_worker,initargs=(grids,))
+                         for _ in range(workers or os.cpu_count() or 1)]
+        # start them now, rather than on the first request, otherwise
+        # they would be forked with the open connections (so those
+        # wouldn't close until the worker exits)
+        for w in self._workers:
+            w.submit(_ready).result()
+        self._engine = engine
+        self._started = time.time()
+
+        self.requests = 0
+        self.errors = 0
+        self.hits = 0
+        self.misses = 0
+        self.queued = 0 # renders waiting for or running in a worker
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def close(self):
+        for w in self._workers:
+            w.shutdown()
+
+    # render text with the options in query (a dict from parse_qs)
+    async def render(self,text,query):
+        def flag(name):
+            return query.get(name,['0'])[0].lower() in ('1','true','yes')
+        format = query.get('format',['latex'])[0].lower()
+        if format not in crossworder.FORMATS:
+            raise HTTPError(400,"Unknown format %s" % format)
+
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        worker = self._workers[int(key[:8],16) % len(self._workers)]
+        self.queued += 1
+        try:
+            output,hit = await asyncio.get_running_loop().run_in_executor(
+                worker,render,key,text,flag('answers'),flag('compact'),format,self._engine)
+        except ValueError as e: # the crossword is wrong
+            raise HTTPError(400,str(e))
+        finally:
+            self.queued -= 1
+
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return (CONTENT_TYPES[format],output)
+
+    # everything that /stats reports
+    def stats(self):
+        latencies = sorted(self._latencies)
+        def percentile(p):
+            if not latencies:
+                return None
+            return 1000 * latencies[min(len(latencies) - 1,int(p * len(latencies)))]
+        lookups = self.hits + self.misses
+        return {'uptime': time.time() - self._started,
+                'workers': len(self._workers),
+                'requests': self.requests,
+                'errors': self.errors,
+                'cache': {'hits': self.hits,
+                          'misses': self.misses,
+                          'hit_rate': lookups and self.hits / lookups or 0.0},
+                'queue_depth': self.queued,
+                'latency_ms': {'count': len(latencies),
+                               'mean': latencies and 1000 * sum(latencies) / len(latencies) or None,
+                               'p50': percentile(0.5),
+                               'p90': percentile(0.9),
+                               'p99': percentile(0.99),
+                               'max': latencies and 1000 * latencies[-1] or None}}
+
+    # deal with one request, returns (status, content type, body)
+    async def respond(self,method,path,query,body):
+        if path == '/render':
+            if method != 'POST':
+                raise HTTPError(405,"Use POST to render")
+            try:
+                text = body.decode('utf-8')
+            except UnicodeDecodeError:
+                raise HTTPError(400,"The crossword isn't UTF-8")
+            content_type,output = await self.render(text,query)
+            return (200,content_type,output)
+        if path == '/stats':
+            if method != 'GET':
+                raise HTTPError(405,"Use GET for stats")
+            return (200,'application/json',json.dumps(self.stats(),indent=2).encode('utf-8'))
+        raise HTTPError(404,"Nothing at %s" % path)
+
+    # read a request from reader, returns (method, path, query, headers,
+    # body), or None if the connection was closed
+    async def read_request(self,reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method,target,version = line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400,"Bad request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n',b'\n',b''):
+                break
+            name,_,value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length',0) or 0)
+        except ValueError:
+            raise HTTPError(400,"Bad Content-Length")
+        if length > MAX_BODY:
+            raise HTTPError(413,"The crossword is too big")
+        body = await reader.readexactly(length) if length else b''
+        url = urllib.parse.urlsplit(target)
+        headers[':version'] = version
+        return (method.upper(),url.path,urllib.parse.parse_qs(url.query),headers,body)
+
+    # handle the requests on a connection (keeping it open between
+    # them unless the client doesn't want that)
+    async def handle(self,reader,writer):
+        try:
+            while True:
+                keep_alive = False
+                timed = False # whether it's a render (which /stats times)
+                start = time.perf_counter()
+                try:
+                    request = await self.read_request(reader)
+                    if request is None:
+                        break
+                    start = time.perf_counter()
+                    method,path,query,headers,body = request
+                    keep_alive = (headers.get('connection','').lower() != 'close' and
+                                  headers[':version'] == 'HTTP/1.1')
+                    timed = path == '/render'
+                    self.requests += 1
+                    status,content_type,output = await self.respond(method,path,query,body)
+                except HTTPError as e:
+                    self.errors += 1
+                    status,content_type,output = e.status,'text/plain; charset=utf-8',(str(e) + '\n').encode('utf-8')
+                except (asyncio.IncompleteReadError,ConnectionError):
+                    break
+                except Exception as e: # a bug, but keep serving
+                    crossworder.message("Error:", e)
+                    self.errors += 1
+                    status,content_type,output = 500,'text/plain; charset=utf-8',b'Internal error\n'
+
+                writer.write(('HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n' % (
+                    status,REASONS[status],content_type,len(output),keep_alive and 'keep-alive' or 'close')).encode('latin-1'))
+                writer.write(output)
+                await writer.drain()
+                if timed:
+                    self._latencies.append(time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # start listening on host:port, or the Unix socket at path,
+    # returns the asyncio server
+    async def start(self,host='127.0.0.1',port=8080,path=None):
+        if path:
+            return await asyncio.start_unix_server(self.handle,path)
+        return await asyncio.start_server(self.handle,host,port)
+
+# run a server until interrupted
+def serve(host='127.0.0.1',port=8080,path=None,workers=None,grids=DEFAULT_GRIDS,engine='python'):
+    server = Server(workers,grids,engine)
+    async def run():
+        listening = await server.start(host,port,path)
+        crossworder.message("Listening on %s" % (path or 'http://%s:%d/' % (host,port)))
+        async with listening:
+            await listening.serve_forever()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,113 @@
+# svg.py
+
+# renders a grid from make_grid straight to SVG, for previews that
+# don't want to go through LaTeX. The grid is drawn as a black
+# rectangle with the white cells (merged into runs along each row) on
+# top, then the numbers (and answers), then the grid lines as a
+# single path, and the clue lists go underneath in two columns. It is
+# written a row at a time as it goes, like write_latex. The LaTeX
+# specific metadata (orientation, margins, packages etc.) is ignored.
+
+from xml.sax.saxutils import escape
+import crossworder
+
+# the size of a cell, and the space around everything, in pixels
+CELL = 30
+MARGIN = 10
+
+# the height of a line in the clue lists, and roughly how wide a
+# character is (there's no way to measure text without a renderer)
+LINE = 16
+CHAR_WIDTH = 6.5
+
+STYLE = '''<style>
+text { font-family: sans-serif; }
+.number { font-size: 9px; }
+.answer { font-size: 18px; fill: gray; text-anchor: middle; font-variant: small-caps; }
+.title { font-size: 20px; text-anchor: middle; }
+.author { font-size: 12px; text-anchor: middle; }
+.heading { font-size: 14px; font-weight: bold; }
+.clue { font-size: 12px; }
+</style>'''
+
+# the bold label of a clue (the number, and the other parts of a
+# separated clue) and the rest of its line
+def clue_line(c):
+    label = '%d' % c.number()
+    if c.children():
+        label += ', ' + ', '.join('%d-%s' % (cc.number(),cc.direction_name(True))
+                                  for cc in c.children())
+    text = c.clue()
+    if c.length_spec() is not None:
+        text += ' (%s)' % c.length_spec()
+    return (label,text)
+
+# write the grid (and clues) as SVG to out, a file-like object
+def write_svg(out,grid,metadata={},answers=False):
+    ylen = grid.height()
+    xlen = grid.width()
+    across,down = crossworder.clue_lists(grid)
+
+    # work out where everything goes
+    longest = max((sum(map(len,clue_line(c))) + 1 for c in across + down),default=0)
+    column = max(xlen * CELL / 2,longest * CHAR_WIDTH)
+    width = max(xlen * CELL,2 * column) + 2 * MARGIN
+    top = MARGIN
+    if 'title' in metadata:
+        top += 24
+    if 'author' in metadata:
+        top += 16
+    cluetop = top + ylen * CELL + 2 * LINE
+    height = cluetop + LINE * (max(len(across),len(down)) + 1) + MARGIN
+
+    out.write('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" viewBox="0 0 %d %d">\n'
+              % (width,height,width,height))
+    out.write(STYLE + '\n')
+    out.write('<rect width="100%" height="100%" fill="white"/>\n')
+    if 'title' in metadata:
+        out.write('<text class="title" x="%d" y="%d">%s</text>\n' % (width / 2,MARGIN + 18,escape(metadata['title'])))
+    if 'author' in metadata:
+        out.write('<text class="author" x="%d" y="%d">%s</text>\n' % (width / 2,top - 4,escape(metadata['author'])))
+
+    # the grid, centred
+    out.write('<g transform="translate(%d,%d)">\n' % ((width - xlen * CELL) / 2,top))
+    out.write('<rect width="%d" height="%d" fill="black"/>\n' % (xlen * CELL,ylen * CELL))
+    for i,row in grid.rows():
+        # the white cells, with each run along the row as one rectangle
+        start = last = None
+        for j,c in row:
+            if j != last:
+                if start is not None:
+                    out.write('<rect x="%d" y="%d" width="%d" height="%d" fill="white"/>\n'
+                              % (start * CELL,i * CELL,(last - start) * CELL,CELL))
+                start = j
+            last = j + 1
+        if start is not None:
+            out.write('<rect x="%d" y="%d" width="%d" height="%d" fill="white"/>\n'
+                      % (start * CELL,i * CELL,(last - start) * CELL,CELL))
+
+        for j,c in row:
+            if c[1] or c[2]: # a clue starts here
+                out.write('<text class="number" x="%d" y="%d">%d</text>\n'
+                          % (j * CELL + 2,i * CELL + 9,(c[1] or c[2]).number()))
+            if answers and c[0]:
+                out.write('<text class="answer" x="%d" y="%d">%s</text>\n'
+                          % (j * CELL + CELL / 2,i * CELL + CELL - 8,escape(c[0])))
+
+    # the grid lines (drawn last, so they're on top of everything)
+    out.write('<path stroke="black" fill="none" d="')
+    for i in range(ylen + 1):
+        out.write('M0 %dH%d' % (i * CELL,xlen * CELL))
+    for j in range(xlen + 1):
+        out.write('M%d 0V%d' % (j * CELL,ylen * CELL))
+    out.write('"/>\n</g>\n')
+
+    # the clues, across on the left and down on the right
+    for x,heading,clues in [(MARGIN,'Across',across),(MARGIN + column,'Down',down)]:
+        out.write('<text class="heading" x="%d" y="%d">%s</text>\n' % (x,cluetop,heading))
+        for k,c in enumerate(clues,1):
+            label,text = clue_line(c)
+            out.write('<text class="clue" x="%d" y="%d"><tspan font-weight="bold">%s</tspan> %s</text>\n'
+                      % (x,cluetop + k * LINE,escape(label),escape(text)))
+
+    out.write('</svg>\n')
@@ -0,0 +1,10 @@
+# conftest.py
+
+# the modules are at the top of the repository (like the benchmarks,
+# the tests also use benchmarks/generate.py for random crosswords)
+
+import os, sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(HERE,'..','benchmarks'))
+sys.path.insert(0,os.path.join(HERE,'..'))
@@ -0,0 +1,20 @@
+# test_check.py
+
+# the problems check.py finds in clues
+
+import check, crossworder
+
+def problems(lines):
+    return check.check(crossworder.stream_clues(lines,{}))
+
+def test_mismatch_names_the_clue_the_letter_came_from():
+    found = problems(['a|0|0|cat|Pet','d|1|0|(3)|Blank','a|0|0|dog|Another pet'])
+    mismatches = dict(((p.x,p.y),p.message) for p in found if p.kind == 'mismatch')
+    assert set(mismatches) == set([(0,0),(1,0),(2,0)])
+    for message in mismatches.values():
+        assert message.endswith('between across clue at (0,0) and across clue at (0,0)')
+
+def test_no_clues():
+    found = problems(['@title: Nothing'])
+    assert [p.kind for p in found] == ['empty']
+    assert check.has_errors(found)
@@ -0,0 +1,40 @@
+# test_load.py
+
+# loading clues into a dictionary (load_clues, from_file) has to give
+# the same crossword as streaming them straight into make_grid
+
+import pytest
+import crossworder
+
+LINES = ['@title: Fish',
+         '<fish>a&d|0&5|0&1|sword &fish|Swimmer',
+         'd|1|0|war|Conflict (see <fish>)',
+         'a|0|3|cow|Farm animal']
+
+def latex(grid,metadata):
+    return [crossworder.render_as_latex(grid,metadata,answers) for answers in [False,True]]
+
+def test_from_file_keeps_separated_clues(tmp_path):
+    filename = str(tmp_path / 'fish.txt')
+    with open(filename,'w') as f:
+        f.write('\n'.join(LINES) + '\n')
+    metadata,clues = crossworder.from_file(filename)
+    assert clues['fish'].children() # (the first part, not a later one)
+    grid = crossworder.make_grid(clues)
+    texts = [c.clue() for c in grid.clues()]
+    assert 'Swimmer' in texts and 'See 1-across' in texts
+    streamed = {}
+    assert latex(grid,metadata) == latex(crossworder.make_grid(crossworder.stream_file(filename,streamed)),streamed)
+
+@pytest.mark.parametrize('engine',['python','numpy'])
+def test_load_clues_is_the_same_as_streaming(engine):
+    metadata,clues = crossworder.load_clues(LINES)
+    streamed = {}
+    assert (latex(crossworder.make_grid(clues,engine),metadata) ==
+            latex(crossworder.make_grid(crossworder.stream_clues(LINES,streamed),engine),streamed))
+
+def test_later_part_without_its_first_part():
+    metadata,clues = crossworder.load_clues(LINES)
+    del clues['fish']
+    with pytest.raises(ValueError,match=r'down clue at \(5, 1\)'):
+        crossworder.make_grid(clues)
@@ -0,0 +1,26 @@
+# test_output.py
+
+# a render that fails partway through mustn't have written anything
+# (on stdout there's no file to delete afterwards)
+
+import io
+import pytest
+import crossworder, interchange
+
+LINES = ['a|0|0|cat|Pet','d|0|0|cow|Farm animal','d|2|0|tea|Drink']
+
+def test_crossword_format_writes_nothing_on_error(monkeypatch):
+    metadata,clues = crossworder.load_clues(['@title: Farm'] + LINES)
+    grid = crossworder.make_grid(clues)
+    entry_line = interchange.entry_line
+    calls = []
+    def failing(entry,letters):
+        calls.append(entry)
+        if len(calls) > 1:
+            raise ValueError('no cells')
+        return entry_line(entry,letters)
+    monkeypatch.setattr(interchange,'entry_line',failing)
+    out = io.StringIO()
+    with pytest.raises(ValueError):
+        crossworder.write_output(out,grid,metadata,format='crossword')
+    assert out.getvalue() == ''
@@ -0,0 +1,136 @@
+# test_puzzle.py
+
+# editing a Puzzle (see puzzle.py) has to give the same crossword as
+# building it from scratch with make_grid
+
+import random
+import pytest
+import crossworder, puzzle
+import generate
+
+LINES = ['<top>a|0|0|cat|Pet, see <side>',
+         '<side>d|0|0|cow|Farm animal',
+         'd|2|0|tea|Drink, with <top>',
+         'a|0|2|wha|Exclamation']
+
+# the LaTeX (with and without the answers) of a puzzle, and of
+# building it from scratch from its lines
+def latex(p):
+    return [crossworder.render_as_latex(p.grid,p.metadata,answers) for answers in [False,True]]
+
+def rebuilt(p):
+    metadata = {}
+    grid = crossworder.make_grid(crossworder.stream_clues(p.lines(),metadata))
+    return [crossworder.render_as_latex(grid,metadata,answers) for answers in [False,True]]
+
+def assert_same(p):
+    assert latex(p) == rebuilt(p)
+
+def texts(p):
+    return dict((id,p.clue(id).clue()) for id in p.ids())
+
+def test_load():
+    p = puzzle.Puzzle.load(LINES)
+    assert_same(p)
+    assert texts(p)['top'] == 'Pet, see 1-down'
+    assert texts(p)[0] == 'Drink, with 1-across'
+
+def test_add_and_remove():
+    p = puzzle.Puzzle.load(LINES)
+    id = p.add_clue('a|2|1|ear|Hearing aid?')
+    assert_same(p)
+    p.remove_clue(id)
+    assert_same(p)
+    assert latex(p) == latex(puzzle.Puzzle.load(LINES))
+
+def test_move_renumbers():
+    p = puzzle.Puzzle.load(LINES)
+    p.add_clue('a|-3|-1|dog|Pet')
+    assert p.clue('top').number() == 2
+    assert texts(p)[0] == 'Drink, with 2-across'
+    assert_same(p)
+    p.move_clue('side',5,5)
+    assert texts(p)['top'] == 'Pet, see %d-down' % p.clue('side').number()
+    assert_same(p)
+
+def test_set_answer():
+    p = puzzle.Puzzle.load(LINES)
+    p.set_answer('top','(3)')
+    assert p.clue('top').answer() is None
+    assert_same(p)
+    p.set_answer('top','cat')
+    assert_same(p)
+
+def test_separated():
+    p = puzzle.Puzzle.load(LINES + ['<sep>a&d|5&9|0&0|ab&cde|Split'])
+    assert texts(p)['sep'] == 'Split'
+    assert p.clue('sep').children()[0].clue() == 'See %d-across' % p.clue('sep').number()
+    p.add_clue('d|-1|-1|z|First')
+    assert p.clue('sep').children()[0].clue() == 'See %d-across' % p.clue('sep').number()
+    assert_same(p)
+
+def test_invalid_changes():
+    p = puzzle.Puzzle.load(LINES)
+    before = latex(p)
+    for change in [lambda: p.set_answer('top','dog'), # mismatched letters
+                   lambda: p.add_clue('a|0|0|cab|Taxi'), # two clues starting there
+                   lambda: p.add_clue('a|5|5|abc|See <nowhere>'),
+                   lambda: p.remove_clue('side')]: # referred to
+        with pytest.raises(ValueError):
+            change()
+        assert latex(p) == before
+
+def test_update():
+    p = puzzle.Puzzle.load(LINES)
+    lines = list(LINES)
+    lines[1] = '<side>d|0|0|cow|Dairy animal'
+    lines.append('a|4|4|ox|Beast')
+    assert p.update(lines) == 3
+    assert texts(p)['side'] == 'Dairy animal'
+    assert sorted(p.lines()) == sorted(lines)
+    assert_same(p)
+
+# changing a named clue that's referred to doesn't need building
+# everything again
+def test_update_named_is_incremental(monkeypatch):
+    p = puzzle.Puzzle.load(LINES)
+    monkeypatch.setattr(p,'_build',lambda *args: pytest.fail('built from scratch'))
+    p.update([LINES[0],'<side>d|0|0|cow|Moo-er'] + LINES[2:])
+    assert texts(p)['side'] == 'Moo-er'
+    assert texts(p)['top'] == 'Pet, see 1-down'
+    assert_same(p)
+
+def test_failed_update_leaves_puzzle():
+    p = puzzle.Puzzle.load(['@title: Before'] + LINES)
+    lines = list(p.lines())
+    before = latex(p)
+    with pytest.raises(ValueError):
+        p.update(['@title: After','<top>a|0|0|cab|Pet, see <side>'] + LINES[1:3] + ['d|2|0|zzz|Nope'])
+    assert list(p.lines()) == lines
+    assert latex(p) == before
+    assert p.metadata == {'title': 'Before'}
+
+def test_random_edits():
+    lines = list(generate.generate(15,15,1))
+    p = puzzle.Puzzle.load(lines)
+    assert_same(p)
+    rand = random.Random(1)
+    for n in range(100):
+        id = rand.choice(p.ids())
+        c = p.clue(id)
+        x,y = c.startpoint()
+        try:
+            if n % 3 == 0:
+                p.move_clue(id,x + 40,y)
+                p.move_clue(id,x,y)
+            elif n % 3 == 1:
+                line = p.line(id)
+                p.remove_clue(id)
+                p.add_clue(line)
+            elif c.answer() and not c.children():
+                p.set_answer(id,'(%s)' % c.length_spec())
+        except ValueError: # (something refers to it)
+            continue
+        if n % 10 == 0:
+            assert_same(p)
+    assert_same(p)
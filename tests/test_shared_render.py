@@ -0,0 +1,99 @@
+# test_shared_render.py
+
+# a built crossword (a grid.BuiltPuzzle from make_grid, with either
+# engine) can't be changed, building it doesn't change the parsed
+# clues, and it can be rendered from lots of threads at once, or
+# pickled and rendered in other processes, giving the same output
+
+import io, pickle, threading
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+import crossworder, grid
+import generate
+
+ENGINES = ['python'] + (['numpy'] if crossworder.numpygrid else [])
+
+# the outputs compared
+RENDERS = [(False,'latex'),(True,'latex'),(True,'svg')]
+
+def render_all(g,metadata):
+    outputs = []
+    for answers,format in RENDERS:
+        out = io.StringIO()
+        crossworder.write_output(out,g,metadata,answers,False,format)
+        outputs.append(out.getvalue())
+    return outputs
+
+# (in a worker process)
+def render_pickled(data):
+    metadata,g = pickle.loads(data)
+    return render_all(g,metadata)
+
+@pytest.fixture(scope='module')
+def crossword():
+    return crossworder.load_clues(list(generate.generate(40,40,0)))
+
+@pytest.mark.parametrize('engine',ENGINES)
+def test_building_leaves_clues(crossword,engine):
+    metadata,clues = crossword
+    texts = [(c.clue(),c.text()) for c in clues.values()]
+    expected = render_all(crossworder.make_grid(clues,engine),metadata)
+    assert [(c.clue(),c.text()) for c in clues.values()] == texts
+    assert not any(hasattr(c,'_number') for c in clues.values())
+    assert render_all(crossworder.make_grid(clues,engine),metadata) == expected
+
+@pytest.mark.parametrize('engine',ENGINES)
+def test_built_puzzle_cant_change(crossword,engine):
+    metadata,clues = crossword
+    g = crossworder.make_grid(clues,engine)
+    assert isinstance(g,grid.BuiltPuzzle)
+    c = g.clues()[0]
+    x,y = c.startpoint()
+    named = dict((n.name(),n) for n in g.clues() if n.name())
+    for change in [lambda: g.set(x,y,None),lambda: g.remove(x,y),lambda: c.number(1000),
+                   lambda: c.resolve_names(named),lambda: c.answer('x'),
+                   lambda: c.add_child(c),lambda: c.children([])]:
+        with pytest.raises(AttributeError):
+            change()
+    if engine == 'numpy': # (its arrays are read-only too)
+        with pytest.raises(ValueError):
+            g._letters[0] = 0
+
+@pytest.mark.parametrize('engine',ENGINES)
+def test_threads(crossword,engine):
+    metadata,clues = crossword
+    g = crossworder.make_grid(clues,engine)
+    expected = render_all(crossworder.make_grid(clues,engine),metadata)
+    results = []
+    start = threading.Barrier(8)
+    def run():
+        start.wait()
+        for _ in range(3):
+            results.append(render_all(g,metadata))
+    pool = [threading.Thread(target=run) for _ in range(8)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    assert len(results) == 24
+    assert all(r == expected for r in results)
+
+@pytest.mark.parametrize('engine',ENGINES)
+def test_processes(crossword,engine):
+    metadata,clues = crossword
+    g = crossworder.make_grid(clues,engine)
+    expected = render_all(g,metadata)
+    data = pickle.dumps((metadata,g))
+    with ProcessPoolExecutor(max_workers=2) as processes:
+        assert list(processes.map(render_pickled,[data] * 2)) == [expected] * 2
+
+# reading a built clue (its resolved text, "See ..." for a later part)
+# doesn't change it
+@pytest.mark.parametrize('engine',ENGINES)
+def test_reading_doesnt_change_clues(crossword,engine):
+    metadata,clues = crossword
+    g = crossworder.make_grid(clues,engine)
+    states = [c.__getstate__() for c in g.clues()]
+    assert all(c.clue() for c in g.clues())
+    render_all(g,metadata)
+    assert [c.__getstate__() for c in g.clues()] == states
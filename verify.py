@@ -0,0 +1,227 @@
+# verify.py
+
+# checking solvers' submissions against a built crossword (from
+# make_grid, or load_grid). Everything is worked out once, in a
+# Solution:
+#
+#  - the letters of the grid as one flat string, row by row (upper
+#    case, with BLACK for black cells)
+#  - for each clue, the cells it goes through as slices of that string
+#    (a span of the row for across clues, every width'th character for
+#    down ones, and one of each for each part of a separated clue),
+#    and its answer (the letters of those slices)
+#  - the runs of white cells in each row, as slices
+#
+# so checking is slicing and comparing strings, and only goes through
+# letters one at a time to find which ones are wrong in a run or clue
+# that doesn't match. A whole grid is submitted as a string of all of
+# its cells (or a list of the rows), with anything in the black cells,
+# and answers as a dictionary of clue => answer, where a clue is
+# (number, 'across'/'down') or a string like "12-across" or "12a".
+# Case and the spaces, hyphens etc. between words don't matter.
+#
+# With engine='numpy', batches of grids are checked all at once with
+# arrays (if NumPy is installed, otherwise the normal way is used).
+
+import re
+import clue, crossworder
+
+# (NumPy is optional)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# the character for black cells in the flat string
+BLACK = '#'
+
+# a clue as a string, like "12-across", "12 down" or "12a"
+RE_CLUE = re.compile(r'^\s*(\d+)\s*-?\s*(a|across|d|down)\s*$',re.IGNORECASE)
+
+# the result of checking a submission: the wrong cells ((column, row)
+# from the top left, including those left empty) and the wrong clues
+# ((number, 'across'/'down')), in order
+class Check(object):
+    __slots__ = ('wrong_cells','wrong_clues')
+
+    def __init__(self,wrong_cells,wrong_clues):
+        self.wrong_cells = wrong_cells
+        self.wrong_clues = wrong_clues
+
+    def correct(self):
+        return not self.wrong_cells and not self.wrong_clues
+
+    def __repr__(self):
+        return 'Check(%r, %r)' % (self.wrong_cells,self.wrong_clues)
+
+# s in upper case, leaving any letters that would become more than
+# one (like ß) as they are, so that it's still the same length
+def upper(s):
+    u = s.upper()
+    if len(u) == len(s):
+        return u
+    return ''.join(c.upper() if len(c.upper()) == 1 else c for c in s)
+
+# the (number, 'across'/'down') for a clue given as either that or a
+# string
+def clue_key(key):
+    if isinstance(key,str):
+        m = RE_CLUE.match(key)
+        if not m:
+            raise ValueError("Can't understand the clue %r (it should be like 12-across)" % key)
+        return (int(m.group(1)),m.group(2)[0].lower() == 'a' and 'across' or 'down')
+    number,direction = key
+    return (int(number),str(direction)[:1].lower() == 'a' and 'across' or 'down')
+
+class Solution(object):
+    def __init__(self,grid):
+        width = self.width = grid.width()
+        height = self.height = grid.height()
+        cells = [BLACK] * (width * height)
+        for i,j,cell in grid.cells():
+            if not cell[0]:
+                raise ValueError("Can't check a crossword without all of its letters (there isn't one at %d,%d)" % (j,i))
+            cells[i * width + j] = upper(cell[0])
+        self.letters = ''.join(cells)
+
+        # the white runs of each row
+        self.runs = []
+        for i,row in grid.rows():
+            start = last = None
+            for j,c in row:
+                if j != last:
+                    if start is not None:
+                        self.runs.append(slice(i * width + start,i * width + last))
+                    start = j
+                last = j + 1
+            if start is not None:
+                self.runs.append(slice(i * width + start,i * width + last))
+
+        # each clue (with its later parts), in the order they're listed
+        minx,miny = grid.origin()
+        def span(c):
+            x,y = c.startpoint()
+            step = 1 if c.is_across() else width
+            n = 0
+            for px,py in c.points(): # (a short answer doesn't fill all of them)
+                if not grid.get(px,py):
+                    break
+                n += 1
+            start = (y - miny) * width + (x - minx)
+            return slice(start,start + n * step,step)
+        self.keys = [] # (number, 'across'/'down')
+        self.spans = [] # [slice for each part]
+        self.answers = [] # the letters
+        self._index = {} # key (and "12-across" etc.) => position in those
+        across,down = crossworder.clue_lists(grid)
+        for c in across + down:
+            if c.parent():
+                continue
+            key = (c.number(),c.direction_name(True))
+            spans = [span(p) for p in [c] + list(c.children())]
+            self._index[key] = self._index['%d-%s' % key] = len(self.keys)
+            self.keys.append(key)
+            self.spans.append(spans)
+            self.answers.append(''.join(self.letters[s] for s in spans))
+        self._arrays = None
+
+    # the (column, row) of a position in the flat string
+    def cell(self,k):
+        return (k % self.width,k // self.width)
+
+    # the positions in the flat string of slice s
+    def _positions(self,s):
+        return range(s.start,s.stop,s.step or 1)
+
+    def _flatten(self,submitted):
+        if not isinstance(submitted,str):
+            submitted = ''.join(submitted)
+        if len(submitted) != len(self.letters):
+            raise ValueError("A submitted grid needs %d cells (%dx%d), not %d" % (
+                len(self.letters),self.width,self.height,len(submitted)))
+        return upper(submitted)
+
+    # check a whole grid, returns a Check
+    def check_grid(self,submitted):
+        submitted = self._flatten(submitted)
+        letters = self.letters
+        if submitted == letters: # (with BLACK in the black cells)
+            return Check([],[])
+        wrong = []
+        for s in self.runs:
+            if submitted[s] != letters[s]:
+                wrong.extend(k for k in self._positions(s) if submitted[k] != letters[k])
+        if not wrong:
+            return Check([],[])
+        clues = [key for key,spans in zip(self.keys,self.spans)
+                 if any(submitted[s] != letters[s] for s in spans)]
+        return Check([self.cell(k) for k in wrong],clues)
+
+    # check answers (a dictionary of clue => answer) to some of the
+    # clues, returns a Check
+    def check_answers(self,answers):
+        wrong = []
+        clues = []
+        for key,answer in answers.items():
+            n = self._index.get(key)
+            if n is None:
+                n = self._index.get(clue_key(key))
+                if n is None:
+                    raise ValueError("There's no %d-%s" % clue_key(key))
+            key = self.keys[n]
+            answer = upper(clue.RE_WORD_SPLIT.sub('',answer.replace('&','')))
+            expected = self.answers[n]
+            if answer == expected:
+                continue
+            clues.append(key)
+            positions = [k for s in self.spans[n] for k in self._positions(s)]
+            for i,k in enumerate(positions):
+                if i >= len(answer) or answer[i] != expected[i]:
+                    wrong.append(self.cell(k))
+        return Check(sorted(set(wrong),key=lambda c: (c[1],c[0])),
+                     sorted(clues,key=lambda k: self._index[k]))
+
+    # check lots of whole grids, returns a Check for each. With
+    # engine='numpy', they're all compared at once
+    def check_grids(self,submissions,engine='python'):
+        if engine == 'numpy' and np is not None:
+            return self._check_arrays([self._flatten(s) for s in submissions])
+        return [self.check_grid(s) for s in submissions]
+
+    # check lots of dictionaries of answers, returns a Check for each
+    def check_answer_batches(self,batches):
+        return [self.check_answers(answers) for answers in batches]
+
+    # the arrays for checking with NumPy: (the letters as code points,
+    # whether each cell is white, the positions of the cells of every
+    # clue one after another, where each clue starts in that)
+    def _numpy(self):
+        if self._arrays is None:
+            letters = np.frombuffer(self.letters.encode('utf-32-le'),dtype=np.uint32)
+            white = letters != ord(BLACK)
+            positions = []
+            starts = []
+            for spans in self.spans:
+                starts.append(len(positions))
+                positions.extend(k for s in spans for k in self._positions(s))
+            self._arrays = (letters,white,np.array(positions,dtype=np.intp),np.array(starts,dtype=np.intp))
+        return self._arrays
+
+    def _check_arrays(self,submitted):
+        if not submitted:
+            return []
+        letters,white,positions,starts = self._numpy()
+        grids = np.frombuffer(''.join(submitted).encode('utf-32-le'),dtype=np.uint32)
+        wrong = (grids.reshape(len(submitted),len(self.letters)) != letters) & white
+        checks = []
+        bad = np.flatnonzero(wrong.any(axis=1))
+        clues = np.add.reduceat(wrong[bad][:,positions],starts,axis=1) if len(bad) and len(starts) else None
+        found = dict((int(n),k) for k,n in enumerate(bad.tolist()))
+        for n in range(len(submitted)):
+            k = found.get(n)
+            if k is None:
+                checks.append(Check([],[]))
+                continue
+            checks.append(Check([self.cell(p) for p in np.flatnonzero(wrong[n]).tolist()],
+                                [self.keys[c] for c in np.flatnonzero(clues[k]).tolist()]))
+        return checks
@@ -0,0 +1,71 @@
+# watch.py
+
+# watch a crossword file and re-render it every time it changes. The
+# crossword is kept as a puzzle.Puzzle between runs, so only the clues
+# on the lines that have changed are taken out and put back in (along
+# with the numbers and references that change because of them), and
+# the output is only written if it changed.
+
+import os, time
+import crossworder, puzzle
+
+class Watcher(object):
+    def __init__(self,filename,outname,answers=False,compact=False):
+        self._filename = filename
+        self._outname = outname
+        self._answers = answers
+        self._compact = compact
+        self._puzzle = puzzle.Puzzle()
+        self._output = None # the last output written
+        self._mtime = None
+
+    # read the file and render it, returns the LaTeX
+    def render(self):
+        self.changed = 0
+        if crossworder.is_compiled(self._filename): # nothing to parse
+            metadata,grid = crossworder.load_grid(self._filename)
+            return crossworder.render_as_latex(grid,metadata,self._answers,self._compact)
+
+        if crossworder.is_imported(self._filename):
+            with open(self._filename,'rb') as f:
+                self.changed = self._puzzle.update(crossworder.import_lines(self._filename,f.read()))
+        else:
+            with open(self._filename) as f:
+                self.changed = self._puzzle.update(f)
+        return crossworder.render_as_latex(self._puzzle.grid,self._puzzle.metadata,self._answers,self._compact)
+
+    # re-render if the file has changed since last time, returns
+    # whether the output was written
+    def update(self):
+        mtime = os.stat(self._filename).st_mtime_ns
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        start = time.perf_counter()
+        try:
+            latex = self.render()
+        except ValueError as e: # wait for it to be fixed
+            crossworder.message("Error:", e)
+            return False
+
+        if latex == self._output:
+            return False
+        with open(self._outname,'w') as out:
+            print(latex,file=out)
+        self._output = latex
+        crossworder.message("Wrote %s (%d clues changed, %.3fs)" % (
+            self._outname,self.changed,time.perf_counter() - start))
+        return True
+
+    # check the file every interval seconds, until interrupted
+    def run(self,interval=0.5):
+        try:
+            while True:
+                try:
+                    self.update()
+                except OSError as e: # e.g. it's being saved
+                    crossworder.message("Error:", e)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,311 @@
+# wordlist.py
+
+# an index of a word list, for filling in grids (see fill.py). The
+# entries are grouped by the number of letters, and for each length
+# there is a bitset (a python int, bit k for the kth entry of that
+# length) for every letter at every position, so the entries matching
+# a pattern like "c?o??" are the AND of a couple of bitsets. Entries
+# can be phrases ("ice cream"), which only match slots with the same
+# word lengths.
+#
+# A word list is just a text file with an entry on each line, in the
+# order they should be tried (e.g. best first). It can be compiled
+# into an index file (save), which is mapped into memory rather than
+# built again when it's loaded (MappedIndex), so a big word list can
+# be queried straight away. The layout (all little-endian) is
+#
+#   header:  magic 'CWI', format version, the number of lengths and
+#            the number of strings (HEADER)
+#   strings: the offset of each string in the blob (n + 1 uint32s),
+#            then the blob of UTF-8, padded to 4 bytes. The entries
+#            come first, grouped by length, then the shapes (word
+#            lengths like "4,4")
+#   lengths: for each length, the length, the number of entries, the
+#            index of its first entry and the number of shapes
+#            (LENGTH), then the string index of each shape and the
+#            offset of its bitset (SHAPE), then for each position the
+#            number of letters (uint32) and the code point and offset
+#            of the bitset of each letter (LETTER)
+#   bitsets: for each length, its bitsets ((entries + 7) // 8 bytes,
+#            padded to 4), at offsets from the start of this section
+
+import re, mmap, struct
+
+# the characters that separate the words of an entry
+RE_SEPARATORS = re.compile(r'[ ,.\-]+')
+
+MAGIC = b'CWI'
+VERSION = 1
+
+HEADER = struct.Struct('<3sBII')
+LENGTH = struct.Struct('<IIII')
+SHAPE = struct.Struct('<II')
+LETTER = struct.Struct('<II')
+
+# the extension of compiled word lists
+EXTENSION = '.cwi'
+
+# the number of entries in a bitset
+try:
+    popcount = int.bit_count
+except AttributeError: # before python 3.10
+    def popcount(bits):
+        return bin(bits).count('1')
+
+# the indices of the bits that are set, lowest first. This goes
+# through the bitset 64 bits at a time, since every operation on the
+# whole of a big int has to go over all of it
+def iter_bits(bits):
+    n = (bits.bit_length() + 63) // 64
+    for i,chunk in enumerate(struct.unpack('<%dQ' % n,bits.to_bytes(8 * n,'little'))):
+        while chunk:
+            low = chunk & -chunk
+            yield 64 * i + low.bit_length() - 1
+            chunk ^= low
+
+# the letters of an entry (lowercase, without spaces, punctuation
+# etc), and the lengths of its words
+def normalise(entry):
+    words = [''.join(ch for ch in w if ch.isalpha()) for w in RE_SEPARATORS.split(entry.lower())]
+    words = [w for w in words if w]
+    return (''.join(words),tuple(len(w) for w in words))
+
+# parse a pattern like "c?o??w" (? or . for an unknown letter, case
+# doesn't matter), returns (a list of the letters, with None for the
+# unknown ones, and the lengths of the words if there's more than one,
+# e.g. "c?o ??w", otherwise None)
+def parse_pattern(s):
+    words = [w for w in RE_SEPARATORS.split(s.strip().lower().replace('.','?')) if w]
+    pattern = [None if ch == '?' else ch for ch in ''.join(words)]
+    if not pattern or any(ch is not None and not ch.isalpha() for ch in pattern):
+        raise ValueError("Bad pattern '%s'" % s)
+    return (pattern,tuple(len(w) for w in words) if len(words) > 1 else None)
+
+# a pattern as a string, e.g. "c?o??w"
+def format_pattern(pattern):
+    return ''.join(ch or '?' for ch in pattern)
+
+class WordIndex(object):
+    def __init__(self,entries=()):
+        self._letters = {} # length => [letters of each entry]
+        self._entries = {} # length => [each entry as written]
+        self._shapes = {} # length => {word lengths => bitset}
+        self._positions = {} # length => [{letter => bitset} for each position]
+        self._seen = set()
+        for e in entries:
+            self.add(e)
+
+    # add an entry (ignored if it's already there, or has no letters)
+    def add(self,entry):
+        entry = entry.strip()
+        letters,shape = normalise(entry)
+        if not letters or (letters,shape) in self._seen:
+            return
+        self._seen.add((letters,shape))
+
+        n = len(letters)
+        if n not in self._letters:
+            self._letters[n] = []
+            self._entries[n] = []
+            self._shapes[n] = {}
+            self._positions[n] = [{} for _ in range(n)]
+        bit = 1 << len(self._letters[n])
+        self._letters[n].append(letters)
+        self._entries[n].append(entry)
+        shapes = self._shapes[n]
+        shapes[shape] = shapes.get(shape,0) | bit
+        for p,ch in zip(self._positions[n],letters):
+            p[ch] = p.get(ch,0) | bit
+
+    # load a word list file
+    @classmethod
+    def load(cls,filename):
+        with open(filename,encoding='utf-8') as f:
+            return cls(line for line in f if not line.startswith('#'))
+
+    def __len__(self):
+        return sum(len(l) for l in self._letters.values())
+
+    # the bitset of entries of length n matching pattern (a sequence of
+    # n letters, or None for any letter), and with words of the lengths
+    # in shape (if it's given)
+    def candidates(self,pattern,shape=None):
+        n = len(pattern)
+        if n not in self._letters:
+            return 0
+        if shape is None:
+            bits = (1 << len(self._letters[n])) - 1
+        else:
+            bits = self._shapes[n].get(tuple(shape),0)
+        for p,ch in zip(self._positions[n],pattern):
+            if ch is not None:
+                bits &= p.get(ch,0)
+                if not bits:
+                    break
+        return bits
+
+    # the letters of entry k of length n
+    def letters(self,n,k):
+        return self._letters[n][k]
+
+    # entry k of length n, as it was written
+    def entry(self,n,k):
+        return self._entries[n][k]
+
+    # the entries matching pattern (see candidates)
+    def match(self,pattern,shape=None):
+        n = len(pattern)
+        return [self._entries[n][k] for k in iter_bits(self.candidates(pattern,shape))]
+
+    # write the index to filename, to be loaded with MappedIndex
+    def save(self,filename):
+        lengths = sorted(self._letters)
+        strings = [e for n in lengths for e in self._entries[n]]
+        shapes = {}
+        for n in lengths:
+            for shape in self._shapes[n]:
+                shapes.setdefault(shape,len(strings) + len(shapes))
+        strings.extend(','.join(map(str,shape)) for shape in shapes)
+        strings = [st.encode('utf-8') for st in strings]
+
+        directory = []
+        bitsets = []
+        offset = 0 # of the next bitset
+        first = 0 # the index of the first entry of the length
+        for n in lengths:
+            count = len(self._letters[n])
+            size = (count + 7) // 8
+            size += -size % 4
+            def add(bits):
+                nonlocal offset
+                bitsets.append(bits.to_bytes(size,'little'))
+                offset += size
+                return offset - size
+            directory.append(LENGTH.pack(n,count,first,len(self._shapes[n])))
+            for shape,bits in self._shapes[n].items():
+                directory.append(SHAPE.pack(shapes[shape],add(bits)))
+            for position in self._positions[n]:
+                directory.append(struct.pack('<I',len(position)))
+                for ch,bits in sorted(position.items()):
+                    directory.append(LETTER.pack(ord(ch),add(bits)))
+            first += count
+
+        offsets = [0]
+        for st in strings:
+            offsets.append(offsets[-1] + len(st))
+        with open(filename,'wb') as out:
+            out.write(HEADER.pack(MAGIC,VERSION,len(lengths),len(strings)))
+            out.write(struct.pack('<%dI' % len(offsets),*offsets))
+            out.write(b''.join(strings))
+            out.write(b'\0' * (-offsets[-1] % 4))
+            out.write(b''.join(directory))
+            out.write(b''.join(bitsets))
+
+# a word list index saved with WordIndex.save, mapped into memory. Only
+# the directory is read when it's opened, the bitsets and the entries
+# are read from the file when they're needed. It has the same methods
+# for looking things up as WordIndex
+class MappedIndex(object):
+    def __init__(self,filename):
+        with open(filename,'rb') as f:
+            self._map = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        try:
+            self._read_directory()
+        except (ValueError,struct.error):
+            self.close()
+            raise
+
+    def _read_directory(self):
+        data = self._map
+        if len(data) < HEADER.size:
+            raise ValueError("Not a word list index (too short)")
+        magic,version,nlengths,nstrings = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a word list index")
+        if version != VERSION:
+            raise ValueError("Unsupported word list index version %d" % version)
+        pos = HEADER.size
+
+        self._offsets = struct.unpack_from('<%dI' % (nstrings + 1),data,pos)
+        pos += 4 * (nstrings + 1)
+        self._blob = pos
+        pos += self._offsets[-1] + (-self._offsets[-1] % 4)
+
+        self._lengths = {} # length => (entries, first entry, bitset size)
+        self._shapes = {} # length => {word lengths => bitset offset}
+        self._positions = {} # length => [{letter => bitset offset} for each position]
+        for _ in range(nlengths):
+            n,count,first,nshapes = LENGTH.unpack_from(data,pos)
+            pos += LENGTH.size
+            size = (count + 7) // 8
+            self._lengths[n] = (count,first,size + -size % 4)
+            shapes = self._shapes[n] = {}
+            for _ in range(nshapes):
+                string,offset = SHAPE.unpack_from(data,pos)
+                pos += SHAPE.size
+                shapes[tuple(int(w) for w in self._string(string).split(','))] = offset
+            positions = self._positions[n] = []
+            for _ in range(n):
+                (nletters,) = struct.unpack_from('<I',data,pos)
+                pos += 4
+                positions.append(dict((chr(ch),offset) for ch,offset in
+                                      LETTER.iter_unpack(data[pos:pos + LETTER.size * nletters])))
+                pos += LETTER.size * nletters
+        self._bitsets = pos
+
+    def close(self):
+        self._map.close()
+    def __enter__(self):
+        return self
+    def __exit__(self,*exc):
+        self.close()
+
+    def _string(self,k):
+        start = self._blob + self._offsets[k]
+        return str(self._map[start:start + self._offsets[k + 1] - self._offsets[k]],'utf-8')
+
+    def _bits(self,n,offset):
+        start = self._bitsets + offset
+        return int.from_bytes(self._map[start:start + self._lengths[n][2]],'little')
+
+    def __len__(self):
+        return sum(count for count,first,size in self._lengths.values())
+
+    # see WordIndex.candidates
+    def candidates(self,pattern,shape=None):
+        n = len(pattern)
+        if n not in self._lengths:
+            return 0
+        if shape is None:
+            bits = (1 << self._lengths[n][0]) - 1
+        else:
+            offset = self._shapes[n].get(tuple(shape))
+            if offset is None:
+                return 0
+            bits = self._bits(n,offset)
+        for p,ch in zip(self._positions[n],pattern):
+            if ch is not None:
+                offset = p.get(ch)
+                if offset is None:
+                    return 0
+                bits &= self._bits(n,offset)
+                if not bits:
+                    break
+        return bits
+
+    def letters(self,n,k):
+        return normalise(self.entry(n,k))[0]
+
+    def entry(self,n,k):
+        return self._string(self._lengths[n][1] + k)
+
+    def match(self,pattern,shape=None):
+        n = len(pattern)
+        return [self.entry(n,k) for k in iter_bits(self.candidates(pattern,shape))]
+
+# load a word list, either an index file (see MappedIndex) or the
+# text of one
+def load(filename):
+    if filename.endswith(EXTENSION):
+        return MappedIndex(filename)
+    return WordIndex.load(filename)